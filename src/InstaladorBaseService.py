@@ -1,5 +1,4 @@
 import os
-import urllib.request
 import shutil
 import subprocess
 import sys
@@ -8,6 +7,8 @@ import zipfile
 import tkinter as tk
 from tkinter import messagebox
 
+from downloads import MotorDownloads
+
 # ----------------------
 # Funções de permissão
 # ----------------------
@@ -40,16 +41,16 @@ def create_directory():
         print("Pasta MonitoramentoBKP já existe.")
         return True
 
+# Mesmo motor do updater: baixa para .parcial (retomável) e troca atomicamente,
+# então reinstalar por cima de um launcher.exe em execução não deixa arquivo truncado.
+motor_downloads = MotorDownloads()
+
 def download_file(url, destination):
     try:
         print(f"Baixando: {url}")
-        urllib.request.urlretrieve(url, destination)
-        if os.path.exists(destination):
-            print(f"Arquivo salvo em: {destination}")
-            return True
-        else:
-            print(f"Erro: Arquivo não encontrado após download.")
-            return False
+        r = motor_downloads.baixar(url, destination)
+        print(f"Arquivo salvo em: {destination} ({r['bytes'] + r['retomados']} bytes, sha256 {r['sha256']})")
+        return True
     except Exception as e:
         print(f"Erro ao baixar {url}: {e}")
         return False
@@ -77,7 +78,8 @@ def download_and_install_nssm():
 
     print("🔽 Baixando NSSM...")
     try:
-        urllib.request.urlretrieve(nssm_url, temp_zip)
+        if not download_file(nssm_url, temp_zip):
+            return None
         with zipfile.ZipFile(temp_zip, 'r') as zip_ref:
             zip_ref.extractall(extract_dir)
 
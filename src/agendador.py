@@ -0,0 +1,359 @@
+"""
+Agendador por próximo horário de disparo.
+Cada entrada de 'executar' do config.json é compilada uma única vez
+(cron ou horario/dia/mes, intervalo, intervalo_dias) e o próximo disparo fica numa
+fila de prioridade, permitindo dormir exatamente até o próximo job.
+
+Disparos perdidos (launcher parado ou máquina desligada) são detectados a
+partir da última execução registrada e tratados conforme 'recuperar':
+  - "pular" (padrão): apenas registra no log
+  - "uma": roda uma vez o disparo perdido mais recente
+  - "todas": roda cada disparo perdido (até MAX_RECUPERACOES)
+'atraso_max_min' descarta disparos mais antigos que isso. As recuperações
+são espaçadas globalmente para um servidor recém-ligado não iniciar várias
+rotinas pesadas ao mesmo tempo.
+
+'espalhar_min' adiciona a cada disparo de calendário um deslocamento fixo
+em [0, espalhar_min) derivado da filial/hostname + nome do job, espalhando
+a frota sem perder a previsibilidade do horário de cada loja.
+"""
+
+import heapq
+import json
+from datetime import datetime, timedelta
+
+from cron import ExpressaoCron
+from identidade import deslocamento
+
+RECUPERAR_PADRAO = "pular"
+ATRASO_MAX_PADRAO_MIN = 24 * 60
+MAX_RECUPERACOES = 10
+ESPACAMENTO_RECUPERACAO_MIN = 5
+
+POLITICAS_RECUPERACAO = {
+    "pular": "pular", "skip": "pular",
+    "uma": "uma", "run-once": "uma",
+    "todas": "todas", "run-all": "todas",
+}
+
+
+class Tarefa:
+    """
+    Entrada de 'executar' compilada. Os gatilhos de calendário ficam todos
+    como ExpressaoCron (bitsets): o campo 'cron' (texto ou lista) ou a
+    tradução de horario/dia/mes. 'intervalo' (minutos desde a última
+    execução) é relativo e continua fora do cron, restrito aos dias de
+    'dia'/'mes' quando informados; 'intervalo_dias' filtra os dias dos gatilhos.
+    Campos com tipo errado levantam ValueError (a entrada é ignorada).
+    """
+
+    def __init__(self, chave, info, identidade=""):
+        self.chave = chave
+        self.info = info
+        self.nome = info.get("nome", "desconhecido")
+        self.espalhar = timedelta(seconds=deslocamento(identidade, self.nome, (info.get("espalhar_min") or 0) * 60))
+        self.intervalo = _numero(info, "intervalo")
+        self.intervalo_dias = _numero(info, "intervalo_dias")
+        self.dias = _lista_inteiros(info, "dia", 1, 31)
+        self.meses = _lista_inteiros(info, "mes", 1, 12)
+        # Lidos pelo PoolExecucao e pelo executar_tarefa do launcher: validados aqui para um erro de digitação não parar o loop
+        self.prioridade = _numero(info, "prioridade")
+        self.max_concurrentes = _numero(info, "max_concurrentes", minimo=0) or 1
+        self.timeout_min = _numero(info, "timeout_min", minimo=0) or None  # None: sem limite (ou o padrão do launcher)
+        self.gatilhos = self._compilar_gatilhos(info)
+        # 'intervalo' sem 'horario' com 'dia'/'mes': só corre nos dias permitidos
+        self.filtro_dias = None
+        if not self.gatilhos and self.intervalo > 0 and (self.dias or self.meses):
+            self.filtro_dias = ExpressaoCron.de_campos(range(60), range(24), self.dias, self.meses)
+        self.recuperar = POLITICAS_RECUPERACAO.get(str(info.get("recuperar", RECUPERAR_PADRAO)).lower(), RECUPERAR_PADRAO)
+        self.atraso_max = timedelta(minutes=info.get("atraso_max_min", ATRASO_MAX_PADRAO_MIN))
+        self.ultima_execucao = None
+        self.proxima = None
+        self.recuperacoes = set()  # {(quando, previsto)} ainda na fila
+
+    def _compilar_gatilhos(self, info):
+        cron = info.get("cron")
+        if cron:
+            if isinstance(cron, str):
+                cron = [cron]
+            # ValueError sobe para o Agendador registrar o erro de config
+            return [ExpressaoCron.parse(c) for c in cron]
+
+        horario = info.get("horario")
+        if isinstance(horario, str):
+            horario = [horario]
+        horas_por_minuto = {}
+        for h in horario or []:
+            try:
+                alvo = datetime.strptime(h, "%H:%M")
+            except (TypeError, ValueError):
+                continue
+            horas_por_minuto.setdefault(alvo.minute, set()).add(alvo.hour)
+
+        dias = self.dias
+        meses = self.meses
+        # 'dia'/'mes' sem 'horario' dispara uma vez no início do dia
+        if not horas_por_minuto and (dias or meses) and not self.intervalo:
+            horas_por_minuto = {0: {0}}
+        # Um gatilho por minuto distinto: 10:00 e 22:30 não cabem numa única expressão
+        return [
+            ExpressaoCron.de_campos([minuto], horas, dias, meses)
+            for minuto, horas in sorted(horas_por_minuto.items())
+        ]
+
+    def proxima_apos(self, depois_de):
+        """Primeiro disparo estritamente depois de `depois_de` (ou None se não houver)."""
+        if self.gatilhos:
+            # Os gatilhos trabalham no horário "de calendário"; o deslocamento entra só no fim
+            base = depois_de - self.espalhar
+            if self.intervalo_dias > 0 and self.ultima_execucao:
+                ultima = self.ultima_execucao - self.espalhar
+                liberado = datetime.combine(
+                    ultima.date() + timedelta(days=self.intervalo_dias), datetime.min.time()
+                )
+                # proxima_apos do cron é estritamente depois: recua 1 min para aceitar 00:00
+                base = max(base, liberado - timedelta(minutes=1))
+            candidatos = [p for p in (g.proxima_apos(base) for g in self.gatilhos) if p is not None]
+            return min(candidatos) + self.espalhar if candidatos else None
+
+        if self.intervalo > 0:
+            if self.ultima_execucao is None:
+                proxima = depois_de
+            else:
+                proxima = max(self.ultima_execucao + timedelta(minutes=self.intervalo), depois_de)
+            if self.filtro_dias and not self.filtro_dias.dia_corresponde(proxima):
+                proxima = self.filtro_dias.proxima_apos(proxima)
+            return proxima
+
+        return None
+
+    def disparos_entre(self, inicio, fim, limite=MAX_RECUPERACOES * 10):
+        """Disparos de horário em (inicio, fim], simulando a execução de cada um."""
+        if not self.gatilhos:
+            return []
+        salvo = self.ultima_execucao
+        disparos = []
+        try:
+            quando = inicio
+            while len(disparos) < limite:
+                quando = self.proxima_apos(quando)
+                if quando is None or quando > fim:
+                    break
+                disparos.append(quando)
+                self.ultima_execucao = quando
+        finally:
+            self.ultima_execucao = salvo
+        return disparos
+
+    def descricao(self):
+        texto = self._descricao_calendario()
+        if self.espalhar:
+            minutos, segundos = divmod(int(self.espalhar.total_seconds()), 60)
+            texto += f" (+{minutos}min{segundos:02d}s espalhamento)"
+        return texto
+
+    def _descricao_calendario(self):
+        if self.info.get("cron"):
+            return f"cron {self.info['cron']}"
+        dias = self.info.get("dia")
+        meses = self.info.get("mes")
+        a_cada = f", a cada {self.intervalo} minutos" if self.filtro_dias else ""
+        if dias and meses:
+            return f"dia(s) {dias} do(s) mês(es) {meses}{a_cada}"
+        if dias:
+            return f"dia(s) {dias}{a_cada}"
+        if meses:
+            return f"mês(es) {meses}{a_cada}"
+        if self.intervalo_dias > 0 and self.gatilhos:
+            return f"{self.info.get('horario')} a cada {self.intervalo_dias} dia(s)"
+        if self.gatilhos:
+            return f"horários {self.info.get('horario')}"
+        if self.intervalo > 0:
+            return f"a cada {self.intervalo} minutos"
+        return "sem horário definido"
+
+
+def _numero(info, campo, minimo=None):
+    valor = info.get(campo, 0) or 0
+    if isinstance(valor, bool) or not isinstance(valor, (int, float)):
+        raise ValueError(f"'{campo}' deve ser um número (recebido {valor!r})")
+    if minimo is not None and valor < minimo:
+        raise ValueError(f"'{campo}' deve ser no mínimo {minimo} (recebido {valor!r})")
+    return valor
+
+
+def _lista_inteiros(info, campo, minimo, maximo):
+    valores = info.get(campo) or None
+    if valores is None:
+        return None
+    if isinstance(valores, int) and not isinstance(valores, bool):
+        valores = [valores]
+    if not isinstance(valores, list) or not all(
+        isinstance(v, int) and not isinstance(v, bool) and minimo <= v <= maximo for v in valores
+    ):
+        raise ValueError(f"'{campo}' deve ser uma lista de inteiros entre {minimo} e {maximo} (recebido {valores!r})")
+    return valores
+
+
+class Agendador:
+    """Fila de prioridade (heap) de Tarefas ordenada pelo próximo disparo."""
+
+    def __init__(self, espacamento_recuperacao_min=ESPACAMENTO_RECUPERACAO_MIN):
+        self.tarefas = {}
+        self._heap = []
+        self._assinatura = None
+        self.espacamento = timedelta(minutes=espacamento_recuperacao_min)
+        self.perdidos = []  # [(tarefa, previsto, acao)] detectados na última compilação
+        self.erros = []  # [(nome, mensagem)] entradas inválidas na última compilação
+
+    def compilar(self, executar, tipo_terminal, agora, ultimas=None, identidade=""):
+        """
+        Recompila as entradas quando o config (ou o tipo do terminal / identidade) muda.
+        Preserva das tarefas que continuam existindo a última execução, as
+        recuperações ainda na fila e o disparo que já venceu e não foi
+        retirado; `ultimas` ({chave: timestamp}) vem do estado persistido em disco.
+        Retorna True se houve recompilação.
+        """
+        assinatura = json.dumps([executar, tipo_terminal, identidade], sort_keys=True, default=str)
+        if assinatura == self._assinatura:
+            return False
+        self._assinatura = assinatura
+
+        anteriores = self.tarefas
+        self.tarefas = {}
+        self.erros = []
+        do_disco = []
+        for info in executar:
+            # Uma entrada malformada não pode derrubar o loop do launcher: registra e segue
+            try:
+                if not info.get("ativo", True):
+                    continue
+                tipos = [str(t).upper() for t in info.get("terminal", [])]
+                if tipos and tipo_terminal not in tipos:
+                    continue
+                chave = self._chave_unica(str(info.get("nome", "desconhecido")))
+                tarefa = Tarefa(chave, info, identidade)
+                tarefa.proxima_apos(agora)
+            except Exception as e:
+                nome = info.get("nome", "desconhecido") if isinstance(info, dict) else repr(info)
+                self.erros.append((nome, str(e) or type(e).__name__))
+                continue
+            antiga = anteriores.get(chave)
+            if antiga:
+                tarefa.ultima_execucao = antiga.ultima_execucao
+                if tarefa.recuperar != "pular":
+                    tarefa.recuperacoes = set(antiga.recuperacoes)
+                if antiga.proxima is not None and antiga.proxima <= agora:
+                    tarefa.proxima = antiga.proxima
+            elif ultimas and chave in ultimas:
+                tarefa.ultima_execucao = datetime.fromtimestamp(ultimas[chave])
+                do_disco.append(tarefa)
+            self.tarefas[chave] = tarefa
+
+        self._reconstruir(agora)
+        self.perdidos = self._agendar_recuperacoes(do_disco, agora)
+        return True
+
+    def _agendar_recuperacoes(self, tarefas, agora):
+        """Detecta disparos perdidos desde a última execução registrada e aplica a política."""
+        candidatos = []
+        perdidos = []
+        for tarefa in tarefas:
+            disparos = tarefa.disparos_entre(tarefa.ultima_execucao, agora)
+            validos = []
+            for previsto in disparos:
+                if agora - previsto > tarefa.atraso_max:
+                    perdidos.append((tarefa, previsto, "atraso máximo excedido"))
+                elif tarefa.recuperar == "pular":
+                    perdidos.append((tarefa, previsto, "pulado"))
+                else:
+                    validos.append(previsto)
+            limite = 1 if tarefa.recuperar == "uma" else MAX_RECUPERACOES
+            for previsto in validos[:-limite]:
+                perdidos.append((tarefa, previsto, "pulado (limite de recuperações)"))
+            candidatos.extend((previsto, tarefa) for previsto in validos[-limite:])
+
+        # Espaça as recuperações na ordem em que foram perdidas
+        candidatos.sort(key=lambda c: (c[0], c[1].chave))
+        for i, (previsto, tarefa) in enumerate(candidatos):
+            quando = agora + self.espacamento * i
+            if tarefa.proxima is not None and tarefa.proxima <= quando:
+                perdidos.append((tarefa, previsto, "coberto pelo próximo disparo"))
+                continue
+            tarefa.recuperacoes.add((quando, previsto))
+            heapq.heappush(self._heap, (quando, tarefa.chave, previsto))
+            perdidos.append((tarefa, previsto, f"recuperação às {quando.strftime('%H:%M')}"))
+        return perdidos
+
+    def _chave_unica(self, nome):
+        chave, n = nome, 1
+        while chave in self.tarefas:
+            n += 1
+            chave = f"{nome}#{n}"
+        return chave
+
+    def _reconstruir(self, agora):
+        self._heap = []
+        for tarefa in self.tarefas.values():
+            # Disparo vencido herdado da compilação anterior sai na próxima chamada de vencidas()
+            if tarefa.proxima is None or tarefa.proxima > agora:
+                tarefa.proxima = tarefa.proxima_apos(agora)
+            self._empilhar(tarefa)
+            for quando, previsto in tarefa.recuperacoes:
+                heapq.heappush(self._heap, (quando, tarefa.chave, previsto))
+
+    def _empilhar(self, tarefa):
+        if tarefa.proxima is not None:
+            # previsto=None marca disparo regular; recuperações levam o horário perdido
+            heapq.heappush(self._heap, (tarefa.proxima, tarefa.chave, None))
+
+    def _reagendar(self, tarefa, agora):
+        proxima = tarefa.proxima_apos(agora)
+        if proxima != tarefa.proxima:
+            tarefa.proxima = proxima
+            self._empilhar(tarefa)
+
+    def _topo_valido(self):
+        """Descarta entradas obsoletas (tarefa removida ou reagendada) do topo do heap."""
+        while self._heap:
+            quando, chave, previsto = self._heap[0]
+            tarefa = self.tarefas.get(chave)
+            if tarefa is not None:
+                if previsto is None and tarefa.proxima == quando:
+                    return self._heap[0]
+                if previsto is not None and (quando, previsto) in tarefa.recuperacoes:
+                    return self._heap[0]
+            heapq.heappop(self._heap)
+        return None
+
+    def proximo_disparo(self):
+        topo = self._topo_valido()
+        return topo[0] if topo else None
+
+    def vencidas(self, agora):
+        """
+        Remove do heap as tarefas com disparo <= agora, já reagendadas.
+        Retorna [(previsto, tarefa, recuperacao)].
+        """
+        devidas = []
+        while True:
+            topo = self._topo_valido()
+            if topo is None or topo[0] > agora:
+                break
+            quando, chave, previsto = heapq.heappop(self._heap)
+            tarefa = self.tarefas[chave]
+            tarefa.ultima_execucao = agora
+            if previsto is not None:
+                tarefa.recuperacoes.discard((quando, previsto))
+            self._reagendar(tarefa, agora)
+            devidas.append((previsto or quando, tarefa, previsto is not None))
+        return devidas
+
+    def proximos(self, limite=None):
+        """Lista (quando, tarefa) em ordem de disparo, sem alterar a fila."""
+        itens = sorted(
+            (t.proxima, t.chave) for t in self.tarefas.values() if t.proxima is not None
+        )
+        if limite:
+            itens = itens[:limite]
+        return [(quando, self.tarefas[chave]) for quando, chave in itens]
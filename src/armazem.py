@@ -0,0 +1,162 @@
+"""
+Armazém local de versões dos arquivos instalados, endereçado por sha256
+(pasta cache/ na instalação):
+    cache/objetos/ab/abcdef…   conteúdo
+    cache/indice.json          {"objetos": {sha: {tamanho, ultimo_uso}},
+                                "historico": {nome: [sha mais recente, …]}}
+Antes de substituir um arquivo o updater guarda a versão instalada aqui;
+voltar para uma versão guardada é uma cópia local conferida pelo hash,
+sem tocar na rede. Cada arquivo mantém as últimas `max_versoes` versões e o
+total fica limitado a `max_bytes`, descartando primeiro as menos usadas.
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+
+from downloads import instalar
+
+PASTA = "cache"
+MAX_VERSOES = 3  # versões guardadas por arquivo (a instalada conta)
+MAX_BYTES = 300 * 1024 * 1024
+BLOCO = 1024 * 1024
+
+
+class Armazem:
+    def __init__(self, pasta, max_versoes=MAX_VERSOES, max_bytes=MAX_BYTES):
+        self.pasta = pasta
+        self.max_versoes = max_versoes
+        self.max_bytes = max_bytes
+        self.caminho_indice = os.path.join(pasta, "indice.json")
+        self._lock = threading.Lock()
+        self.indice = self._carregar()
+
+    def caminho_objeto(self, sha256):
+        return os.path.join(self.pasta, "objetos", sha256[:2], sha256)
+
+    def contem(self, sha256):
+        sha256 = (sha256 or "").strip().lower()
+        with self._lock:
+            return sha256 in self.indice["objetos"] and os.path.exists(self.caminho_objeto(sha256))
+
+    def guardar(self, caminho, sha256, nome):
+        """
+        Guarda `caminho` (cujo sha256 o chamador já conhece) como versão de `nome`.
+        Usa hard link quando possível: o updater sempre troca arquivos com
+        os.replace, então o conteúdo ligado nunca é alterado no lugar.
+        """
+        sha256 = sha256.strip().lower()
+        destino = self.caminho_objeto(sha256)
+        if not os.path.exists(destino):
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            temp = destino + ".tmp"
+            _remover(temp)
+            try:
+                os.link(caminho, temp)
+            except OSError:
+                shutil.copyfile(caminho, temp)
+            os.replace(temp, destino)
+        self._usar(sha256, nome, os.path.getsize(destino))
+
+    def restaurar(self, sha256, destino, nome):
+        """
+        Instala a versão guardada em `destino` (cópia + conferência do hash +
+        troca atômica). Retorna False se ela não está no armazém ou não confere.
+        """
+        sha256 = (sha256 or "").strip().lower()
+        if not self.contem(sha256):
+            return False
+        parcial = destino + ".cache"
+        h = hashlib.sha256()
+        try:
+            with open(self.caminho_objeto(sha256), "rb") as origem, open(parcial, "wb") as f:
+                for bloco in iter(lambda: origem.read(BLOCO), b""):
+                    f.write(bloco)
+                    h.update(bloco)
+                f.flush()
+                os.fsync(f.fileno())
+        except OSError:
+            _remover(parcial)
+            return False
+        if h.hexdigest() != sha256:
+            # Objeto corrompido no disco: descarta para não tentar de novo
+            _remover(parcial)
+            self.descartar(sha256)
+            return False
+        instalar(parcial, destino)
+        self._usar(sha256, nome, os.path.getsize(destino))
+        return True
+
+    def versoes(self, nome):
+        """sha256 guardados para `nome`, do mais recente para o mais antigo."""
+        with self._lock:
+            return list(self.indice["historico"].get(nome, []))
+
+    def descartar(self, sha256):
+        with self._lock:
+            self.indice["objetos"].pop(sha256, None)
+            for nome, historico in self.indice["historico"].items():
+                self.indice["historico"][nome] = [h for h in historico if h != sha256]
+        _remover(self.caminho_objeto(sha256))
+
+    def podar(self):
+        """Aplica max_versoes por arquivo e max_bytes no total (LRU). Retorna quantos objetos saíram."""
+        with self._lock:
+            for nome, historico in self.indice["historico"].items():
+                self.indice["historico"][nome] = historico[:self.max_versoes]
+            referenciados = {h for historico in self.indice["historico"].values() for h in historico}
+            objetos = self.indice["objetos"]
+            sair = [sha for sha in objetos if sha not in referenciados]
+            total = sum(o["tamanho"] for sha, o in objetos.items() if sha in referenciados)
+            for sha in sorted(referenciados & set(objetos), key=lambda s: objetos[s]["ultimo_uso"]):
+                if total <= self.max_bytes:
+                    break
+                sair.append(sha)
+                total -= objetos[sha]["tamanho"]
+        for sha in sair:
+            self.descartar(sha)
+        return len(sair)
+
+    def tamanho_total(self):
+        with self._lock:
+            return sum(o["tamanho"] for o in self.indice["objetos"].values())
+
+    def salvar(self):
+        with self._lock:
+            dados = json.loads(json.dumps(self.indice))
+        temp = self.caminho_indice + ".tmp"
+        try:
+            os.makedirs(self.pasta, exist_ok=True)
+            with open(temp, "w", encoding="utf-8") as f:
+                json.dump(dados, f, indent=2)
+            os.replace(temp, self.caminho_indice)
+        except Exception as e:
+            print(f"⚠️ Falha ao gravar {self.caminho_indice}: {e}")
+
+    def _usar(self, sha256, nome, tamanho):
+        """Marca o uso (LRU) e põe a versão no topo do histórico de `nome`."""
+        with self._lock:
+            self.indice["objetos"][sha256] = {"tamanho": tamanho, "ultimo_uso": time.time()}
+            historico = [h for h in self.indice["historico"].get(nome, []) if h != sha256]
+            self.indice["historico"][nome] = [sha256] + historico
+
+    def _carregar(self):
+        try:
+            with open(self.caminho_indice, "r", encoding="utf-8") as f:
+                dados = json.load(f)
+            if isinstance(dados.get("objetos"), dict) and isinstance(dados.get("historico"), dict):
+                return dados
+        except Exception:
+            pass
+        return {"objetos": {}, "historico": {}}
+
+
+def _remover(caminho):
+    try:
+        os.remove(caminho)
+    except OSError:
+        # Inexistente, ou aberto por outro processo no Windows (fica órfão até a próxima poda)
+        pass
@@ -0,0 +1,147 @@
+"""
+Captura da saída (stdout + stderr) dos jobs do launcher.
+Uma thread lê o pipe do processo sem bloquear o launcher e grava em
+logs/jobs/<job>/<AAAAMMDD-HHMMSS>/saida.N.log, em segmentos de tamanho fixo
+mantidos como buffer circular (só os últimos segmentos ficam no disco).
+Os últimos KB também ficam em memória para o diário de execuções.
+"""
+
+import os
+import shutil
+import threading
+from datetime import datetime
+
+SEGMENTO_KB = 256
+MAX_SEGMENTOS = 4
+CAUDA_KB = 2
+RETENCAO_EXECUCOES = 10  # pastas de execução mantidas por job
+
+# Saída do cmd.exe usa a code page OEM (cp850 em PT-BR)
+CODIFICACAO = "oem" if os.name == "nt" else "utf-8"
+
+
+class CapturaSaida:
+    def __init__(self, diretorio_job, segmento_kb=SEGMENTO_KB, max_segmentos=MAX_SEGMENTOS,
+                 cauda_kb=CAUDA_KB, retencao=RETENCAO_EXECUCOES):
+        self.diretorio_job = diretorio_job
+        self.diretorio = os.path.join(diretorio_job, datetime.now().strftime("%Y%m%d-%H%M%S"))
+        self.segmento_bytes = max(1, segmento_kb) * 1024
+        self.max_segmentos = max(1, max_segmentos)
+        self.cauda_bytes = max(0, cauda_kb) * 1024
+        self.retencao = max(1, retencao)
+        self.total_bytes = 0
+        self._cauda = bytearray()
+        self._segmento = 0
+        self._arquivo = None
+        self._escritos = 0
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def iniciar(self, pipe):
+        base, n = self.diretorio, 1
+        while os.path.exists(self.diretorio):
+            n += 1
+            self.diretorio = f"{base}-{n}"
+        os.makedirs(self.diretorio)
+        self._abrir_segmento()
+        self._thread = threading.Thread(target=self._ler, args=(pipe,), daemon=True)
+        self._thread.start()
+
+    def finalizar(self, timeout=10):
+        """Aguarda o fim da leitura (EOF) e aplica a retenção de execuções antigas."""
+        if self._thread:
+            # Um neto que herdou o pipe pode mantê-lo aberto; não trava o launcher por isso
+            self._thread.join(timeout)
+        with self._lock:
+            if self._arquivo:
+                self._arquivo.close()
+                self._arquivo = None
+        self._aplicar_retencao()
+
+    def cauda(self):
+        with self._lock:
+            return bytes(self._cauda).decode(CODIFICACAO, errors="replace")
+
+    # -----------------------------
+    # Internos
+    # -----------------------------
+    def _ler(self, pipe):
+        try:
+            while True:
+                bloco = pipe.read1(65536) if hasattr(pipe, "read1") else pipe.read(65536)
+                if not bloco:
+                    break
+                self._gravar(bloco)
+        except Exception as e:
+            self._gravar(f"\n[captura interrompida: {e}]\n".encode("utf-8"))
+        finally:
+            try:
+                pipe.close()
+            except Exception:
+                pass
+
+    def _gravar(self, bloco):
+        with self._lock:
+            self.total_bytes += len(bloco)
+            if self.cauda_bytes:
+                self._cauda += bloco
+                if len(self._cauda) > self.cauda_bytes:
+                    del self._cauda[:len(self._cauda) - self.cauda_bytes]
+            while bloco and self._arquivo:
+                livre = self.segmento_bytes - self._escritos
+                parte, bloco = bloco[:livre], bloco[livre:]
+                self._arquivo.write(parte)
+                self._arquivo.flush()
+                self._escritos += len(parte)
+                if self._escritos >= self.segmento_bytes:
+                    self._abrir_segmento()
+
+    def _abrir_segmento(self):
+        if self._arquivo:
+            self._arquivo.close()
+        self._segmento += 1
+        self._escritos = 0
+        self._arquivo = open(os.path.join(self.diretorio, f"saida.{self._segmento}.log"), "wb")
+        # Buffer circular: descarta o segmento mais antigo
+        antigo = self._segmento - self.max_segmentos
+        if antigo >= 1:
+            try:
+                os.remove(os.path.join(self.diretorio, f"saida.{antigo}.log"))
+            except OSError:
+                pass
+
+    def _aplicar_retencao(self):
+        try:
+            execucoes = sorted(
+                d for d in os.listdir(self.diretorio_job)
+                if os.path.isdir(os.path.join(self.diretorio_job, d))
+            )
+            for d in execucoes[:-self.retencao]:
+                shutil.rmtree(os.path.join(self.diretorio_job, d), ignore_errors=True)
+        except Exception:
+            pass
+
+
+def ultima_saida(diretorio_job, max_bytes=CAUDA_KB * 1024):
+    """Últimos bytes gravados na execução mais recente de um job (usado pelo painel)."""
+    try:
+        execucoes = sorted(
+            d for d in os.listdir(diretorio_job)
+            if os.path.isdir(os.path.join(diretorio_job, d))
+        )
+        if not execucoes:
+            return ""
+        pasta = os.path.join(diretorio_job, execucoes[-1])
+        segmentos = sorted(
+            (f for f in os.listdir(pasta) if f.startswith("saida.")),
+            key=lambda f: int(f.split(".")[1]),
+        )
+        dados = b""
+        for seg in reversed(segmentos):
+            with open(os.path.join(pasta, seg), "rb") as f:
+                dados = f.read() + dados
+            if len(dados) >= max_bytes:
+                break
+        return dados[-max_bytes:].decode(CODIFICACAO, errors="replace")
+    except Exception:
+        return ""
@@ -0,0 +1,217 @@
+"""
+Cliente do config.json remoto com requisições condicionais.
+Guarda os validadores (ETag / Last-Modified / sha256 do conteúdo) em
+config_cache.meta.json, ao lado do config_cache.json, e só reprocessa e
+regrava o cache quando o conteúdo realmente muda.
+As requisições passam pelo disjuntor de rede.py: com o GitHub fora do ar,
+obter() falha na hora (CircuitoAberto) e o chamador usa o cache.
+Com `espelho` (URL do config no servidor da loja, espelho.py), consulta
+primeiro o espelho e só vai ao GitHub se ele falhar.
+Pede Accept-Encoding: gzip; os hashes são sempre do JSON descompactado.
+"""
+
+import os
+import gzip
+import json
+import hashlib
+import threading
+import urllib.request
+import urllib.error
+
+from rede import RedeResiliente, caminho_estado
+
+SALVAR_CONTADORES_A_CADA = 30  # consultas sem mudança entre gravações do .meta.json
+
+
+def caminho_meta(cache_path):
+    return os.path.splitext(cache_path)[0] + ".meta.json"
+
+
+class ClienteConfig:
+    """
+    obter() retorna (config, mudou). Em 304 ou conteúdo com o mesmo hash,
+    devolve a cópia já carregada sem parse e sem gravar o cache.
+    Erros de rede são repassados ao chamador, que decide o fallback (ler_cache()).
+    """
+
+    def __init__(self, url, cache_path, timeout=10, rede=None, espelho=None):
+        self.url = url
+        self.espelho = espelho
+        self.origem = None  # URL que respondeu à última consulta
+        self.falha_espelho = None  # último erro do espelho (diagnóstico)
+        self.cache_path = cache_path
+        self.meta_path = caminho_meta(cache_path)
+        self.timeout = timeout
+        self.rede = rede or RedeResiliente(caminho_estado(os.path.dirname(cache_path)))
+        self.config = None
+        self._lock = threading.Lock()
+        self._consultas_sem_gravar = 0
+        self.meta = self._carregar_meta()
+        self.contadores = self.meta.setdefault("contadores", {
+            "hits_304": 0,
+            "hits_hash": 0,
+            "misses": 0,
+            "bytes_economizados": 0,
+        })
+
+    # -----------------------------
+    # API
+    # -----------------------------
+    def obter(self):
+        with self._lock:
+            if self.espelho:
+                try:
+                    return self._obter_de(self.espelho)
+                except Exception as e:
+                    # Espelho fora do ar ou desatualizado (503): segue para o GitHub
+                    self.falha_espelho = e
+            return self._obter_de(self.url)
+
+    def ler_cache(self):
+        """Retorna o config em memória ou, se ainda não carregado, o config_cache.json."""
+        with self._lock:
+            if self.config is not None:
+                return self.config
+            try:
+                with open(self.cache_path, "r", encoding="utf-8") as f:
+                    self.config = json.load(f)
+            except Exception:
+                return None
+            return self.config
+
+    # -----------------------------
+    # Internos
+    # -----------------------------
+    def _obter_de(self, url):
+        req = urllib.request.Request(url, headers=self._cabecalhos())
+        try:
+            with self.rede.urlopen(req, timeout=self.timeout) as resp:
+                corpo = _corpo(resp)
+                etag = resp.headers.get("ETag")
+                modificado = resp.headers.get("Last-Modified")
+        except urllib.error.HTTPError as e:
+            if e.code != 304:
+                raise
+            self.origem = url
+            cfg = self._config_local()
+            if cfg is None:
+                # Temos validadores mas perdemos o cache: força download completo
+                self.meta.pop("etag", None)
+                self.meta.pop("last_modified", None)
+                return self._obter_sem_validadores(url)
+            self.contadores["hits_304"] += 1
+            self.contadores["bytes_economizados"] += self.meta.get("tamanho", 0)
+            self._talvez_salvar_contadores()
+            return cfg, False
+
+        self.origem = url
+        return self._processar(corpo, etag, modificado)
+
+    def _obter_sem_validadores(self, url):
+        req = urllib.request.Request(url, headers={"Accept-Encoding": "gzip"})
+        with self.rede.urlopen(req, timeout=self.timeout) as resp:
+            return self._processar(_corpo(resp), resp.headers.get("ETag"), resp.headers.get("Last-Modified"))
+
+    def _processar(self, corpo, etag, modificado):
+        digest = hashlib.sha256(corpo).hexdigest()
+        if digest == self.meta.get("sha256"):
+            cfg = self._config_local()
+            if cfg is not None:
+                self.contadores["hits_hash"] += 1
+                if etag != self.meta.get("etag") or modificado != self.meta.get("last_modified"):
+                    self.meta["etag"] = etag
+                    self.meta["last_modified"] = modificado
+                    self._salvar_meta()
+                else:
+                    self._talvez_salvar_contadores()
+                return cfg, False
+
+        cfg = json.loads(corpo.decode())
+        texto = json.dumps(cfg, indent=2).encode("utf-8")
+        _gravar_atomico(self.cache_path, texto)
+        self.config = cfg
+        self.meta.update({
+            "etag": etag,
+            "last_modified": modificado,
+            "sha256": digest,
+            "sha256_cache": hashlib.sha256(texto).hexdigest(),
+            "tamanho": len(corpo),
+        })
+        self.contadores["misses"] += 1
+        self._salvar_meta()
+        return cfg, True
+
+    def _config_local(self):
+        """Config correspondente aos validadores: memória ou cache em disco (conferindo o hash)."""
+        if self.config is not None:
+            return self.config
+        try:
+            with open(self.cache_path, "rb") as f:
+                conteudo = f.read()
+            cfg = json.loads(conteudo.decode())
+        except Exception:
+            return None
+        # O cache é regravado com indent, então o hash do arquivo não é o do corpo remoto;
+        # conferimos pelo hash registrado no momento da escrita (outro processo pode ter regravado).
+        if self.meta.get("sha256_cache") not in (None, hashlib.sha256(conteudo).hexdigest()):
+            return None
+        self.config = cfg
+        return cfg
+
+    def _cabecalhos(self):
+        headers = {"Accept-Encoding": "gzip"}
+        if self._config_local() is None:
+            return headers
+        if self.meta.get("etag"):
+            headers["If-None-Match"] = self.meta["etag"]
+        if self.meta.get("last_modified"):
+            headers["If-Modified-Since"] = self.meta["last_modified"]
+        return headers
+
+    def _carregar_meta(self):
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    def _talvez_salvar_contadores(self):
+        self._consultas_sem_gravar += 1
+        if self._consultas_sem_gravar >= SALVAR_CONTADORES_A_CADA:
+            self._salvar_meta()
+
+    def _salvar_meta(self):
+        self._consultas_sem_gravar = 0
+        try:
+            _gravar_atomico(self.meta_path, json.dumps(self.meta, indent=2).encode("utf-8"))
+        except Exception as e:
+            print(f"⚠️ Falha ao gravar {self.meta_path}: {e}")
+
+
+def _gravar_atomico(caminho, dados):
+    """
+    Temporário (por processo: launcher, painel e updater usam o mesmo cache) +
+    fsync + os.replace: queda de energia no meio da gravação não corrompe o
+    único config de fallback da loja.
+    """
+    temp = f"{caminho}.{os.getpid()}.tmp"
+    try:
+        with open(temp, "wb") as f:
+            f.write(dados)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, caminho)
+    except Exception:
+        try:
+            os.remove(temp)
+        except OSError:
+            pass
+        raise
+
+
+def _corpo(resp):
+    """Corpo da resposta, descompactado se o servidor usou Content-Encoding: gzip."""
+    corpo = resp.read()
+    if (resp.headers.get("Content-Encoding") or "").strip().lower() in ("gzip", "x-gzip"):
+        return gzip.decompress(corpo)
+    return corpo
@@ -0,0 +1,126 @@
+"""
+Canal de controle local entre o painel e o launcher (serviço).
+TCP em 127.0.0.1, uma requisição JSON por linha:
+    {"token": "...", "comando": "status", "args": {...}}
+e uma resposta JSON por linha:
+    {"ok": true, "dados": ...}  ou  {"ok": false, "erro": "..."}
+O launcher gera um token aleatório a cada início e grava em controle.token
+na pasta de instalação; só quem consegue ler esse arquivo fala com ele.
+"""
+
+import os
+import json
+import hmac
+import socket
+import secrets
+import threading
+import socketserver
+
+PORTA_PADRAO = 9465
+TIMEOUT_PADRAO = 3
+MAX_LINHA = 64 * 1024
+
+
+class ErroControle(Exception):
+    """O launcher respondeu, mas recusou ou falhou o comando."""
+
+
+class LauncherOcupado(Exception):
+    """O launcher está no ar (a porta atendeu), mas não respondeu dentro do timeout."""
+
+
+def gerar_token(caminho):
+    token = secrets.token_hex(16)
+    temp = caminho + ".tmp"
+    with open(temp, "w", encoding="utf-8") as f:
+        f.write(token)
+    os.replace(temp, caminho)
+    return token
+
+
+class ServidorControle:
+    """
+    comandos: {nome: funcao(**args) -> dados serializáveis em JSON}.
+    Cada conexão é atendida numa thread; exceções viram {"ok": false}.
+    """
+
+    def __init__(self, token, comandos, porta=PORTA_PADRAO, host="127.0.0.1"):
+        self.token = token
+        self.comandos = comandos
+        self.endereco = (host, porta)
+        self._servidor = None
+
+    def iniciar(self):
+        controle = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            timeout = 30
+
+            def handle(self):
+                while True:
+                    linha = self.rfile.readline(MAX_LINHA)
+                    if not linha:
+                        return
+                    resposta = controle.atender(linha)
+                    self.wfile.write(json.dumps(resposta, ensure_ascii=False).encode("utf-8") + b"\n")
+
+        class Servidor(socketserver.ThreadingTCPServer):
+            daemon_threads = True
+            allow_reuse_address = False
+
+        self._servidor = Servidor(self.endereco, Handler)
+        threading.Thread(target=self._servidor.serve_forever, name="controle", daemon=True).start()
+
+    def atender(self, linha):
+        try:
+            req = json.loads(linha.decode("utf-8"))
+        except Exception:
+            return {"ok": False, "erro": "requisição inválida"}
+        if not hmac.compare_digest(str(req.get("token", "")), self.token):
+            return {"ok": False, "erro": "token inválido"}
+        funcao = self.comandos.get(req.get("comando"))
+        if funcao is None:
+            return {"ok": False, "erro": f"comando desconhecido: {req.get('comando')}"}
+        try:
+            return {"ok": True, "dados": funcao(**(req.get("args") or {}))}
+        except Exception as e:
+            return {"ok": False, "erro": str(e)}
+
+    def parar(self):
+        if self._servidor:
+            self._servidor.shutdown()
+            self._servidor.server_close()
+            self._servidor = None
+
+
+class ClienteControle:
+    """
+    chamar(comando, **args) -> dados. OSError (conexão recusada) indica
+    launcher fora do ar; LauncherOcupado, que ele não respondeu a tempo (não
+    é motivo para o painel fazer o trabalho no lugar dele); ErroControle,
+    que ele recusou o comando.
+    """
+
+    def __init__(self, caminho_token, porta=PORTA_PADRAO, host="127.0.0.1", timeout=TIMEOUT_PADRAO):
+        self.caminho_token = caminho_token
+        self.endereco = (host, porta)
+        self.timeout = timeout
+
+    def chamar(self, comando, **args):
+        # Relê o token a cada chamada: o launcher gera outro quando reinicia
+        with open(self.caminho_token, "r", encoding="utf-8") as f:
+            token = f.read().strip()
+        req = json.dumps({"token": token, "comando": comando, "args": args}).encode("utf-8") + b"\n"
+        try:
+            with socket.create_connection(self.endereco, timeout=self.timeout) as s:
+                s.sendall(req)
+                with s.makefile("rb") as r:
+                    linha = r.readline(MAX_LINHA * 16)
+        except socket.timeout:
+            raise LauncherOcupado(f"launcher não respondeu '{comando}' em {self.timeout}s")
+        if not linha:
+            raise ConnectionError("launcher encerrou a conexão sem responder")
+        resposta = json.loads(linha.decode("utf-8"))
+        if not resposta.get("ok"):
+            raise ErroControle(resposta.get("erro") or "erro desconhecido")
+        return resposta.get("dados")
@@ -0,0 +1,158 @@
+"""
+Expressões no estilo cron ("min hora dia mês dia-da-semana") compiladas em
+bitsets: cada campo vira um inteiro onde o bit N indica que o valor N é
+aceito. O teste de um horário é O(1) e o próximo disparo é encontrado
+pulando direto para o próximo bit ligado de cada campo.
+
+Aceita *, listas (1,15), faixas (8-19), passos (*/15, 8-20/2) e nomes
+(jan..dec / jan..dez, sun..sat / dom..sab). Dia da semana: 0 ou 7 = domingo.
+Se dia do mês e dia da semana forem ambos restritos, vale qualquer um
+(mesma regra do cron tradicional).
+"""
+
+from datetime import datetime, timedelta
+
+MESES = {n: i for i, n in enumerate(
+    ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"], start=1)}
+MESES.update({"fev": 2, "abr": 4, "mai": 5, "ago": 8, "set": 9, "out": 10, "dez": 12})
+SEMANA = {n: i for i, n in enumerate(["sun", "mon", "tue", "wed", "thu", "fri", "sat"])}
+SEMANA.update({"dom": 0, "seg": 1, "ter": 2, "qua": 3, "qui": 4, "sex": 5, "sab": 6})
+
+# (mínimo, máximo, nomes) de cada campo
+CAMPOS = [
+    (0, 59, None),
+    (0, 23, None),
+    (1, 31, None),
+    (1, 12, MESES),
+    (0, 7, SEMANA),
+]
+
+MAX_PASSOS = 366 * 5 * 4  # ~5 anos (cobre 29/02); no máximo ~4 saltos por dia
+
+
+def bits(valores):
+    mascara = 0
+    for v in valores:
+        mascara |= 1 << v
+    return mascara
+
+
+def proximo_bit(mascara, a_partir):
+    """Menor valor >= a_partir com bit ligado (ou None)."""
+    resto = mascara >> a_partir
+    if not resto:
+        return None
+    return a_partir + (resto & -resto).bit_length() - 1
+
+
+def _valor(texto, nomes):
+    texto = texto.strip().lower()
+    if nomes and texto in nomes:
+        return nomes[texto]
+    return int(texto)
+
+
+def _parse_campo(texto, minimo, maximo, nomes):
+    mascara = 0
+    for parte in texto.split(","):
+        passo = 1
+        if "/" in parte:
+            parte, passo_txt = parte.split("/", 1)
+            passo = int(passo_txt)
+            if passo < 1:
+                raise ValueError(f"passo inválido em '{texto}'")
+        if parte in ("*", ""):
+            inicio, fim = minimo, maximo
+        elif "-" in parte:
+            a, b = parte.split("-", 1)
+            inicio, fim = _valor(a, nomes), _valor(b, nomes)
+        else:
+            inicio = _valor(parte, nomes)
+            fim = maximo if passo > 1 else inicio
+        if not (minimo <= inicio <= maximo and minimo <= fim <= maximo and inicio <= fim):
+            raise ValueError(f"valor fora da faixa {minimo}-{maximo} em '{texto}'")
+        mascara |= bits(range(inicio, fim + 1, passo))
+    return mascara
+
+
+class ExpressaoCron:
+    def __init__(self, minutos, horas, dias, meses, semana, dia_restrito=False, semana_restrita=False, texto=None):
+        self.minutos = minutos
+        self.horas = horas
+        self.dias = dias
+        self.meses = meses
+        self.semana = semana
+        self.dia_restrito = dia_restrito
+        self.semana_restrita = semana_restrita
+        self.texto = texto
+
+    @classmethod
+    def parse(cls, texto):
+        campos = texto.split()
+        if len(campos) != 5:
+            raise ValueError(f"cron '{texto}' deve ter 5 campos (min hora dia mês semana)")
+        mascaras = [_parse_campo(c, *CAMPOS[i]) for i, c in enumerate(campos)]
+        semana = mascaras[4]
+        if semana & (1 << 7):  # 7 também é domingo
+            semana = (semana | 1) & ~(1 << 7)
+        return cls(
+            mascaras[0], mascaras[1], mascaras[2], mascaras[3], semana,
+            dia_restrito=campos[2] != "*", semana_restrita=campos[4] != "*", texto=texto,
+        )
+
+    @classmethod
+    def de_campos(cls, minutos, horas, dias=None, meses=None):
+        """Forma compilada dos campos antigos do config (horario/dia/mes)."""
+        return cls(
+            bits(minutos), bits(horas),
+            bits(dias) if dias else bits(range(1, 32)),
+            bits(meses) if meses else bits(range(1, 13)),
+            bits(range(7)),
+            dia_restrito=bool(dias),
+        )
+
+    def dia_corresponde(self, dia):
+        if not (self.meses >> dia.month) & 1:
+            return False
+        no_mes = (self.dias >> dia.day) & 1
+        na_semana = (self.semana >> ((dia.weekday() + 1) % 7)) & 1
+        if self.dia_restrito and self.semana_restrita:
+            return bool(no_mes or na_semana)
+        return bool(no_mes and na_semana)
+
+    def corresponde(self, momento):
+        return (
+            (self.minutos >> momento.minute) & 1
+            and (self.horas >> momento.hour) & 1
+            and self.dia_corresponde(momento)
+        )
+
+    def proxima_apos(self, depois_de):
+        """Primeiro minuto estritamente depois de `depois_de` que corresponde à expressão."""
+        t = depois_de.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        for _ in range(MAX_PASSOS):
+            if not (self.meses >> t.month) & 1:
+                mes = proximo_bit(self.meses, t.month + 1)
+                if mes is None:
+                    t = datetime(t.year + 1, proximo_bit(self.meses, 1), 1)
+                else:
+                    t = datetime(t.year, mes, 1)
+                continue
+            if not self.dia_corresponde(t):
+                t = datetime(t.year, t.month, t.day) + timedelta(days=1)
+                continue
+            hora = proximo_bit(self.horas, t.hour)
+            if hora is None:
+                t = datetime(t.year, t.month, t.day) + timedelta(days=1)
+                continue
+            if hora != t.hour:
+                t = t.replace(hour=hora, minute=0)
+            minuto = proximo_bit(self.minutos, t.minute)
+            if minuto is None:
+                t = t.replace(minute=0) + timedelta(hours=1)
+                continue
+            return t.replace(minute=minuto)
+        return None
+
+    def __repr__(self):
+        return f"ExpressaoCron({self.texto!r})" if self.texto else "ExpressaoCron(<campos>)"
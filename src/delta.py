@@ -0,0 +1,276 @@
+"""
+Patches binários por bloco entre duas versões de um executável.
+O arquivo .delta é um cabeçalho JSON (hash de origem/destino, tamanho) seguido
+de uma sequência de operações comprimida com xz:
+    C <offset> <tamanho>   copia um trecho do arquivo instalado
+    D <tamanho> <bytes>    insere bytes novos
+    F                      fim
+Os trechos copiados são achados indexando o arquivo antigo em blocos de
+BLOCO bytes e procurando cada bloco no novo em qualquer deslocamento
+(inserções no meio do .exe não invalidam o resto).
+
+Uso (geração, na máquina de build):
+    python delta.py gerar dist_anterior\\launcher.exe dist\\launcher.exe launcher.delta
+    python delta.py gerar dist_anterior dist deltas      (todos os arquivos com o mesmo nome)
+Imprime o trecho "deltas" para colar no item de "arquivos" do config.json.
+"""
+
+import os
+import sys
+import json
+import lzma
+import struct
+import hashlib
+import argparse
+
+from manifesto import sha256_arquivo
+
+MAGICO = b"MBKPDELTA1\n"
+BLOCO = 1024  # granularidade do índice do arquivo antigo
+COMPARACAO = 64 * 1024  # ao estender um trecho igual, compara de tanto em tanto
+LEITURA = 1024 * 1024
+LITERAL_MAX = 1024 * 1024  # divide inserções grandes em várias operações D
+
+OP_COPIA = b"C"
+OP_DADOS = b"D"
+OP_FIM = b"F"
+_COPIA = struct.Struct(">QI")
+_DADOS = struct.Struct(">I")
+
+
+class ErroDelta(Exception):
+    """Patch inválido, ou o resultado não confere com o hash esperado."""
+
+
+def sha256_bytes(dados):
+    return hashlib.sha256(dados).hexdigest()
+
+
+# -----------------------------
+# Geração
+# -----------------------------
+def _indexar(antigo, bloco):
+    indice = {}
+    for offset in range(0, len(antigo) - bloco + 1, bloco):
+        indice.setdefault(antigo[offset:offset + bloco], offset)
+    return indice
+
+
+def _estender(antigo, o, novo, p):
+    """Quantos bytes iguais a partir de antigo[o:] e novo[p:]."""
+    n = 0
+    limite = min(len(antigo) - o, len(novo) - p)
+    passo = COMPARACAO
+    while n < limite:
+        passo = min(passo, limite - n)
+        if antigo[o + n:o + n + passo] == novo[p + n:p + n + passo]:
+            n += passo
+        elif passo == 1:
+            break
+        else:
+            passo //= 2
+    return n
+
+
+def operacoes(antigo, novo, bloco=BLOCO):
+    """Gera ("C", offset, tamanho) e ("D", bytes) que reconstroem `novo` a partir de `antigo`."""
+    indice = _indexar(antigo, bloco)
+    p = 0
+    literal_inicio = 0
+    copia = None  # (offset, tamanho) pendente, para juntar cópias contíguas
+    while p + bloco <= len(novo):
+        o = indice.get(novo[p:p + bloco])
+        if o is None:
+            p += 1
+            continue
+        # Recua sobre o literal acumulado enquanto os bytes anteriores também batem
+        recuo = 0
+        while recuo < min(p - literal_inicio, o) and antigo[o - recuo - 1] == novo[p - recuo - 1]:
+            recuo += 1
+        o, p = o - recuo, p - recuo
+        if p > literal_inicio:
+            if copia:
+                yield ("C",) + copia
+                copia = None
+            for i in range(literal_inicio, p, LITERAL_MAX):
+                yield ("D", novo[i:min(p, i + LITERAL_MAX)])
+        tamanho = _estender(antigo, o, novo, p)
+        if copia and copia[0] + copia[1] == o:
+            copia = (copia[0], copia[1] + tamanho)
+        else:
+            if copia:
+                yield ("C",) + copia
+            copia = (o, tamanho)
+        p += tamanho
+        literal_inicio = p
+    if copia:
+        yield ("C",) + copia
+    for i in range(literal_inicio, len(novo), LITERAL_MAX):
+        yield ("D", novo[i:i + LITERAL_MAX])
+
+
+def gerar(caminho_antigo, caminho_novo, caminho_delta, bloco=BLOCO):
+    """Grava o .delta e devolve {"de", "para", "tamanho", "tamanho_delta", "copiados", "inseridos"}."""
+    with open(caminho_antigo, "rb") as f:
+        antigo = f.read()
+    with open(caminho_novo, "rb") as f:
+        novo = f.read()
+    cabecalho = {"de": sha256_bytes(antigo), "para": sha256_bytes(novo), "tamanho": len(novo), "bloco": bloco}
+    copiados = inseridos = 0
+    temp = caminho_delta + ".tmp"
+    with open(temp, "wb") as bruto:
+        bruto.write(MAGICO)
+        bruto.write(json.dumps(cabecalho).encode("utf-8") + b"\n")
+        with lzma.open(bruto, "wb", preset=9) as z:
+            for op in operacoes(antigo, novo, bloco):
+                if op[0] == "C":
+                    z.write(OP_COPIA + _COPIA.pack(op[1], op[2]))
+                    copiados += op[2]
+                else:
+                    z.write(OP_DADOS + _DADOS.pack(len(op[1])) + op[1])
+                    inseridos += len(op[1])
+            z.write(OP_FIM)
+    os.replace(temp, caminho_delta)
+    cabecalho.update(tamanho_delta=os.path.getsize(caminho_delta), copiados=copiados, inseridos=inseridos)
+    return cabecalho
+
+
+# -----------------------------
+# Aplicação
+# -----------------------------
+def ler_cabecalho(caminho_delta):
+    with open(caminho_delta, "rb") as f:
+        return _ler_cabecalho(f)
+
+
+def _ler_cabecalho(f):
+    if f.read(len(MAGICO)) != MAGICO:
+        raise ErroDelta("arquivo não é um delta do MonitoramentoBKP")
+    try:
+        return json.loads(f.readline().decode("utf-8"))
+    except ValueError as e:
+        raise ErroDelta(f"cabeçalho do delta inválido: {e}")
+
+
+def _ler_exato(f, n):
+    dados = f.read(n)
+    if len(dados) != n:
+        raise ErroDelta("delta truncado")
+    return dados
+
+
+def aplicar(caminho_base, caminho_delta, saida, sha256=None):
+    """
+    Reconstrói a versão nova em `saida` lendo trechos de `caminho_base`.
+    Confere tamanho e sha256 (o do cabeçalho, ou `sha256` se informado);
+    em qualquer divergência apaga `saida` e levanta ErroDelta.
+    Retorna o sha256 do resultado.
+    """
+    try:
+        with open(caminho_delta, "rb") as bruto, open(caminho_base, "rb") as base, open(saida, "wb") as out:
+            cabecalho = _ler_cabecalho(bruto)
+            esperado = str(sha256 or cabecalho.get("para") or "").strip().lower()
+            h = hashlib.sha256()
+            escritos = 0
+            with lzma.open(bruto, "rb") as z:
+                while True:
+                    op = z.read(1)
+                    if op == OP_FIM:
+                        break
+                    if op == OP_COPIA:
+                        offset, tamanho = _COPIA.unpack(_ler_exato(z, _COPIA.size))
+                        base.seek(offset)
+                        while tamanho:
+                            trecho = base.read(min(tamanho, LEITURA))
+                            if not trecho:
+                                raise ErroDelta("delta copia além do fim do arquivo instalado")
+                            out.write(trecho)
+                            h.update(trecho)
+                            escritos += len(trecho)
+                            tamanho -= len(trecho)
+                    elif op == OP_DADOS:
+                        (tamanho,) = _DADOS.unpack(_ler_exato(z, _DADOS.size))
+                        trecho = _ler_exato(z, tamanho)
+                        out.write(trecho)
+                        h.update(trecho)
+                        escritos += tamanho
+                    else:
+                        raise ErroDelta("delta truncado" if not op else f"operação desconhecida no delta: {op!r}")
+            out.flush()
+            os.fsync(out.fileno())
+        if cabecalho.get("tamanho") is not None and escritos != cabecalho["tamanho"]:
+            raise ErroDelta(f"resultado com {escritos} bytes, esperado {cabecalho['tamanho']}")
+        digest = h.hexdigest()
+        if esperado and digest != esperado:
+            raise ErroDelta(f"sha256 do resultado {digest} não confere (esperado {esperado})")
+        return digest
+    except (lzma.LZMAError, EOFError, struct.error) as e:
+        _remover(saida)
+        raise ErroDelta(f"delta corrompido: {e}")
+    except Exception:
+        _remover(saida)
+        raise
+
+
+def _remover(caminho):
+    try:
+        os.remove(caminho)
+    except FileNotFoundError:
+        pass
+
+
+# -----------------------------
+# Linha de comando (máquina de build)
+# -----------------------------
+def _pares(antigo, novo, saida):
+    if not os.path.isdir(novo):
+        yield antigo, novo, saida
+        return
+    os.makedirs(saida, exist_ok=True)
+    for nome in sorted(os.listdir(novo)):
+        a, n = os.path.join(antigo, nome), os.path.join(novo, nome)
+        if os.path.isfile(a) and os.path.isfile(n):
+            yield a, n, os.path.join(saida, os.path.splitext(nome)[0] + ".delta")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Deltas binários do MonitoramentoBKP")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    g = sub.add_parser("gerar", help="gera o delta entre duas builds (arquivos ou pastas)")
+    g.add_argument("antigo")
+    g.add_argument("novo")
+    g.add_argument("saida", help="arquivo .delta (ou pasta, se antigo/novo forem pastas)")
+    g.add_argument("--bloco", type=int, default=BLOCO)
+    g.add_argument("--url-base", default="", help="prefixo das URLs no trecho de config impresso")
+    a = sub.add_parser("aplicar", help="reconstrói a versão nova (para conferir um delta)")
+    a.add_argument("base")
+    a.add_argument("delta")
+    a.add_argument("saida")
+    args = parser.parse_args(argv)
+
+    if args.comando == "aplicar":
+        print(aplicar(args.base, args.delta, args.saida))
+        return 0
+
+    trechos = {}
+    for antigo, novo, saida in _pares(args.antigo, args.novo, args.saida):
+        r = gerar(antigo, novo, saida, args.bloco)
+        nome = os.path.basename(novo)
+        if r["de"] == r["para"]:
+            os.remove(saida)
+            print(f"= {nome}: sem mudanças", file=sys.stderr)
+            continue
+        print(f"✔ {nome}: {r['tamanho']} → {r['tamanho_delta']} bytes "
+              f"({r['tamanho_delta'] * 100 / max(1, r['tamanho']):.1f}%)", file=sys.stderr)
+        trechos[nome] = {"sha256": r["para"], "tamanho": r["tamanho"], "deltas": [{
+            "de": r["de"],
+            "url": args.url_base + os.path.basename(saida),
+            "sha256": sha256_arquivo(saida),
+            "tamanho": r["tamanho_delta"],
+        }]}
+    print(json.dumps(trechos, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
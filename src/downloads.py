@@ -0,0 +1,493 @@
+"""
+Motor de downloads do updater e do instalador.
+Cada thread mantém uma conexão HTTP(S) persistente por host (keep-alive):
+vários arquivos do mesmo release reaproveitam o mesmo handshake TLS, inclusive
+no host para onde o GitHub redireciona os assets. O paralelismo fica a cargo
+de quem chama (ThreadPoolExecutor no updater); este módulo só garante que
+cada thread reutilize as próprias conexões. Uma conexão só volta a ser usada
+depois que a resposta anterior foi lida até o fim; resposta abandonada no
+meio (erro, hash divergente, redirecionamento grande) fecha a conexão.
+Nenhum download grava direto no arquivo final: o conteúdo vai para um
+.parcial na mesma pasta, é conferido e só então entra no lugar com
+os.replace (troca atômica no mesmo volume).
+Downloads compactados (gzip/xz no config, ou Content-Encoding: gzip do
+servidor) são descompactados em fluxo direto no .parcial; tamanho e sha256
+conferidos são sempre os do conteúdo descompactado.
+"""
+
+import os
+import json
+import lzma
+import time
+import zlib
+import hashlib
+import threading
+import http.client
+import urllib.parse
+import urllib.error
+
+from rede import endpoint_de, espera_com_jitter
+
+BLOCO = 64 * 1024
+TIMEOUT_PADRAO = 60
+MAX_REDIRECIONAMENTOS = 5
+MAX_CORPO_DESCARTADO = 64 * 1024  # corpo de redirecionamento/erro lido para manter a conexão; maior que isso, fecha
+USER_AGENT = "MonitoramentoBKP-updater"
+TENTATIVAS = 3  # por arquivo; cada nova tentativa retoma do ponto em que parou
+RETENTATIVA_BASE_S = 2.0
+RETENTATIVA_MAX_S = 30
+SUFIXO_PARCIAL = ".parcial"
+SUFIXO_ANTERIOR = ".anterior"
+RAJADA_S = 1.0  # o balde do limite de banda guarda até 1 s de fichas
+PROGRESSO_INTERVALO_S = 2.0
+FORMATOS = ("gzip", "xz")
+SAIDA_MAX = 1024 * 1024  # teto do que um bloco compactado pode gerar de uma vez (memória limitada)
+
+
+class ErroVerificacao(Exception):
+    """Arquivo baixado não confere com o tamanho/sha256 do config (nada foi substituído)."""
+
+
+class _Descompactador:
+    def __init__(self, formato):
+        if formato not in FORMATOS:
+            raise ValueError(f"formato de compactação desconhecido: {formato}")
+        self.formato = formato
+        # wbits=31: zlib com cabeçalho gzip
+        self._d = zlib.decompressobj(wbits=31) if formato == "gzip" else lzma.LZMADecompressor()
+
+    def pedacos(self, dados):
+        """Gera o conteúdo descompactado em pedaços de até SAIDA_MAX bytes."""
+        d = self._d
+        if self.formato == "gzip":
+            while dados and not d.eof:
+                saida = d.decompress(dados, SAIDA_MAX)
+                dados = d.unconsumed_tail
+                if saida:
+                    yield saida
+            return
+        if d.eof:
+            return
+        saida = d.decompress(dados, SAIDA_MAX)
+        if saida:
+            yield saida
+        while not d.eof and not d.needs_input:
+            saida = d.decompress(b"", SAIDA_MAX)
+            if saida:
+                yield saida
+
+    @property
+    def concluido(self):
+        return self._d.eof
+
+
+class LimiteBanda:
+    """
+    Balde de fichas global, compartilhado por todas as threads de download.
+    `taxa` é uma função sem argumentos que devolve bytes/s (0 ou None = sem
+    limite); é consultada a cada bloco, então a faixa de horário comercial
+    passa a valer no meio de um download longo.
+    """
+
+    def __init__(self, taxa):
+        self.taxa = taxa
+        self._lock = threading.Lock()
+        self._fichas = None
+        self._ultimo = time.monotonic()
+
+    def consumir(self, n):
+        taxa = self.taxa()
+        if not taxa:
+            return
+        with self._lock:
+            agora = time.monotonic()
+            if self._fichas is None:
+                self._fichas = taxa * RAJADA_S
+            self._fichas = min(taxa * RAJADA_S, self._fichas + (agora - self._ultimo) * taxa)
+            self._ultimo = agora
+            # Reserva já (saldo pode ficar negativo) e dorme fora da trava: as threads se revezam
+            self._fichas -= n
+            espera = -self._fichas / taxa if self._fichas < 0 else 0
+        if espera:
+            time.sleep(espera)
+
+
+class MotorDownloads:
+    """
+    baixar(url, destino, sha256, tamanho) instala o arquivo verificado.
+    Com `rede` (RedeResiliente), respeita e alimenta o disjuntor do endpoint;
+    com `limite` (LimiteBanda), não passa da taxa configurada.
+    """
+
+    def __init__(self, timeout=TIMEOUT_PADRAO, rede=None, limite=None):
+        self.timeout = timeout
+        self.rede = rede
+        self.limite = limite
+        self._local = threading.local()
+        self._todas = []
+        self._lock = threading.Lock()
+        self.conexoes_abertas = 0
+        self.conexoes_reutilizadas = 0
+
+    def baixar(self, url, destino, sha256=None, tamanho=None, manter_anterior=True, tentativas=TENTATIVAS,
+               progresso=None, formato=None):
+        """
+        Baixa para <destino>.parcial (mesma pasta), retomando com Range o que já
+        estiver lá de uma tentativa interrompida; confere tamanho e sha256 e só
+        então troca o arquivo de lugar. O arquivo substituído fica em
+        <destino>.anterior para rollback.
+        `formato` ("gzip"/"xz"): a URL aponta para o arquivo compactado; não há
+        retomada nesse caso (o deslocamento no compactado não corresponde ao
+        do .parcial). Sem `formato`, o servidor pode responder com
+        Content-Encoding: gzip no download inicial.
+        `progresso(dados)` recebe {"arquivo", "bytes", "total", "taxa_bps", "eta_s",
+        "concluido"} a cada PROGRESSO_INTERVALO_S e no fim.
+        Retorna {"bytes", "retomados", "sha256", "segundos", "url_final"};
+        "bytes" são os transferidos pela rede.
+        """
+        inicio = time.perf_counter()
+        destino = os.path.abspath(destino)
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        parcial = destino + SUFIXO_PARCIAL
+        info_path = parcial + ".json"
+        if formato and formato not in FORMATOS:
+            raise ValueError(f"formato de compactação desconhecido: {formato}")
+        info = self._preparar_retomada(url, sha256, parcial, info_path)
+        h, escritos = _hash_parcial(parcial)
+        if formato:
+            h, escritos = hashlib.sha256(), 0
+        retomados = escritos
+        baixados = 0
+        url_final = url
+        total = int(tamanho) if tamanho is not None else None
+        proximo_aviso = 0.0
+
+        def avisar(concluido=False):
+            decorrido = time.perf_counter() - inicio
+            taxa = baixados / decorrido if decorrido > 0 else 0.0
+            eta = (total - escritos) / taxa if total and taxa else None
+            progresso({
+                "arquivo": os.path.basename(destino),
+                "bytes": escritos,
+                "total": total,
+                "taxa_bps": taxa,
+                "eta_s": 0.0 if concluido else eta,
+                "concluido": concluido,
+            })
+
+        for tentativa in range(max(1, tentativas)):
+            if tentativa:
+                time.sleep(espera_com_jitter(RETENTATIVA_BASE_S, tentativa - 1, RETENTATIVA_MAX_S))
+            cabecalhos = {}
+            if formato:
+                h, escritos = hashlib.sha256(), 0
+            elif not escritos:
+                # Retomada usa identity: o Range do gzip seria sobre o conteúdo compactado
+                cabecalhos["Accept-Encoding"] = "gzip, identity"
+            if escritos:
+                cabecalhos["Range"] = f"bytes={escritos}-"
+                # If-Range: se o arquivo mudou no servidor, ele responde 200 com o conteúdo inteiro
+                validador = info.get("etag") or info.get("last_modified")
+                # Outra origem com o mesmo sha256: o conteúdo é o mesmo, o validador dela não se aplica
+                if validador and info.get("url") == url:
+                    cabecalhos["If-Range"] = validador
+            try:
+                try:
+                    resp, url_final = self.abrir(url, cabecalhos)
+                except urllib.error.HTTPError as e:
+                    if e.code != 416 or not escritos:
+                        raise
+                    # .parcial além do fim do arquivo no servidor: recomeça do zero nesta mesma tentativa
+                    h, escritos = hashlib.sha256(), 0
+                    _remover(parcial)
+                    cabecalhos = {} if formato else {"Accept-Encoding": "gzip, identity"}
+                    resp, url_final = self.abrir(url, cabecalhos)
+            except urllib.error.HTTPError:
+                raise
+            except (OSError, http.client.HTTPException):
+                if tentativa == tentativas - 1:
+                    raise
+                continue
+
+            try:
+                if not (escritos and resp.status == 206 and _inicio_intervalo(resp) == escritos):
+                    h, escritos = hashlib.sha256(), 0
+                codificacao = (resp.getheader("Content-Encoding") or "identity").strip().lower()
+                if formato:
+                    descompactador = _Descompactador(formato)
+                elif codificacao in ("gzip", "x-gzip"):
+                    descompactador = _Descompactador("gzip")
+                elif codificacao == "identity":
+                    descompactador = None
+                else:
+                    raise ErroVerificacao(f"{os.path.basename(destino)}: Content-Encoding não suportado: {codificacao}")
+                if total is None and resp.length is not None and descompactador is None:
+                    total = escritos + resp.length
+                info = {
+                    "url": url,
+                    "sha256": sha256,
+                    "etag": resp.getheader("ETag"),
+                    "last_modified": resp.getheader("Last-Modified"),
+                }
+                _gravar_json(info_path, info)
+                with open(parcial, "ab" if escritos else "wb") as f:
+                    while True:
+                        bloco = resp.read(BLOCO)
+                        if not bloco:
+                            break
+                        baixados += len(bloco)
+                        for pedaco in (descompactador.pedacos(bloco) if descompactador else (bloco,)):
+                            f.write(pedaco)
+                            h.update(pedaco)
+                            escritos += len(pedaco)
+                        if tamanho is not None and escritos > int(tamanho):
+                            # Compactado que cresce além do esperado: para antes de encher o disco
+                            raise ErroVerificacao(f"{os.path.basename(destino)}: mais de {tamanho} bytes")
+                        if self.limite:
+                            self.limite.consumir(len(bloco))
+                        if progresso and time.perf_counter() >= proximo_aviso:
+                            avisar()
+                            proximo_aviso = time.perf_counter() + PROGRESSO_INTERVALO_S
+                    f.flush()
+                    os.fsync(f.fileno())
+                if resp.length:
+                    # read(n) devolve b"" se a conexão cai antes do Content-Length
+                    raise http.client.IncompleteRead(b"", resp.length)
+                if descompactador and not descompactador.concluido:
+                    raise http.client.IncompleteRead(b"")
+                break
+            except (ErroVerificacao, zlib.error, lzma.LZMAError) as e:
+                _remover(parcial, info_path)
+                if isinstance(e, ErroVerificacao):
+                    raise
+                raise ErroVerificacao(f"{os.path.basename(destino)}: conteúdo compactado inválido: {e}")
+            except (OSError, http.client.HTTPException):
+                # Conexão caiu no meio: o .parcial fica e a próxima tentativa continua dele
+                if tentativa == tentativas - 1:
+                    raise
+            finally:
+                self.liberar(resp)
+        else:
+            # Todo caminho da última tentativa termina em break ou raise; isto só protege o que vem depois
+            raise urllib.error.URLError(f"{os.path.basename(destino)}: download não concluído")
+
+        digest = h.hexdigest()
+        if tamanho is not None and escritos != int(tamanho):
+            _remover(parcial, info_path)
+            raise ErroVerificacao(f"{os.path.basename(destino)}: tamanho {escritos} bytes, esperado {tamanho}")
+        if sha256 and digest != str(sha256).strip().lower():
+            _remover(parcial, info_path)
+            raise ErroVerificacao(f"{os.path.basename(destino)}: sha256 {digest} não confere com o config")
+
+        instalar(parcial, destino, manter_anterior)
+        _remover(info_path)
+        if progresso:
+            avisar(concluido=True)
+        return {
+            "bytes": baixados,
+            "retomados": retomados,
+            "sha256": digest,
+            "segundos": time.perf_counter() - inicio,
+            "url_final": url_final,
+        }
+
+    def abrir(self, url, cabecalhos=None):
+        """
+        Resposta 2xx (já seguindo redirecionamentos) e a URL final.
+        O chamador devolve a resposta com liberar(), lida até o fim ou não.
+        """
+        for _ in range(MAX_REDIRECIONAMENTOS + 1):
+            endpoint = endpoint_de(url)
+            if self.rede:
+                self.rede.permitir(endpoint)
+            try:
+                resp = self._requisitar(url, cabecalhos or {})
+            except Exception:
+                if self.rede:
+                    self.rede.falha(endpoint)
+                raise
+            if resp.status in (301, 302, 303, 307, 308) and resp.getheader("Location"):
+                self.liberar(resp, descartar_corpo=True)
+                url = urllib.parse.urljoin(url, resp.getheader("Location"))
+                continue
+            if resp.status >= 400:
+                self.liberar(resp, descartar_corpo=True)
+                erro = urllib.error.HTTPError(url, resp.status, resp.reason, resp.headers, None)
+                if self.rede:
+                    if resp.status >= 500 or resp.status == 429:
+                        self.rede.falha(endpoint)
+                    else:
+                        self.rede.sucesso(endpoint)
+                raise erro
+            if self.rede:
+                self.rede.sucesso(endpoint)
+            return resp, url
+        raise urllib.error.URLError(f"redirecionamentos demais a partir de {url}")
+
+    def liberar(self, resp, descartar_corpo=False):
+        """
+        Fecha a resposta. A conexão dela só continua no pool se o corpo foi lido
+        até o fim; senão os bytes restantes seriam lidos como início da próxima
+        resposta, então ela é fechada e a próxima requisição abre outra.
+        """
+        if descartar_corpo and not resp.isclosed():
+            try:
+                resp.read(MAX_CORPO_DESCARTADO)
+            except (OSError, http.client.HTTPException):
+                pass
+        completa = resp.isclosed()
+        resp.close()
+        conexao = getattr(resp, "conexao_motor", None)
+        if conexao is not None and not completa:
+            self._descartar(conexao)
+
+    def _preparar_retomada(self, url, sha256, parcial, info_path):
+        """
+        Mantém o .parcial só se ele for do mesmo arquivo: mesmo sha256 esperado
+        (vale entre origens diferentes, ex.: espelho da loja e GitHub) ou, sem
+        sha256, mesma URL.
+        """
+        try:
+            with open(info_path, "r", encoding="utf-8") as f:
+                info = json.load(f)
+        except Exception:
+            info = {}
+        if info.get("sha256") != sha256 or (not sha256 and info.get("url") != url):
+            _remover(parcial, info_path)
+            return {}
+        return info
+
+    def fechar(self):
+        with self._lock:
+            for conexao in self._todas:
+                try:
+                    conexao.close()
+                except Exception:
+                    pass
+            self._todas = []
+
+    # -----------------------------
+    # Internos
+    # -----------------------------
+    def _requisitar(self, url, cabecalhos):
+        partes = urllib.parse.urlsplit(url)
+        caminho = partes.path or "/"
+        if partes.query:
+            caminho += "?" + partes.query
+        headers = {"User-Agent": USER_AGENT, "Accept-Encoding": "identity", **cabecalhos}
+        conexao, reutilizada = self._conexao(partes)
+        try:
+            conexao.request("GET", caminho, headers=headers)
+            resp = conexao.getresponse()
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            # Keep-alive expirado no servidor: tenta uma vez com conexão nova
+            self._descartar(conexao)
+            if not reutilizada:
+                raise
+            conexao, _ = self._conexao(partes, nova=True)
+            try:
+                conexao.request("GET", caminho, headers=headers)
+                resp = conexao.getresponse()
+            except Exception:
+                self._descartar(conexao)
+                raise
+        except Exception:
+            self._descartar(conexao)
+            raise
+        resp.conexao_motor = conexao
+        return resp
+
+    def _descartar(self, conexao):
+        """Fecha a conexão e a tira do pool da thread."""
+        conexao.close()
+        conexoes = getattr(self._local, "conexoes", None) or {}
+        for chave, c in list(conexoes.items()):
+            if c is conexao:
+                del conexoes[chave]
+        with self._lock:
+            if conexao in self._todas:
+                self._todas.remove(conexao)
+
+    def _conexao(self, partes, nova=False):
+        conexoes = getattr(self._local, "conexoes", None)
+        if conexoes is None:
+            conexoes = self._local.conexoes = {}
+        chave = (partes.scheme, partes.netloc)
+        conexao = conexoes.get(chave)
+        if conexao is not None and not nova:
+            with self._lock:
+                self.conexoes_reutilizadas += 1
+            return conexao, True
+        classe = http.client.HTTPSConnection if partes.scheme == "https" else http.client.HTTPConnection
+        conexao = classe(partes.hostname, partes.port, timeout=self.timeout)
+        conexoes[chave] = conexao
+        with self._lock:
+            self._todas.append(conexao)
+            self.conexoes_abertas += 1
+        return conexao, False
+
+
+# -----------------------------
+# Arquivos
+# -----------------------------
+def restaurar_anterior(destino):
+    """Rollback: volta <destino>.anterior para o lugar. Retorna False se não há versão anterior."""
+    anterior = destino + SUFIXO_ANTERIOR
+    if not os.path.exists(anterior):
+        return False
+    os.replace(anterior, destino)
+    return True
+
+
+def instalar(parcial, destino, manter_anterior=True):
+    """Troca atômica de um arquivo já verificado; o substituído fica em <destino>.anterior."""
+    if not (manter_anterior and os.path.exists(destino)):
+        os.replace(parcial, destino)
+        return
+    anterior = destino + SUFIXO_ANTERIOR
+    _remover(anterior)
+    # Renomear funciona mesmo com o .exe em execução no Windows; sobrescrever não
+    os.replace(destino, anterior)
+    try:
+        os.replace(parcial, destino)
+    except Exception:
+        os.replace(anterior, destino)
+        raise
+
+
+def _hash_parcial(parcial):
+    h = hashlib.sha256()
+    escritos = 0
+    try:
+        with open(parcial, "rb") as f:
+            for bloco in iter(lambda: f.read(BLOCO * 16), b""):
+                h.update(bloco)
+                escritos += len(bloco)
+    except OSError:
+        return hashlib.sha256(), 0
+    return h, escritos
+
+
+def _inicio_intervalo(resp):
+    """Primeiro byte de 'Content-Range: bytes N-M/T' (None se ausente/inválido)."""
+    valor = resp.getheader("Content-Range") or ""
+    try:
+        return int(valor.split()[1].split("-")[0])
+    except (IndexError, ValueError):
+        return None
+
+
+def _gravar_json(caminho, dados):
+    try:
+        with open(caminho, "w", encoding="utf-8") as f:
+            json.dump(dados, f)
+    except OSError:
+        pass
+
+
+def _remover(*caminhos):
+    for caminho in caminhos:
+        try:
+            os.remove(caminho)
+        except FileNotFoundError:
+            pass
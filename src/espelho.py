@@ -0,0 +1,242 @@
+"""
+Espelho de atualizações na rede da loja.
+O launcher do terminal SERVIDOR (com "espelho": {"ativo": true} no config)
+serve por HTTP aos caixas:
+    GET /config.json       o config_cache.json do servidor (ETag = sha256; 304 com If-None-Match)
+    GET /sha256/<hash>     arquivo do release por conteúdo (aceita Range para retomada)
+Cada arquivo é baixado do GitHub uma única vez, conferido pelo sha256 e
+guardado em espelho/ (armazem.py, mesmo formato do cache local); pedidos
+simultâneos do mesmo hash esperam o mesmo download. Só itens com sha256 no
+config passam pelo espelho. Os caixas apontam para ele no versao.config
+("espelho": "http://<ip do servidor>:9466") e voltam para o GitHub se ele
+falhar.
+"""
+
+import os
+import re
+import time
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from armazem import Armazem
+from downloads import MotorDownloads, SUFIXO_PARCIAL
+
+PORTA_PADRAO = 9466
+PASTA = "espelho"
+CONFIG_VALIDADE_S = 3600  # config sem confirmação do GitHub há mais que isso: caixas vão direto à fonte
+BLOCO = 256 * 1024
+_HASH = re.compile(r"^/sha256/([0-9a-f]{64})$")
+
+
+def urls_do_config(config):
+    """{sha256: (nome, url, compactado)} dos arquivos e deltas do config que podem ser espelhados."""
+    mapa = {}
+    for item in (config or {}).get("arquivos", []):
+        nome = item.get("nome") or ""
+        sha = str(item.get("sha256") or "").strip().lower()
+        if sha and item.get("url"):
+            mapa[sha] = (nome, item["url"], item.get("compactado"))
+        for d in item.get("deltas") or []:
+            sha_d = str(d.get("sha256") or "").strip().lower()
+            if sha_d and d.get("url"):
+                mapa[sha_d] = (nome + ".delta", d["url"], None)
+    return mapa
+
+
+def url_espelho(base, sha256):
+    return base.rstrip("/") + "/sha256/" + sha256
+
+
+class ServidorEspelho:
+    """
+    iniciar() abre a porta numa thread daemon; atualizar_config(config) é
+    chamado pelo launcher a cada config confirmado no GitHub e pré-baixa os
+    arquivos novos em segundo plano.
+    """
+
+    def __init__(self, base_dir, config_cache, porta=PORTA_PADRAO, host="0.0.0.0", log=print):
+        self.config_cache = config_cache
+        self.endereco = (host, porta)
+        self.log = log
+        self.armazem = Armazem(os.path.join(base_dir, PASTA))
+        self.pasta_temp = os.path.join(base_dir, PASTA, "tmp")
+        self.motor = MotorDownloads()
+        self.urls = {}
+        self.config_confirmado = 0.0
+        self.servidos = 0
+        self.bytes_servidos = 0
+        self.baixados = 0
+        self._baixando = {}  # sha256 -> Lock do download em andamento
+        self._lock = threading.Lock()
+        self._servidor = None
+
+    def iniciar(self):
+        espelho = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive com o MotorDownloads dos caixas
+
+            def do_GET(self):
+                caminho = self.path.split("?")[0]
+                try:
+                    if caminho == "/config.json":
+                        espelho._servir_config(self)
+                    elif _HASH.match(caminho):
+                        espelho._servir_objeto(self, _HASH.match(caminho).group(1))
+                    else:
+                        self.send_error(404)
+                except (ConnectionError, TimeoutError):
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        self._servidor = ThreadingHTTPServer(self.endereco, Handler)
+        self._servidor.daemon_threads = True
+        threading.Thread(target=self._servidor.serve_forever, name="espelho", daemon=True).start()
+
+    def atualizar_config(self, config, preaquecer=True):
+        """Sem `preaquecer` (ex.: versão ainda não liberada para a loja), só baixa o que um caixa pedir."""
+        with self._lock:
+            self.urls = urls_do_config(config)
+            self.config_confirmado = time.time()
+            pendentes = [sha for sha in self.urls if not self.armazem.contem(sha)]
+        if pendentes and preaquecer:
+            threading.Thread(target=self._preaquecer, args=(pendentes,), name="espelho-pre", daemon=True).start()
+
+    def obter(self, sha256):
+        """Caminho do objeto no espelho, baixando do GitHub se preciso (None se o hash não é do config)."""
+        if self.armazem.contem(sha256):
+            return self.armazem.caminho_objeto(sha256)
+        with self._lock:
+            origem = self.urls.get(sha256)
+            if origem is None:
+                return None
+            trava = self._baixando.setdefault(sha256, threading.Lock())
+        try:
+            with trava:
+                # Quem esperou a trava encontra o objeto pronto
+                if not self.armazem.contem(sha256):
+                    nome, url, compactado = origem
+                    temp = os.path.join(self.pasta_temp, sha256)
+                    os.makedirs(self.pasta_temp, exist_ok=True)
+                    try:
+                        self._baixar_origem(url, compactado, temp, sha256)
+                        self.armazem.guardar(temp, sha256, nome)
+                    finally:
+                        # Falha da origem não deixa sobras em espelho/tmp (o próximo pedido baixa de novo)
+                        _remover(temp, temp + SUFIXO_PARCIAL, temp + SUFIXO_PARCIAL + ".json")
+                    with self._lock:
+                        self.baixados += 1
+                    self.armazem.podar()
+                    self.armazem.salvar()
+                    self.log(f"🪞 Espelho: {nome} ({sha256[:12]}…) baixado do GitHub")
+        finally:
+            with self._lock:
+                if self._baixando.get(sha256) is trava:
+                    del self._baixando[sha256]
+        return self.armazem.caminho_objeto(sha256)
+
+    def parar(self):
+        if self._servidor:
+            self._servidor.shutdown()
+            self._servidor.server_close()
+            self._servidor = None
+        self.motor.fechar()
+
+    # -----------------------------
+    # Internos
+    # -----------------------------
+    def _preaquecer(self, pendentes):
+        for sha in pendentes:
+            try:
+                self.obter(sha)
+            except Exception as e:
+                self.log(f"⚠️ Espelho: falha ao pré-baixar {sha[:12]}…: {e}", "AVISO")
+
+    def _baixar_origem(self, url, compactado, temp, sha256):
+        """Na WAN prefere a variante compactada do config; na LAN os caixas recebem o arquivo pronto."""
+        if compactado and compactado.get("url"):
+            try:
+                self.motor.baixar(compactado["url"], temp, sha256=sha256, manter_anterior=False,
+                                  formato=compactado.get("formato", "xz"))
+                return
+            except Exception as e:
+                self.log(f"⚠️ Espelho: variante compactada falhou ({e}), baixando sem compactação", "AVISO")
+        self.motor.baixar(url, temp, sha256=sha256, manter_anterior=False)
+
+    def _servir_config(self, h):
+        if time.time() - self.config_confirmado > CONFIG_VALIDADE_S:
+            h.send_error(503, "config do espelho desatualizado")
+            return
+        try:
+            with open(self.config_cache, "rb") as f:
+                corpo = f.read()
+        except OSError:
+            h.send_error(503, "config ainda não baixado")
+            return
+        etag = '"' + hashlib.sha256(corpo).hexdigest() + '"'
+        if h.headers.get("If-None-Match") == etag:
+            h.send_response(304)
+            h.send_header("ETag", etag)
+            h.send_header("Content-Length", "0")
+            h.end_headers()
+            return
+        h.send_response(200)
+        h.send_header("Content-Type", "application/json")
+        h.send_header("ETag", etag)
+        h.send_header("Content-Length", str(len(corpo)))
+        h.end_headers()
+        h.wfile.write(corpo)
+        self._contar(len(corpo))
+
+    def _servir_objeto(self, h, sha256):
+        try:
+            caminho = self.obter(sha256)
+        except Exception as e:
+            self.log(f"⚠️ Espelho: falha ao baixar {sha256[:12]}… do GitHub: {e}", "AVISO")
+            h.send_error(502, "falha ao baixar da origem")
+            return
+        if caminho is None:
+            h.send_error(404, "hash fora do config atual")
+            return
+        tamanho = os.path.getsize(caminho)
+        etag = '"' + sha256 + '"'
+        inicio = _inicio_range(h.headers.get("Range"))
+        if_range = h.headers.get("If-Range")
+        if inicio is not None and (if_range in (None, etag)) and inicio < tamanho:
+            h.send_response(206)
+            h.send_header("Content-Range", f"bytes {inicio}-{tamanho - 1}/{tamanho}")
+        else:
+            inicio = 0
+            h.send_response(200)
+        h.send_header("Content-Type", "application/octet-stream")
+        h.send_header("ETag", etag)
+        h.send_header("Accept-Ranges", "bytes")
+        h.send_header("Content-Length", str(tamanho - inicio))
+        h.end_headers()
+        with open(caminho, "rb") as f:
+            f.seek(inicio)
+            for bloco in iter(lambda: f.read(BLOCO), b""):
+                h.wfile.write(bloco)
+        self._contar(tamanho - inicio)
+
+    def _contar(self, n):
+        with self._lock:
+            self.servidos += 1
+            self.bytes_servidos += n
+
+
+def _inicio_range(valor):
+    """Primeiro byte de 'bytes=N-' (só o formato que o MotorDownloads envia)."""
+    m = re.match(r"^bytes=(\d+)-$", (valor or "").strip())
+    return int(m.group(1)) if m else None
+
+
+def _remover(*caminhos):
+    for caminho in caminhos:
+        try:
+            os.remove(caminho)
+        except OSError:
+            pass
@@ -0,0 +1,125 @@
+"""
+Estado persistente do agendador do launcher (substitui o antigo dict last_run).
+Diário append-only em JSON Lines com compactação periódica: a primeira linha
+é um snapshot e as seguintes são eventos de início/fim de cada job.
+Guarda uma entrada por job (última partida, último término e returncode),
+então o tamanho fica estável mesmo após meses de uptime.
+"""
+
+import os
+import json
+import time
+import threading
+
+COMPACTAR_A_CADA = 200  # eventos gravados entre compactações
+MAX_IDADE_DIAS = 90  # jobs fora do config e sem execução há mais tempo que isso são descartados
+
+
+class EstadoAgenda:
+    def __init__(self, caminho, compactar_a_cada=COMPACTAR_A_CADA, max_idade_dias=MAX_IDADE_DIAS):
+        self.caminho = caminho
+        self.compactar_a_cada = compactar_a_cada
+        self.max_idade = max_idade_dias * 86400
+        self.jobs = {}
+        self._lock = threading.Lock()
+        self._eventos = 0
+        self._arquivo = None
+        self._carregar()
+        self._compactar()
+
+    # -----------------------------
+    # Consulta
+    # -----------------------------
+    def job(self, chave):
+        with self._lock:
+            return dict(self.jobs.get(chave, {}))
+
+    def ultimas_execucoes(self):
+        """{chave: timestamp do último início} para alimentar o agendador."""
+        with self._lock:
+            return {k: v["inicio"] for k, v in self.jobs.items() if v.get("inicio")}
+
+    # -----------------------------
+    # Registro
+    # -----------------------------
+    def registrar_inicio(self, chave, ts=None):
+        ts = ts or time.time()
+        self._registrar({"evento": "inicio", "job": chave, "ts": ts})
+
+    def registrar_fim(self, chave, codigo, ts=None):
+        ts = ts or time.time()
+        self._registrar({"evento": "fim", "job": chave, "ts": ts, "codigo": codigo})
+
+    def remover_ausentes(self, chaves_ativas, agora=None):
+        """Descarta jobs que saíram do config e não rodam há mais de max_idade."""
+        agora = agora or time.time()
+        with self._lock:
+            antigos = [
+                k for k, v in self.jobs.items()
+                if k not in chaves_ativas and agora - max(v.get("inicio", 0), v.get("fim", 0)) > self.max_idade
+            ]
+            for k in antigos:
+                del self.jobs[k]
+        if antigos:
+            self._compactar()
+        return antigos
+
+    # -----------------------------
+    # Internos
+    # -----------------------------
+    def _aplicar(self, registro):
+        if registro.get("evento") == "snapshot":
+            self.jobs = registro.get("jobs", {})
+            return
+        chave = registro.get("job")
+        if not chave:
+            return
+        job = self.jobs.setdefault(chave, {})
+        if registro.get("evento") == "inicio":
+            job["inicio"] = registro["ts"]
+        elif registro.get("evento") == "fim":
+            job["fim"] = registro["ts"]
+            job["codigo"] = registro.get("codigo")
+
+    def _carregar(self):
+        if not os.path.exists(self.caminho):
+            return
+        try:
+            with open(self.caminho, "r", encoding="utf-8") as f:
+                for linha in f:
+                    try:
+                        self._aplicar(json.loads(linha))
+                    except ValueError:
+                        # Linha truncada por queda de energia/kill: ignora
+                        continue
+        except Exception as e:
+            print(f"⚠️ Falha ao ler estado {self.caminho}: {e}")
+
+    def _registrar(self, registro):
+        with self._lock:
+            self._aplicar(registro)
+            try:
+                self._arquivo.write(json.dumps(registro) + "\n")
+                self._arquivo.flush()
+            except Exception as e:
+                print(f"⚠️ Falha ao gravar estado {self.caminho}: {e}")
+            self._eventos += 1
+            compactar = self._eventos >= self.compactar_a_cada
+        if compactar:
+            self._compactar()
+
+    def _compactar(self):
+        """Regrava o diário como um único snapshot (arquivo temporário + os.replace)."""
+        with self._lock:
+            temp = self.caminho + ".tmp"
+            try:
+                if self._arquivo:
+                    self._arquivo.close()
+                with open(temp, "w", encoding="utf-8") as f:
+                    f.write(json.dumps({"evento": "snapshot", "ts": time.time(), "jobs": self.jobs}) + "\n")
+                os.replace(temp, self.caminho)
+                self._eventos = 0
+            except Exception as e:
+                print(f"⚠️ Falha ao compactar estado {self.caminho}: {e}")
+            finally:
+                self._arquivo = open(self.caminho, "a", encoding="utf-8")
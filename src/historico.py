@@ -0,0 +1,91 @@
+"""
+Diário de execuções dos jobs do launcher (logs/execucoes.jsonl).
+Uma linha JSON por execução com duração, CPU, pico de memória, returncode e
+se houve timeout. Lido pelo painel e pelo valida_bkp para acompanhar quais
+rotinas SQL estão ficando mais lentas.
+"""
+
+import os
+import json
+import threading
+
+MAX_REGISTROS = 2000  # execuções mantidas após a compactação
+
+
+class HistoricoExecucoes:
+    def __init__(self, caminho, max_registros=MAX_REGISTROS):
+        self.caminho = caminho
+        self.max_registros = max_registros
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+        self._linhas = self._contar_linhas()
+
+    def registrar(self, registro):
+        with self._lock:
+            try:
+                with open(self.caminho, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+                self._linhas += 1
+                # Compacta só quando passa de 50% do limite para não regravar a cada execução
+                if self._linhas > self.max_registros * 1.5:
+                    self._compactar()
+            except Exception as e:
+                print(f"⚠️ Falha ao gravar histórico {self.caminho}: {e}")
+
+    def _contar_linhas(self):
+        try:
+            with open(self.caminho, "rb") as f:
+                return sum(1 for _ in f)
+        except Exception:
+            return 0
+
+    def _compactar(self):
+        registros = ler_execucoes(self.caminho, limite=self.max_registros)
+        temp = self.caminho + ".tmp"
+        with open(temp, "w", encoding="utf-8") as f:
+            for r in registros:
+                f.write(json.dumps(r, ensure_ascii=False) + "\n")
+        os.replace(temp, self.caminho)
+        self._linhas = len(registros)
+
+
+def ler_execucoes(caminho, job=None, limite=None):
+    """Lista de registros (mais antigos primeiro), opcionalmente filtrada por job."""
+    registros = []
+    try:
+        with open(caminho, "r", encoding="utf-8") as f:
+            for linha in f:
+                try:
+                    r = json.loads(linha)
+                except ValueError:
+                    continue
+                if job is None or r.get("job") == job:
+                    registros.append(r)
+    except Exception:
+        return []
+    if limite:
+        registros = registros[-limite:]
+    return registros
+
+
+def resumo_por_job(registros, ultimas=5):
+    """
+    {job: {'execucoes', 'ultima', 'media_recente_s', 'media_anterior_s', 'falhas'}}
+    comparando a média das últimas N execuções com as N anteriores.
+    """
+    por_job = {}
+    for r in registros:
+        por_job.setdefault(r.get("job"), []).append(r)
+    resumo = {}
+    for job, lista in por_job.items():
+        duracoes = [r["duracao_s"] for r in lista if r.get("duracao_s") is not None]
+        recentes = duracoes[-ultimas:]
+        anteriores = duracoes[-2 * ultimas:-ultimas]
+        resumo[job] = {
+            "execucoes": len(lista),
+            "ultima": lista[-1],
+            "media_recente_s": sum(recentes) / len(recentes) if recentes else None,
+            "media_anterior_s": sum(anteriores) / len(anteriores) if anteriores else None,
+            "falhas": sum(1 for r in lista if r.get("codigo") not in (0, None) or r.get("expirou")),
+        }
+    return resumo
@@ -0,0 +1,39 @@
+"""
+Identidade estável da loja/terminal e deslocamentos determinísticos.
+Usado para espalhar a carga da frota (config remoto, planilha) sem perder
+a previsibilidade: cada loja sempre cai no mesmo deslocamento.
+"""
+
+import json
+import socket
+import hashlib
+
+
+def identificador_loja(version_file):
+    """Código da filial gravado pelo valida_bkp no versao.config; senão o hostname."""
+    try:
+        with open(version_file, "r", encoding="utf-8") as f:
+            return identificador_de(json.load(f))
+    except Exception:
+        return identificador_de(None)
+
+
+def identificador_de(dados_versao):
+    """Mesmo que identificador_loja(), a partir do versao.config já carregado."""
+    filial = str((dados_versao or {}).get("filial", "")).strip()
+    if filial and filial.isdigit():
+        return filial
+    return socket.gethostname().upper()
+
+
+def fracao_estavel(*partes):
+    """Número em [0, 1) derivado do sha256 das partes (igual em toda execução)."""
+    digest = hashlib.sha256("|".join(str(p) for p in partes).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") / 2 ** 64
+
+
+def deslocamento(identidade, chave, janela_s):
+    """Segundos inteiros em [0, janela_s) para a combinação identidade + chave."""
+    if not janela_s or janela_s <= 0:
+        return 0
+    return int(fracao_estavel(identidade, chave) * janela_s)
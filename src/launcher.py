@@ -1,87 +1,181 @@
-import subprocess
+import sys
 import time
 import os
-import urllib.request
 import json
-import random
-from datetime import datetime, timedelta
+import argparse
+import threading
+from datetime import datetime
+
+from log_rotativo import abrir_log
+from cliente_config import ClienteConfig
+from rede import CircuitoAberto, endpoint_de
+from agendador import Agendador
+from pool_execucao import PoolExecucao
+from estado import EstadoAgenda, MAX_IDADE_DIAS
+from processos import ProcessoMonitorado
+from historico import HistoricoExecucoes, ler_execucoes, resumo_por_job
+from simulador import simular
+from captura_saida import CapturaSaida, ultima_saida
+from identidade import identificador_loja, identificador_de, deslocamento
+from observador import Observador
+from metricas import Registro, ServidorMetricas
+from controle import ServidorControle, gerar_token
+from espelho import ServidorEspelho, PORTA_PADRAO as ESPELHO_PORTA
+from rollout import decidir as decidir_rollout
 
 # -----------------------------
 # Configurações
 # -----------------------------
 CONFIG_URL = "https://github.com/wagnerdeandradesoares/monitoramento-bkp/releases/download/v1.0.2/config.json"
 BASE_DIR = r"C:\Program Files (x86)\MonitoramentoBKP"
-CHECK_INTERVAL = 60  # segundos
+CHECK_INTERVAL = 60  # segundos entre consultas ao config remoto
 VERSION_FILE = os.path.join(BASE_DIR, "versao.config")
+CONFIG_CACHE = os.path.join(BASE_DIR, "config_cache.json")
+STATE_FILE = os.path.join(BASE_DIR, "estado_launcher.jsonl")
 LOG_BASE_DIR = os.path.join(BASE_DIR, "logs")
+RUNS_FILE = os.path.join(LOG_BASE_DIR, "execucoes.jsonl")
+JOBS_LOG_DIR = os.path.join(LOG_BASE_DIR, "jobs")
 MAX_LOG_LINES = 100
-
-last_run = {}
+SAIDA_SEGMENTO_KB = 256  # saída de cada execução: segmentos de 256 KB...
+SAIDA_CAUDA_KB = 2  # ...últimos KB copiados para execucoes.jsonl
+SAIDA_RETENCAO = 10  # execuções guardadas por job
+MAX_LOG_BYTES = 1024 * 1024  # rotaciona launcher.log a cada 1 MB
+LOG_SEGMENTOS = 5
+LOG_NIVEL = "INFO"
+MAX_EXECUCOES_SIMULTANEAS = 3  # jobs do config.json rodando ao mesmo tempo
+ESPACAMENTO_RECUPERACAO_MIN = 5  # intervalo entre execuções de disparos perdidos
+ESPALHAR_CONFIG_S = 0  # janela de espalhamento da consulta ao config (config.json: "espalhar_config_s")
+TIMEOUT_PADRAO_MIN = None  # sem limite, a menos que o job defina "timeout_min"
+UPDATER_TIMEOUT_MIN = 60  # updater.exe (e o que ele iniciou) é encerrado se passar disso
+VALIDA_TIMEOUT_MIN = 30  # idem para o valida_bkp.exe pós-atualização
+MANUTENCAO_VERIFICAR_S = 5  # com updater/valida_bkp rodando, o loop confere o fim a cada tanto
+METRICAS_PORTA = 9464  # http://127.0.0.1:9464/metrics (formato Prometheus); None desativa
+METRICAS_INTERVALO = 60  # segundos entre gravações de metricas/launcher.json (lido pelo painel)
+CONTROLE_PORTA = 9465  # canal local do painel (controle.py); None desativa
+CONTROLE_TOKEN = os.path.join(BASE_DIR, "controle.token")
+CONTROLE_SAIDA_MAX_KB = 64  # limite do comando "saida"
+TROCA_LAUNCHER = os.path.join(BASE_DIR, "troca_launcher.json")  # gravado pelo updater enquanto troca o launcher.exe
+TROCA_MAX_S = 600  # marcador mais velho que isso é sobra de uma troca interrompida
+TROCA_FALHAS = os.path.join(BASE_DIR, "troca_launcher_falhas.json")  # gravado pelo updater quando a troca é revertida
+TROCA_RETENTATIVA_MIN = 30  # espera após a 1ª troca revertida; dobra a cada nova falha da mesma versão...
+TROCA_RETENTATIVA_MAX_MIN = 24 * 60  # ...até 1 dia
+# Espelho na loja: o SERVIDOR serve config e arquivos aos caixas (config.json: "espelho": {"ativo", "porta"});
+# os caixas usam o endereço gravado no versao.config ("espelho": "http://<servidor>:9466")
+
+agendador = Agendador(ESPACAMENTO_RECUPERACAO_MIN)
+estado = None
+historico = None
+identidade_loja = ""
+cliente_config = None
+config_confirmado = False  # último config veio da rede (não do config_cache.json)
+servidor_espelho = None
+espelho_falhando = False  # caixa: avisa só quando o espelho cai ou volta
+situacao_rollout = {}  # última decisão de liberação gradual ("rollout" no config.json)
+observador = Observador()
+pool = None
+inicio_launcher = time.time()
+trava_agenda = threading.RLock()  # agenda do loop principal (o canal de controle lê foto_agenda, sem esperar)
+foto_agenda = {"tarefas": {}, "jobs": [], "proximos": [], "proximo_disparo": None}
+manutencao = {"etapa": None, "proc": None, "limite": 0}  # updater.exe/valida_bkp.exe: o loop acompanha, sem esperar
+recarregar_config = threading.Event()
+versao_config = observador.observar(VERSION_FILE)  # cópia em memória, recarregada quando o arquivo muda
+
+metricas = Registro("launcher")
+M_VOLTA = metricas.histograma("launcher_volta_segundos", "Duração de uma volta do loop principal, sem a espera")
+M_CONFIG = metricas.histograma("config_consulta_segundos", "Duração da consulta ao config remoto por resultado")
+M_JOB_DURACAO = metricas.histograma("job_duracao_segundos", "Duração das execuções por job")
+M_JOB_ATRASO = metricas.histograma("job_atraso_inicio_segundos", "Atraso entre o horário previsto e o início do job")
+M_JOB_EXECUCOES = metricas.contador("job_execucoes_total", "Execuções por job e resultado")
+M_JOB_CPU = metricas.contador("job_cpu_segundos_total", "Tempo de CPU somado da árvore de processos por job")
+M_PERDIDOS = metricas.contador("disparos_perdidos_total", "Disparos perdidos detectados na recompilação da agenda")
+M_RODANDO = metricas.medidor("jobs_em_execucao", "Jobs rodando no pool")
+M_FILA = metricas.medidor("jobs_na_fila", "Jobs vencidos aguardando vaga no pool")
+M_PROXIMO = metricas.medidor("proximo_disparo_timestamp", "Horário (epoch) do próximo disparo agendado")
+M_INICIO = metricas.medidor("launcher_inicio_timestamp", "Horário (epoch) em que o launcher iniciou")
+M_ROLLOUT = metricas.medidor("rollout_liberado", "1 se a versão do config está liberada para esta loja")
 
 # -----------------------------
 # Log
 # -----------------------------
-def garantir_diretorio_logs():
-    if not os.path.exists(LOG_BASE_DIR):
-        os.makedirs(LOG_BASE_DIR, exist_ok=True)
-
-def log(msg):
-    garantir_diretorio_logs()
-    now = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
-    linha = f"[{now}] {msg}\n"
-    LOG_FILE = os.path.join(LOG_BASE_DIR, "launcher.log")
-
-    linhas = []
-    if os.path.exists(LOG_FILE):
-        with open(LOG_FILE, "r", encoding="utf-8") as f:
-            linhas = f.readlines()
-
-    linhas.append(linha)
-    if len(linhas) > MAX_LOG_LINES:
-        linhas = linhas[-MAX_LOG_LINES:]
-
-    with open(LOG_FILE, "w", encoding="utf-8") as f:
-        f.writelines(linhas)
-    print(linha.strip())
+def log(msg, nivel="INFO"):
+    escritor = abrir_log(
+        os.path.join(LOG_BASE_DIR, "launcher.log"),
+        max_bytes=MAX_LOG_BYTES,
+        segmentos=LOG_SEGMENTOS,
+        compactar=True,
+        nivel=LOG_NIVEL,
+        flush="lote",
+        flush_intervalo=1.0,
+    )
+    escritor.escrever(msg, nivel)
 
 # -----------------------------
 # Utilitários
 # -----------------------------
+def endereco_espelho():
+    """URL base do espelho da loja no versao.config deste caixa (None se não configurado)."""
+    espelho = str((versao_config.obter() or {}).get("espelho") or "").strip()
+    return espelho.rstrip("/") or None
+
 def baixar_config():
+    global cliente_config, config_confirmado, espelho_falhando
+    if cliente_config is None:
+        cliente_config = ClienteConfig(CONFIG_URL, CONFIG_CACHE, timeout=10)
+    espelho = endereco_espelho()
+    cliente_config.espelho = espelho + "/config.json" if espelho else None
+    config_confirmado = False
+    inicio = time.perf_counter()
     try:
-        url = f"{CONFIG_URL}?nocache={random.randint(1000,999999)}"
-        log(f"🌐 Baixando config remoto: {url}")
-        with urllib.request.urlopen(url, timeout=10) as resp:
-            if resp.status == 200:
-                data = json.loads(resp.read().decode())
-                log("✅ Config.json carregado com sucesso")
-
-                # salva localmente como cache
-                with open(os.path.join(BASE_DIR, "config_cache.json"), "w", encoding="utf-8") as f:
-                    json.dump(data, f, indent=2)
-                return data
+        cfg, mudou = cliente_config.obter()
+        config_confirmado = True
+        M_CONFIG.observar(time.perf_counter() - inicio, resultado="mudou" if mudou else "inalterado")
+        falhou = bool(espelho) and cliente_config.origem == CONFIG_URL
+        if falhou and not espelho_falhando:
+            log(f"🪞 Espelho {espelho} indisponível ({cliente_config.falha_espelho}) — config lido do GitHub", "AVISO")
+        elif espelho_falhando and not falhou:
+            log("🪞 Espelho da loja respondendo de novo")
+        espelho_falhando = falhou
+        if mudou:
+            log("✅ Config.json atualizado e salvo em config_cache.json")
+        else:
+            c = cliente_config.contadores
+            log(f"📦 Config.json inalterado (hits {c['hits_304'] + c['hits_hash']}, "
+                f"misses {c['misses']}, {c['bytes_economizados']} bytes economizados)", "DEBUG")
+        return cfg
+    except CircuitoAberto as e:
+        M_CONFIG.observar(time.perf_counter() - inicio, resultado="circuito_aberto")
+        # Já avisado quando o circuito abriu; até o próximo teste só usa o cache
+        log(f"🔌 {e}", "DEBUG")
+        nivel = "DEBUG"
     except Exception as e:
-        log(f"⚠️ Falha ao baixar config: {e}")
-
-        # tenta ler cache local
-        cache_path = os.path.join(BASE_DIR, "config_cache.json")
-        if os.path.exists(cache_path):
-            log("📦 Usando config_cache.json local (fallback).")
-            with open(cache_path, "r", encoding="utf-8") as f:
-                return json.load(f)
+        M_CONFIG.observar(time.perf_counter() - inicio, resultado="erro")
+        log(f"⚠️ Falha ao baixar config: {e}", "AVISO")
+        situacao = cliente_config.rede.situacao(endpoint_de(CONFIG_URL))
+        if situacao.get("estado") == "aberto":
+            espera = max(0, int(situacao.get("reabre_em", 0) - time.time()))
+            log(f"🔌 Circuito aberto após {situacao.get('falhas')} falha(s): "
+                f"config remoto só será testado de novo em {espera}s", "AVISO")
+        nivel = "INFO"
+
+    # tenta ler cache local
+    cfg = cliente_config.ler_cache()
+    if cfg is not None:
+        log("📦 Usando config_cache.json local (fallback).", nivel)
+        return cfg
     return None
 
 def ler_versao_local():
+    """Versão e tipo do terminal a partir da cópia em memória do versao.config (sem I/O)."""
     try:
-        if not os.path.exists(VERSION_FILE):
+        data = versao_config.obter()
+        if data is None:
             with open(VERSION_FILE, "w", encoding="utf-8") as f:
                 json.dump({"versao": "0.0.0", "tipo": "CX1"}, f)
+            versao_config.invalidar()
             return "0.0.0", "CX1"
-        with open(VERSION_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            return data.get("versao", "0.0.0"), data.get("tipo", "CX1").upper()
+        return data.get("versao", "0.0.0"), data.get("tipo", "CX1").upper()
     except Exception as e:
-        log(f"⚠️ Erro ao ler versao.config: {e}")
+        log(f"⚠️ Erro ao ler versao.config: {e}", "AVISO")
         return "0.0.0", "CX1"
 
 def comparar_versoes(v1, v2):
@@ -90,55 +184,39 @@ def comparar_versoes(v1, v2):
     except:
         return False
 
-def executar_process(path):
+def executar_process(path, info=None):
     try:
         if not os.path.exists(path):
-            log(f"⚠️ Arquivo não encontrado: {path}")
+            log(f"⚠️ Arquivo não encontrado: {path}", "AVISO")
             return None
 
-        # Garante pasta de logs
-        garantir_diretorio_logs()
+        info = info or {}
 
-        # Nome fixo do log por executável
+        # Nome fixo do log por executável (append, últimas MAX_LOG_LINES linhas)
         nome_exe = os.path.splitext(os.path.basename(path))[0]
         log_individual = os.path.join(LOG_BASE_DIR, f"{nome_exe}.txt")
-
-        # Lê linhas atuais
-        linhas = []
-        if os.path.exists(log_individual):
-            with open(log_individual, "r", encoding="utf-8") as f:
-                linhas = f.readlines()
-
-        # Adiciona nova execução
-        linhas.append(f"[{datetime.now().strftime('%d/%m/%Y %H:%M:%S')}] Executado: {path}\n")
-
-        # Mantém apenas as últimas MAX_LOG_LINES
-        if len(linhas) > MAX_LOG_LINES:
-            linhas = linhas[-MAX_LOG_LINES:]
-
-        # Salva novamente
-        with open(log_individual, "w", encoding="utf-8") as f:
-            f.writelines(linhas)
-
-        # Executa normalmente
-        si = subprocess.STARTUPINFO()
-        si.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-        proc = subprocess.Popen(
-            ["cmd.exe", "/c", path],
-            cwd=os.path.dirname(path),
-            startupinfo=si,
-            shell=True
+        abrir_log(log_individual, max_bytes=None, max_linhas=MAX_LOG_LINES, cauda=True, eco=False) \
+            .escrever(f"Executado: {path}")
+
+        # Saída do job (stdout/stderr) em logs/jobs/<exe>/<execução>/
+        captura = CapturaSaida(
+            os.path.join(JOBS_LOG_DIR, nome_exe),
+            segmento_kb=info.get("max_saida_kb", SAIDA_SEGMENTO_KB),
+            cauda_kb=info.get("cauda_saida_kb", SAIDA_CAUDA_KB),
+            retencao=info.get("retencao_saidas", SAIDA_RETENCAO),
         )
 
-        log(f"▶️ Iniciando execução: {path} (registrado em {log_individual})")
+        # Executa dentro de um Job Object (timeout mata a árvore toda e mede CPU/memória)
+        proc = ProcessoMonitorado(["cmd.exe", "/c", path], cwd=os.path.dirname(path), captura=captura)
+
+        log(f"▶️ Iniciando execução: {path} (PID {proc.pid}, saída em {captura.diretorio})")
         return proc
 
     except Exception as e:
-        log(f"❌ Erro ao executar {path}: {e}")
+        log(f"❌ Erro ao executar {path}: {e}", "ERRO")
         return None
 
 
-
 def resolve_executable_path(info):
     nome = info.get("nome")
     local = info.get("local", BASE_DIR)
@@ -149,174 +227,516 @@ def resolve_executable_path(info):
 # -----------------------------
 # Execuções fixas
 # -----------------------------
-def rodar_valida():
+def iniciar_manutencao(etapa, nome_exe, timeout_min):
+    """
+    Inicia updater.exe/valida_bkp.exe sem esperar: o loop principal segue
+    despachando os jobs e acompanhar_manutencao() recolhe o fim (ou o timeout).
+    """
+    caminho = os.path.join(BASE_DIR, nome_exe)
+    if not os.path.exists(caminho):
+        log(f"⚠️ {nome_exe} não encontrado", "AVISO")
+        return False
+    proc = executar_process(caminho)
+    if not proc:
+        return False
+    manutencao.update(etapa=etapa, proc=proc, limite=time.monotonic() + timeout_min * 60)
+    return True
+
+def acompanhar_manutencao():
+    """A cada volta do loop: fecha o updater/valida_bkp que terminou e, depois do updater, inicia o valida_bkp."""
+    proc = manutencao["proc"]
+    if proc is None:
+        return
     try:
-        valida_path = os.path.join(BASE_DIR, "valida_bkp.exe")
-        if os.path.exists(valida_path):
-            log("▶️ Executando valida_bkp.exe após atualização...")
-            proc = executar_process(valida_path)
-            if proc:
-                proc.wait()
-                log("✅ valida_bkp concluído com sucesso")
+        if proc.em_execucao():
+            if time.monotonic() < manutencao["limite"]:
+                return
+            proc.aguardar(0)  # estourou o timeout: encerra a árvore toda
         else:
-            log("⚠️ valida_bkp.exe não encontrado")
+            proc.aguardar()
+        proc.fechar()
     except Exception as e:
-        log(f"❌ Erro ao executar valida_bkp.exe: {e}")
+        log(f"❌ Erro ao acompanhar {manutencao['etapa']}: {e}", "ERRO")
+    etapa = manutencao["etapa"]
+    manutencao.update(etapa=None, proc=None)
+    if proc.expirou:
+        limite = UPDATER_TIMEOUT_MIN if etapa == "updater" else VALIDA_TIMEOUT_MIN
+        log(f"⏱️ {etapa} excedeu o timeout de {limite} min — árvore de processos encerrada", "ERRO")
+        return
+    if etapa != "updater":
+        log(f"✅ valida_bkp concluído (returncode {proc.returncode})")
+        return
+    if troca_em_andamento():
+        # O serviço vai parar para a troca; valida_bkp roda no launcher que subir
+        log("✅ updater.exe concluído — troca do launcher.exe em seguida, valida_bkp.exe fica para depois dela")
+        return
+    log(f"✅ updater.exe concluído (returncode {proc.returncode}) — iniciando valida_bkp.exe")
+    rodar_valida()
+
+def rodar_valida():
+    try:
+        log("▶️ Executando valida_bkp.exe após atualização...")
+        iniciar_manutencao("valida", "valida_bkp.exe", VALIDA_TIMEOUT_MIN)
+    except Exception as e:
+        log(f"❌ Erro ao executar valida_bkp.exe: {e}", "ERRO")
+
+def troca_em_andamento():
+    """O updater destacado (updater.exe --trocar) está parando/trocando/verificando o launcher.exe."""
+    try:
+        return time.time() - os.path.getmtime(TROCA_LAUNCHER) < TROCA_MAX_S
+    except OSError:
+        return False
+
+def troca_adiada(versao):
+    """Segundos até poder tentar de novo a troca do launcher.exe para `versao` (0 = pode rodar o updater)."""
+    try:
+        with open(TROCA_FALHAS, "r", encoding="utf-8") as f:
+            falhas = json.load(f)
+        if str(falhas.get("versao")) != str(versao):
+            return 0
+        espera = min(TROCA_RETENTATIVA_MAX_MIN, TROCA_RETENTATIVA_MIN * 2 ** (int(falhas["tentativas"]) - 1)) * 60
+        return max(0, float(falhas["ultima"]) + espera - time.time())
+    except Exception:
+        return 0
 
 def rodar_updater(versao_remota, versao_local):
+    if manutencao["proc"] is not None:
+        return  # updater (ou o valida_bkp seguinte) da volta anterior ainda rodando
     try:
         log(f"🔄 Nova versão detectada ({versao_local} → {versao_remota})")
-        updater_path = os.path.join(BASE_DIR, "updater.exe")
-        if os.path.exists(updater_path):
-            log("▶️ Executando updater.exe")
-            proc = executar_process(updater_path)
-            if proc:
-                proc.wait()
-                log("✅ updater.exe concluído — iniciando valida_bkp.exe")
-                rodar_valida()
-        else:
-            log("⚠️ updater.exe não encontrado")
+        log("▶️ Executando updater.exe")
+        iniciar_manutencao("updater", "updater.exe", UPDATER_TIMEOUT_MIN)
     except Exception as e:
-        log(f"❌ Erro ao rodar updater: {e}")
+        log(f"❌ Erro ao rodar updater: {e}", "ERRO")
 
 # -----------------------------
-# Regras de execução
+# Agendamento
 # -----------------------------
-def dentro_da_janela(horarios, tolerancia_min=5):
-    agora = datetime.now()
-    if isinstance(horarios, str):
-        horarios = [horarios]
-    for h in horarios:
+def avaliar_rollout(config):
+    """Decide se a versão do config vale para esta loja; loga só quando a decisão muda."""
+    global situacao_rollout
+    versao = str(config.get("versao", "0.0.0"))
+    liberada, motivo = decidir_rollout(config.get("rollout"), identidade_loja, versao)
+    anterior = situacao_rollout
+    situacao_rollout = {"versao": versao, "liberada": liberada, "motivo": motivo}
+    M_ROLLOUT.definir(1 if liberada else 0, versao=versao)
+    if (anterior.get("versao"), anterior.get("liberada")) != (versao, liberada) and config.get("rollout"):
+        if liberada:
+            log(f"🚦 Versão {versao} liberada para a loja {identidade_loja}: {motivo}")
+        else:
+            log(f"⏸️ Versão {versao} ainda não liberada para a loja {identidade_loja}: {motivo}")
+    return liberada
+
+def configurar_espelho(config, tipo_terminal, preaquecer=True):
+    """Liga/desliga o espelho da loja (só no SERVIDOR) e repassa a ele cada config confirmado na rede."""
+    global servidor_espelho
+    opcoes = config.get("espelho") or {}
+    ativo = tipo_terminal == "SERVIDOR" and opcoes.get("ativo")
+    if not ativo:
+        if servidor_espelho is not None:
+            servidor_espelho.parar()
+            servidor_espelho = None
+            log("🪞 Espelho da loja desligado")
+        return
+    if servidor_espelho is None:
+        porta = int(opcoes.get("porta", ESPELHO_PORTA))
         try:
-            alvo = datetime.strptime(h, "%H:%M").replace(year=agora.year, month=agora.month, day=agora.day)
-            fim = alvo + timedelta(minutes=tolerancia_min)
-            if alvo <= agora <= fim:
-                return True, h
-        except:
-            continue
-    return False, None
-
-def deve_executar(exe_info):
-    agora = datetime.now()
-    nome = exe_info.get("nome")
-
-    meses = exe_info.get("mes")
-    if meses and agora.month not in meses:
-        return False
+            servidor_espelho = ServidorEspelho(BASE_DIR, CONFIG_CACHE, porta, log=log)
+            servidor_espelho.iniciar()
+            log(f"🪞 Espelho da loja ativo na porta {porta}")
+        except OSError as e:
+            servidor_espelho = None
+            log(f"⚠️ Não foi possível abrir o espelho na porta {porta}: {e}", "AVISO")
+            return
+    if config_confirmado:
+        servidor_espelho.atualizar_config(config, preaquecer)
+
+def compilar_agenda(config, tipo_terminal):
+    if not agendador.compilar(config.get("executar", []), tipo_terminal, datetime.now(),
+                              ultimas=estado.ultimas_execucoes(), identidade=identidade_loja):
+        return
+    for tarefa, previsto, acao in agendador.perdidos:
+        M_PERDIDOS.inc(job=tarefa.chave)
+        log(f"⏪ Disparo perdido de '{tarefa.nome}' em {previsto.strftime('%d/%m/%Y %H:%M')} "
+            f"(política '{tarefa.recuperar}'): {acao}", "AVISO")
+    for chave in estado.remover_ausentes(set(agendador.tarefas)):
+        log(f"🧹 Estado de '{chave}' descartado (fora do config há mais de {MAX_IDADE_DIAS} dias)")
+    log(f"🗓️ Agenda recompilada: {len(agendador.tarefas)} tarefa(s) para o terminal {tipo_terminal}")
+    for nome, erro in agendador.erros:
+        log(f"❌ Agendamento '{nome}' inválido e ignorado: {erro}", "ERRO")
+    for quando, tarefa in agendador.proximos():
+        log(f"⏰ '{tarefa.nome}' ({tarefa.descricao()}) → próximo disparo {quando.strftime('%d/%m/%Y %H:%M')}")
+    for tarefa in agendador.tarefas.values():
+        if tarefa.proxima is None:
+            log(f"⚠️ Nenhum horário definido para '{tarefa.nome}'.", "AVISO")
+    atualizar_foto_agenda()
+
+def executar_tarefa(tarefa, previsto):
+    """Roda no pool de execução; retorna o returncode (ou None se não iniciou)."""
+    nome = tarefa.nome
+    try:
+        log(f"⏰ Agendamento detectado: '{nome}' → {previsto.strftime('%d/%m/%Y %H:%M')}")
+        caminho = resolve_executable_path(tarefa.info)
+        estado.registrar_inicio(tarefa.chave)
+        proc = executar_process(caminho, tarefa.info)
+        if not proc:
+            estado.registrar_fim(tarefa.chave, None)
+            M_JOB_EXECUCOES.inc(job=tarefa.chave, resultado="nao_iniciado")
+            return None
+        M_JOB_ATRASO.observar(max(0.0, proc.inicio - previsto.timestamp()), job=tarefa.chave)
+
+        timeout_min = tarefa.timeout_min or TIMEOUT_PADRAO_MIN
+        try:
+            codigo = proc.aguardar(timeout_min * 60 if timeout_min else None)
+            recursos = proc.recursos()
+        finally:
+            proc.fechar()
+        estado.registrar_fim(tarefa.chave, codigo)
+        M_JOB_DURACAO.observar(recursos["duracao_s"], job=tarefa.chave)
+        M_JOB_EXECUCOES.inc(job=tarefa.chave, resultado="timeout" if proc.expirou else ("ok" if codigo == 0 else "falha"))
+        if recursos["cpu_s"] is not None:
+            M_JOB_CPU.inc(recursos["cpu_s"], job=tarefa.chave)
+        historico.registrar({
+            "job": tarefa.chave,
+            "caminho": caminho,
+            "previsto": previsto.strftime("%Y-%m-%d %H:%M"),
+            "inicio": proc.inicio,
+            "fim": proc.fim,
+            "codigo": codigo,
+            "expirou": proc.expirou,
+            **recursos,
+            "saida_bytes": proc.captura.total_bytes,
+            "saida_dir": proc.captura.diretorio,
+            "saida_final": proc.captura.cauda(),
+        })
+
+        resumo = f"{recursos['duracao_s']:.0f}s"
+        if recursos["cpu_s"] is not None:
+            resumo += f", CPU {recursos['cpu_s']:.1f}s, pico {recursos['memoria_pico_mb']} MB"
+        if proc.expirou:
+            log(f"⏱️ '{nome}' excedeu o timeout de {timeout_min} min — árvore de processos encerrada ({resumo})", "ERRO")
+        else:
+            log(f"✅ Execução concluída com sucesso: {nome} (código {codigo}, {resumo})")
+        return codigo
+    except Exception as e:
+        log(f"❌ Erro ao processar agendamento '{nome}': {e}", "ERRO")
+    return None
 
-    dias = exe_info.get("dia")
-    if dias and agora.day not in dias:
-        return False
 
-    horario = exe_info.get("horario")
-    if horario:
-        dentro, h = dentro_da_janela(horario)
-        if not dentro:
-            return False
-
-        intervalo_dias = exe_info.get("intervalo_dias", 0)
-        if intervalo_dias > 0:
-            chave = f"{nome}__ultimo_dia"
-            ultima_execucao = last_run.get(chave)
-            if not ultima_execucao or (agora - ultima_execucao).days >= intervalo_dias:
-                last_run[chave] = agora
-                log(f"🗓️ Agendamento detectado: '{nome}' → {h} a cada {intervalo_dias} dias")
-                return True
-            else:
-                return False
-
-        # 🔒 Evita execuções repetidas dentro da janela de horário
-        chave = f"{nome}__{agora.strftime('%Y-%m-%d')}__{h}"
-        ultima_execucao = last_run.get(chave)
-        if ultima_execucao:
-            if (agora - ultima_execucao).seconds < 600:  # 10 minutos
-                log(f"⏳ '{nome}' já executado recentemente (janela de 10 min). Ignorando.")
-                return False
-
-        last_run[chave] = agora
-        log(f"⏰ Agendamento detectado: '{nome}' → horário {h}")
-        return True
-
-    intervalo = exe_info.get("intervalo", 0)
-    if intervalo > 0:
-        chave = f"{nome}__interval"
-        agora_ts = time.time()
-        ultima = last_run.get(chave, 0)
-        if agora_ts - ultima >= intervalo * 60:
-            last_run[chave] = agora_ts
-            log(f"🔁 Agendamento detectado: '{nome}' → a cada {intervalo} minutos")
-            return True
-
-    if dias and not horario:
-        log(f"📅 Agendamento detectado: '{nome}' → dia(s) {dias}")
-        return True
-
-    return False
+def proxima_consulta_config(agora_ts, janela_s):
+    """
+    Próxima consulta ao config alinhada ao CHECK_INTERVAL, com fase fixa por loja
+    dentro de `janela_s`: a frota não bate no GitHub no mesmo segundo.
+    """
+    fase = deslocamento(identidade_loja, "config", min(janela_s, CHECK_INTERVAL))
+    proxima = agora_ts - (agora_ts % CHECK_INTERVAL) + fase
+    while proxima <= agora_ts:
+        proxima += CHECK_INTERVAL
+    return proxima
+
+
+# -----------------------------
+# Controle (painel → launcher, ver controle.py)
+# -----------------------------
+def _epoch(momento):
+    return momento.timestamp() if momento else None
+
+def atualizar_foto_agenda():
+    """
+    Chamado pelo loop principal, com a trava: o canal de controle responde a
+    partir desta cópia e nunca espera o loop (que pode estar baixando o config
+    ou rodando o updater).
+    """
+    global foto_agenda
+    tarefas = dict(agendador.tarefas)
+    foto_agenda = {
+        "tarefas": tarefas,
+        "jobs": [{
+            "job": t.chave,
+            "nome": t.nome,
+            "agenda": t.descricao(),
+            "proxima": _epoch(t.proxima),
+            "ultima_execucao": _epoch(t.ultima_execucao),
+            "recuperar": t.recuperar,
+        } for t in tarefas.values()],
+        "proximos": [{"job": t.chave, "quando": _epoch(quando)} for quando, t in agendador.proximos()],
+        "proximo_disparo": _epoch(agendador.proximo_disparo()),
+    }
+
+def _tarefa_do_painel(job):
+    tarefas = foto_agenda["tarefas"]
+    tarefa = tarefas.get(job)
+    if tarefa is None:
+        tarefa = next((t for t in tarefas.values() if t.nome.lower() == str(job).lower()), None)
+    if tarefa is None:
+        raise ValueError(f"'{job}' não está na agenda deste terminal")
+    return tarefa
+
+def cmd_status():
+    foto = foto_agenda
+    versao, tipo = ler_versao_local()
+    return {
+        "pid": os.getpid(),
+        "inicio": inicio_launcher,
+        "versao": versao,
+        "tipo": tipo,
+        "identidade": identidade_loja,
+        "tarefas": len(foto["tarefas"]),
+        "rodando": [t.chave for t in pool.rodando()],
+        "fila": [t.chave for t in pool.pendentes()],
+        "max_workers": pool.max_workers,
+        "proximo_disparo": foto["proximo_disparo"],
+        "proxima_config": proxima_config,
+        "espelho": _situacao_espelho(),
+        "rollout": situacao_rollout or None,
+    }
+
+def _situacao_espelho():
+    if servidor_espelho is not None:
+        return {
+            "modo": "servidor",
+            "porta": servidor_espelho.endereco[1],
+            "servidos": servidor_espelho.servidos,
+            "bytes_servidos": servidor_espelho.bytes_servidos,
+            "baixados_da_origem": servidor_espelho.baixados,
+        }
+    espelho = endereco_espelho()
+    return {"modo": "caixa", "endereco": espelho, "falhando": espelho_falhando} if espelho else None
+
+def cmd_jobs():
+    rodando = {t.chave for t in pool.rodando()}
+    fila = {t.chave for t in pool.pendentes()}
+    return [dict(job, rodando=job["job"] in rodando, na_fila=job["job"] in fila) for job in foto_agenda["jobs"]]
+
+def cmd_proximos(limite=10):
+    return foto_agenda["proximos"][:limite]
+
+def cmd_executar(job):
+    """
+    Execução manual: só entra na mesma fila do agendador (respeita exclusivo_com
+    e max_concurrentes); o loop principal despacha quando estiver livre.
+    """
+    tarefa = _tarefa_do_painel(job)
+    enfileirado = pool.enviar(tarefa, datetime.now())
+    if enfileirado:
+        log(f"🖐️ Execução manual de '{tarefa.nome}' solicitada pelo painel")
+        pool.acordar()
+    return {"job": tarefa.chave, "enfileirado": enfileirado}
+
+def cmd_recarregar_config():
+    recarregar_config.set()
+    pool.acordar()
+    return {"agendado": True}
+
+def cmd_saida(job, max_kb=SAIDA_CAUDA_KB):
+    tarefa = foto_agenda["tarefas"].get(job)
+    caminho = resolve_executable_path(tarefa.info) if tarefa else job
+    nome_exe = os.path.splitext(os.path.basename(caminho))[0]
+    max_kb = min(max(1, int(max_kb)), CONTROLE_SAIDA_MAX_KB)
+    return {"job": job, "saida": ultima_saida(os.path.join(JOBS_LOG_DIR, nome_exe), max_kb * 1024)}
+
+COMANDOS_CONTROLE = {
+    "status": cmd_status,
+    "jobs": cmd_jobs,
+    "proximos": cmd_proximos,
+    "executar": cmd_executar,
+    "recarregar_config": cmd_recarregar_config,
+    "saida": cmd_saida,
+}
+
+
+# -----------------------------
+# Simulação (launcher --simular)
+# -----------------------------
+def parse_args():
+    parser = argparse.ArgumentParser(description="Launcher do MonitoramentoBKP")
+    parser.add_argument("--simular", action="store_true", help="simula a agenda com relógio virtual (não executa nada)")
+    parser.add_argument("--dias", type=int, default=7, help="dias simulados")
+    parser.add_argument("--config", default=CONFIG_CACHE, help="config.json a simular")
+    parser.add_argument("--terminal", default=None, help="tipo do terminal (padrão: versao.config ou SERVIDOR)")
+    parser.add_argument("--inicio", default=None, help="início da simulação 'AAAA-MM-DD HH:MM' (padrão: agora)")
+    parser.add_argument("--duracao", type=float, default=1.0, help="duração padrão de cada job em minutos")
+    parser.add_argument("--historico", default=RUNS_FILE, help="execucoes.jsonl usado para estimar durações")
+    parser.add_argument("--identidade", default=None, help="filial/hostname usado no espalhamento (padrão: deste terminal)")
+    parser.add_argument("--resumo", action="store_true", help="imprime só o resumo (benchmark)")
+    parser.add_argument("--json", action="store_true", help="linha do tempo em JSON Lines")
+    return parser.parse_args()
+
+def rodar_simulacao(args):
+    with open(args.config, "r", encoding="utf-8") as f:
+        config = json.load(f)
+
+    tipo = args.terminal
+    if not tipo:
+        try:
+            with open(VERSION_FILE, "r", encoding="utf-8") as f:
+                tipo = json.load(f).get("tipo", "SERVIDOR")
+        except Exception:
+            tipo = "SERVIDOR"
+    tipo = tipo.upper()
+    inicio = datetime.strptime(args.inicio, "%Y-%m-%d %H:%M") if args.inicio else datetime.now().replace(second=0, microsecond=0)
+
+    duracoes = {}
+    for job, r in resumo_por_job(ler_execucoes(args.historico)).items():
+        if r["media_recente_s"]:
+            duracoes[job] = r["media_recente_s"] / 60
+
+    eventos, resumo = simular(
+        config.get("executar", []), tipo, inicio, args.dias,
+        max_workers=MAX_EXECUCOES_SIMULTANEAS,
+        espacamento_recuperacao_min=ESPACAMENTO_RECUPERACAO_MIN,
+        duracao_padrao_min=args.duracao,
+        duracoes=duracoes,
+        identidade=args.identidade or identificador_loja(VERSION_FILE),
+    )
+
+    if not args.resumo:
+        for e in eventos:
+            if args.json:
+                print(json.dumps(e, default=str, ensure_ascii=False))
+                continue
+            extra = ""
+            if e.get("previsto") and e["tipo"] in ("recuperacao", "perdido"):
+                extra = f" (previsto {e['previsto'].strftime('%d/%m %H:%M')})"
+            if e.get("acao"):
+                extra += f" → {e['acao']}"
+            if e.get("com"):
+                extra = f" junto com {', '.join(e['com'])}"
+            if e.get("rodando") is not None:
+                extra = f" aguardando ({', '.join(e['rodando']) or 'grupo de exclusão'})"
+            print(f"{e['quando'].strftime('%d/%m/%Y %H:%M')}  {e['tipo']:<13} {e['job']}{extra}")
+
+    print(f"📊 {resumo['dias']} dia(s) simulados em {resumo['segundos']:.3f}s "
+          f"({resumo['eventos_por_segundo']:.0f} eventos/s) — terminal {tipo}")
+    print(f"   disparos {resumo['disparos']}, esperas {resumo['esperas']}, "
+          f"sobreposições {resumo['sobreposicoes']}, máx. simultâneos {resumo['max_simultaneos']}")
+    for job, n in sorted(resumo["por_job"].items()):
+        print(f"   {job}: {n}")
+    for job, erro in resumo["erros"]:
+        print(f"❌ {job}: {erro}")
+    return 1 if resumo["erros"] else 0
 
 
 # -----------------------------
 # Principal
 # -----------------------------
 if __name__ == "__main__":
+    args = parse_args()
+    if args.simular:
+        sys.exit(rodar_simulacao(args))
+
     log("🚀 Launcher iniciado")
+    estado = EstadoAgenda(STATE_FILE)
+    historico = HistoricoExecucoes(RUNS_FILE)
+    log(f"💾 Estado do agendador carregado: {len(estado.jobs)} job(s) em {STATE_FILE}")
+    pool = PoolExecucao(MAX_EXECUCOES_SIMULTANEAS, executar_tarefa)
+    proxima_config = 0
+    proximas_metricas = 0
+    config = None
+
+    # Edição do versao.config (painel, valida_bkp) vale na hora: acorda o loop e recompila
+    versao_alterada = threading.Event()
+    versao_config.ao_mudar(lambda _arquivo: (versao_alterada.set(), pool.acordar()))
+    observador.iniciar()
+    log(f"👀 Observando versao.config (modo {observador.modo})", "DEBUG")
+
+    if CONTROLE_PORTA:
+        try:
+            ServidorControle(gerar_token(CONTROLE_TOKEN), COMANDOS_CONTROLE, CONTROLE_PORTA).iniciar()
+            log(f"🎛️ Canal de controle do painel em 127.0.0.1:{CONTROLE_PORTA}", "DEBUG")
+        except OSError as e:
+            log(f"⚠️ Não foi possível abrir o canal de controle na porta {CONTROLE_PORTA}: {e}", "AVISO")
+
+    M_INICIO.definir(inicio_launcher)
+    if METRICAS_PORTA:
+        try:
+            ServidorMetricas(metricas, BASE_DIR, METRICAS_PORTA).iniciar()
+            log(f"📊 Métricas em http://127.0.0.1:{METRICAS_PORTA}/metrics")
+        except OSError as e:
+            log(f"⚠️ Não foi possível abrir a porta de métricas {METRICAS_PORTA}: {e}", "AVISO")
+
+    # Subiu no meio de uma troca do launcher.exe (o updater que a pediu não rodou o valida_bkp)
+    if troca_em_andamento():
+        log("🔀 Launcher iniciado pela troca do launcher.exe — executando valida_bkp.exe")
+        rodar_valida()
 
     while True:
-        config = baixar_config()
-        if not config:
-            log("⚠️ Falha ao carregar config. Tentando novamente...")
-            time.sleep(CHECK_INTERVAL)
-            continue
-
-        versao_remota = config.get("versao", "0.0.0")
-        versao_local, tipo_terminal = ler_versao_local()
-        log(f"💻 Tipo deste terminal: {tipo_terminal}")
-
-        if comparar_versoes(versao_local, versao_remota):
-            rodar_updater(versao_remota, versao_local)
-        else:
-            log(f"✔️ Sistema atualizado — versão atual {versao_local}")
-
-        # Execução conforme configuração
-        for exe_info in config.get("executar", []):
-            try:
-                nome = exe_info.get("nome", "desconhecido")
-                if not exe_info.get("ativo", True):
-                    continue
-
-                tipos = [t.upper() for t in exe_info.get("terminal", [])]
-                if tipos:
-                    if tipo_terminal not in tipos:
-                        log(f"💡 Execução '{nome}' ignorada — restrita a {tipos}.")
-                        continue
+        inicio_volta = time.perf_counter()
+        with trava_agenda:
+            if recarregar_config.is_set():
+                recarregar_config.clear()
+                proxima_config = 0
+            if time.time() >= proxima_config:
+                config = baixar_config()
+                if not config:
+                    log("⚠️ Falha ao carregar config. Tentando novamente...", "AVISO")
+                    proxima_config = proxima_consulta_config(time.time(), ESPALHAR_CONFIG_S)
                 else:
-                    log(f"⚙️ Execução '{nome}' configurada para todos os terminais.")
-
-                horario = exe_info.get("horario")
-                intervalo_dias = exe_info.get("intervalo_dias", 0)
-                dias = exe_info.get("dia")
-                meses = exe_info.get("mes")
-
-                if dias and meses:
-                    log(f"📅 Agendamento '{nome}' configurado para rodar no(s) dia(s) {dias} do(s) mês(es) {meses}.")
-                elif dias:
-                    log(f"📅 Agendamento '{nome}' configurado para rodar no(s) dia(s): {dias}.")
-                elif meses:
-                    log(f"📅 Agendamento '{nome}' configurado para rodar no(s) mês(es): {meses}.")
-                elif intervalo_dias > 0 and horario:
-                    log(f"🔄 Agendamento '{nome}' configurado para rodar às {horario} a cada {intervalo_dias} dia(s).")
-                elif horario:
-                    log(f"⏰ Agendamento '{nome}' configurado para rodar nos horários: {horario}")
+                    versao_remota = config.get("versao", "0.0.0")
+                    versao_local, tipo_terminal = ler_versao_local()
+                    identidade_loja = identificador_de(versao_config.obter())
+                    proxima_config = proxima_consulta_config(
+                        time.time(), config.get("espalhar_config_s", ESPALHAR_CONFIG_S)
+                    )
+                    log(f"💻 Tipo deste terminal: {tipo_terminal}", "DEBUG")
+                    liberada = avaliar_rollout(config)
+                    configurar_espelho(config, tipo_terminal, preaquecer=liberada)
+
+                    if comparar_versoes(versao_local, versao_remota):
+                        if troca_em_andamento():
+                            log("🔀 Troca do launcher.exe em andamento — updater não roda nesta volta", "DEBUG")
+                        elif not liberada:
+                            log(f"⏸️ Mantendo a versão {versao_local} (rollout de {versao_remota} em andamento)", "DEBUG")
+                        elif troca_adiada(versao_remota):
+                            log(f"🔀 Troca do launcher.exe para {versao_remota} foi revertida — nova tentativa em "
+                                f"{troca_adiada(versao_remota) / 60:.0f} min", "DEBUG")
+                        else:
+                            rodar_updater(versao_remota, versao_local)
+                    else:
+                        log(f"✔️ Sistema atualizado — versão atual {versao_local}", "DEBUG")
+
+                    compilar_agenda(config, tipo_terminal)
+
+            if versao_alterada.is_set():
+                versao_alterada.clear()
+                if config:
+                    _, tipo_terminal = ler_versao_local()
+                    identidade_loja = identificador_de(versao_config.obter())
+                    log(f"📝 versao.config alterado — terminal {tipo_terminal}, identidade {identidade_loja}")
+                    compilar_agenda(config, tipo_terminal)
+
+            # Jobs finalizados desde a última volta
+            for tarefa, codigo, erro in pool.coletar():
+                if erro:
+                    log(f"❌ Erro no job '{tarefa.nome}': {erro}", "ERRO")
                 else:
-                    log(f"⚠️ Nenhum horário definido para '{nome}'.")
-
-                if deve_executar(exe_info):
-                    caminho = resolve_executable_path(exe_info)
-                    proc = executar_process(caminho)
-                    if proc:
-                        proc.wait()
-                        log(f"✅ Execução concluída com sucesso: {nome}")
-
-            except Exception as e:
-                log(f"❌ Erro ao processar agendamento '{exe_info.get('nome', 'desconhecido')}': {e}")
-
-        time.sleep(CHECK_INTERVAL)
+                    log(f"🏁 '{tarefa.nome}' finalizado (returncode {codigo})", "DEBUG")
+            acompanhar_manutencao()
+
+            # Execução conforme agenda (somente o que já venceu) — entra na fila do pool
+            for previsto, tarefa, recuperacao in agendador.vencidas(datetime.now()):
+                if recuperacao:
+                    log(f"⏪ Recuperando disparo perdido de '{tarefa.nome}' ({previsto.strftime('%d/%m/%Y %H:%M')})")
+                if not pool.enviar(tarefa, previsto):
+                    log(f"⏳ '{tarefa.nome}' já está aguardando na fila. Ignorando disparo duplicado.")
+
+            for tarefa in pool.despachar():
+                log(f"▶️ '{tarefa.nome}' despachado ({len(pool.rodando())}/{pool.max_workers} em execução)", "DEBUG")
+
+            # Dorme até o próximo disparo, a próxima consulta do config ou o fim de algum job (ou do updater/valida_bkp)
+            acordar = proxima_config
+            proximo = agendador.proximo_disparo()
+            if proximo is not None:
+                acordar = min(acordar, proximo.timestamp())
+                M_PROXIMO.definir(proximo.timestamp())
+            if manutencao["proc"] is not None:
+                acordar = min(acordar, time.time() + MANUTENCAO_VERIFICAR_S)
+
+            atualizar_foto_agenda()
+            M_RODANDO.definir(len(pool.rodando()))
+            M_FILA.definir(len(pool.pendentes()))
+            M_VOLTA.observar(time.perf_counter() - inicio_volta)
+            if time.time() >= proximas_metricas:
+                metricas.salvar(BASE_DIR)
+                proximas_metricas = time.time() + METRICAS_INTERVALO
+        pool.aguardar(acordar - time.time())
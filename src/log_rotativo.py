@@ -0,0 +1,210 @@
+"""
+Log rotativo compartilhado pelo launcher, updater e valida_bkp.
+Mantém o arquivo aberto em modo append (sem reler/regravar a cada linha)
+e faz a rotação por tamanho ou quantidade de linhas em segundo plano.
+"""
+
+import os
+import gzip
+import shutil
+import atexit
+import threading
+from datetime import datetime
+
+NIVEIS = {"DEBUG": 10, "INFO": 20, "AVISO": 30, "ERRO": 40}
+
+
+class LogRotativo:
+    """
+    Escritor de log em modo append com rotação em segmentos numerados
+    (arquivo.log.1, arquivo.log.2, ...) opcionalmente compactados em gzip.
+
+    flush="registro" grava em disco a cada linha; flush="lote" acumula até
+    `flush_lote` linhas ou `flush_intervalo` segundos.
+
+    cauda=True não gera segmentos: o próprio arquivo é aparado para as
+    últimas `max_linhas` linhas (logs por executável lidos pelo painel e
+    pelo suporte, que precisam continuar vendo o histórico recente).
+    """
+
+    def __init__(self, caminho, max_bytes=1024 * 1024, max_linhas=None, segmentos=5,
+                 compactar=False, nivel="INFO", flush="registro", flush_lote=20,
+                 flush_intervalo=2.0, eco=True, cauda=False):
+        self.caminho = caminho
+        self.max_bytes = max_bytes
+        self.max_linhas = max_linhas
+        self.segmentos = max(1, segmentos)
+        self.compactar = compactar
+        self.nivel = NIVEIS.get(str(nivel).upper(), NIVEIS["INFO"])
+        self.flush = flush
+        self.flush_lote = max(1, flush_lote)
+        self.flush_intervalo = flush_intervalo
+        self.eco = eco
+        self.cauda = cauda and bool(max_linhas)
+
+        self._lock = threading.Lock()
+        self._evento = threading.Event()
+        self._pendentes = 0
+        self._rotacionar = False
+        self._fechado = False
+
+        os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+        self._abrir()
+
+        self._thread = threading.Thread(target=self._manutencao, daemon=True)
+        self._thread.start()
+        atexit.register(self.fechar)
+
+    # -----------------------------
+    # Escrita
+    # -----------------------------
+    def escrever(self, msg, nivel="INFO"):
+        nivel = str(nivel).upper()
+        if NIVEIS.get(nivel, NIVEIS["INFO"]) < self.nivel:
+            return
+        now = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+        linha = f"[{now}] [{nivel}] {msg}\n"
+
+        with self._lock:
+            if self._fechado:
+                return
+            try:
+                self._arquivo.write(linha)
+                self._bytes += len(linha.encode("utf-8"))
+                self._linhas += 1
+                self._pendentes += 1
+                if self.flush == "registro" or self._pendentes >= self.flush_lote:
+                    self._arquivo.flush()
+                    self._pendentes = 0
+            except Exception as e:
+                print(f"❌ Erro ao gravar log {self.caminho}: {e}")
+
+            if self._precisa_rotacionar():
+                self._rotacionar = True
+                self._evento.set()
+
+        if self.eco:
+            print(linha.strip())
+
+    def fechar(self):
+        with self._lock:
+            if self._fechado:
+                return
+            self._fechado = True
+            try:
+                self._arquivo.flush()
+                self._arquivo.close()
+            except Exception:
+                pass
+        self._evento.set()
+
+    # -----------------------------
+    # Internos
+    # -----------------------------
+    def _abrir(self):
+        self._arquivo = open(self.caminho, "a", encoding="utf-8")
+        self._bytes = self._arquivo.tell()
+        self._linhas = 0
+        if self.max_linhas and self._bytes:
+            with open(self.caminho, "rb") as f:
+                self._linhas = sum(bloco.count(b"\n") for bloco in iter(lambda: f.read(65536), b""))
+
+    def _precisa_rotacionar(self):
+        if self.max_bytes and self._bytes >= self.max_bytes:
+            return True
+        if self.cauda:
+            return self._linhas > self.max_linhas
+        if self.max_linhas and self._linhas >= self.max_linhas:
+            return True
+        return False
+
+    def _nome_segmento(self, i):
+        sufixo = ".gz" if self.compactar else ""
+        return f"{self.caminho}.{i}{sufixo}"
+
+    def _manutencao(self):
+        """Thread de fundo: flush periódico em modo lote e rotação dos segmentos."""
+        while True:
+            self._evento.wait(self.flush_intervalo)
+            self._evento.clear()
+
+            with self._lock:
+                if self._fechado:
+                    return
+                if self._pendentes:
+                    try:
+                        self._arquivo.flush()
+                    except Exception:
+                        pass
+                    self._pendentes = 0
+                if not self._rotacionar:
+                    continue
+                if self.cauda:
+                    self._aparar()
+                    continue
+                rotacionado = self._girar_segmentos()
+
+            # Compactação fora do lock para não travar quem está escrevendo
+            if rotacionado and self.compactar:
+                self._compactar(rotacionado)
+
+    def _girar_segmentos(self):
+        """Fecha o arquivo atual, desloca os segmentos e reabre. Retorna o caminho do segmento .1."""
+        self._rotacionar = False
+        try:
+            self._arquivo.close()
+            ultimo = self._nome_segmento(self.segmentos)
+            if os.path.exists(ultimo):
+                os.remove(ultimo)
+            for i in range(self.segmentos - 1, 0, -1):
+                origem = self._nome_segmento(i)
+                if os.path.exists(origem):
+                    os.replace(origem, self._nome_segmento(i + 1))
+            destino = f"{self.caminho}.1"
+            os.replace(self.caminho, destino)
+            return destino
+        except Exception as e:
+            # No Windows outro processo (painel) pode estar com o arquivo aberto; tenta na próxima
+            print(f"⚠️ Falha ao rotacionar log {self.caminho}: {e}")
+            return None
+        finally:
+            self._abrir()
+
+    def _aparar(self):
+        """Regrava o arquivo só com as últimas max_linhas linhas (troca atômica)."""
+        self._rotacionar = False
+        temp = self.caminho + ".tmp"
+        try:
+            self._arquivo.close()
+            with open(self.caminho, "r", encoding="utf-8", errors="replace") as f:
+                linhas = f.readlines()[-self.max_linhas:]
+            with open(temp, "w", encoding="utf-8") as f:
+                f.writelines(linhas)
+            os.replace(temp, self.caminho)
+        except Exception as e:
+            # Mesmo caso da rotação: arquivo aberto por outro processo; tenta na próxima linha
+            print(f"⚠️ Falha ao aparar log {self.caminho}: {e}")
+        finally:
+            self._abrir()
+
+    def _compactar(self, caminho):
+        try:
+            with open(caminho, "rb") as origem, gzip.open(caminho + ".gz", "wb") as destino:
+                shutil.copyfileobj(origem, destino)
+            os.remove(caminho)
+        except Exception as e:
+            print(f"⚠️ Falha ao compactar {caminho}: {e}")
+
+
+_logs_abertos = {}
+_logs_lock = threading.Lock()
+
+
+def abrir_log(caminho, **opcoes):
+    """Retorna o LogRotativo do caminho, criando-o na primeira chamada."""
+    with _logs_lock:
+        escritor = _logs_abertos.get(caminho)
+        if escritor is None:
+            escritor = LogRotativo(caminho, **opcoes)
+            _logs_abertos[caminho] = escritor
+        return escritor
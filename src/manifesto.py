@@ -0,0 +1,74 @@
+"""
+Manifesto dos arquivos instalados pelo updater (manifesto.json na pasta de
+instalação): caminho → sha256, tamanho e mtime.
+O hash só é recalculado quando o tamanho ou o mtime do arquivo mudam, então
+conferir um launcher.exe de vários MB a cada atualização custa um stat().
+"""
+
+import os
+import json
+import hashlib
+import threading
+
+ARQUIVO = "manifesto.json"
+BLOCO = 1024 * 1024
+
+
+def sha256_arquivo(caminho):
+    h = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(BLOCO), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+class Manifesto:
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        self.entradas = self._carregar()
+        self.hashes_calculados = 0  # quantos arquivos precisaram ser lidos por inteiro
+
+    def hash_atual(self, caminho):
+        """sha256 do arquivo no disco (None se não existe), usando o cache por tamanho+mtime."""
+        chave = os.path.normcase(os.path.abspath(caminho))
+        try:
+            st = os.stat(caminho)
+        except OSError:
+            return None
+        with self._lock:
+            entrada = self.entradas.get(chave)
+        if entrada and entrada.get("tamanho") == st.st_size and entrada.get("mtime_ns") == st.st_mtime_ns:
+            return entrada["sha256"]
+        digest = sha256_arquivo(caminho)
+        self.hashes_calculados += 1
+        self._gravar_entrada(chave, digest, st)
+        return digest
+
+    def registrar(self, caminho, sha256):
+        """Após instalar: grava o hash já conhecido (calculado durante o download)."""
+        chave = os.path.normcase(os.path.abspath(caminho))
+        self._gravar_entrada(chave, sha256, os.stat(caminho))
+
+    def salvar(self):
+        with self._lock:
+            dados = dict(self.entradas)
+        temp = self.caminho + ".tmp"
+        try:
+            with open(temp, "w", encoding="utf-8") as f:
+                json.dump(dados, f, indent=2)
+            os.replace(temp, self.caminho)
+        except Exception as e:
+            print(f"⚠️ Falha ao gravar {self.caminho}: {e}")
+
+    def _gravar_entrada(self, chave, sha256, st):
+        with self._lock:
+            self.entradas[chave] = {"sha256": sha256, "tamanho": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+    def _carregar(self):
+        try:
+            with open(self.caminho, "r", encoding="utf-8") as f:
+                dados = json.load(f)
+            return dados if isinstance(dados, dict) else {}
+        except Exception:
+            return {}
@@ -0,0 +1,265 @@
+"""
+Registro de métricas em processo: contadores, medidores e histogramas com
+faixas fixas, com rótulos opcionais (ex.: job="SQL_ROTINA_BACKUP.bat").
+O launcher serve as métricas em 127.0.0.1 no formato texto do Prometheus
+(GET /metrics) e todos os executáveis gravam um instantâneo JSON em
+metricas/<processo>.json, lido pelo painel. Os instantâneos do updater e do
+valida_bkp (processos curtos) também são incluídos no /metrics do launcher.
+"""
+
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PREFIXO = "monitbkp_"
+FAIXAS_SEGUNDOS = (0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600, 14400)
+PASTA_INSTANTANEOS = "metricas"
+
+CONTADOR = "counter"
+MEDIDOR = "gauge"
+HISTOGRAMA = "histogram"
+
+
+def _chave(rotulos):
+    return tuple(sorted((str(k), str(v)) for k, v in rotulos.items()))
+
+
+class Metrica:
+    def __init__(self, nome, ajuda, tipo, faixas=None):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.tipo = tipo
+        self.faixas = tuple(faixas) if faixas else None
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def inc(self, valor=1, **rotulos):
+        with self._lock:
+            chave = _chave(rotulos)
+            self._series[chave] = self._series.get(chave, 0) + valor
+
+    def definir(self, valor, **rotulos):
+        with self._lock:
+            self._series[_chave(rotulos)] = valor
+
+    def observar(self, valor, **rotulos):
+        with self._lock:
+            chave = _chave(rotulos)
+            serie = self._series.get(chave)
+            if serie is None:
+                serie = self._series[chave] = {"faixas": [0] * (len(self.faixas) + 1), "soma": 0.0, "contagem": 0}
+            i = 0
+            while i < len(self.faixas) and valor > self.faixas[i]:
+                i += 1
+            serie["faixas"][i] += 1
+            serie["soma"] += valor
+            serie["contagem"] += 1
+
+    @contextmanager
+    def cronometrar(self, **rotulos):
+        """with histograma.cronometrar(job=...): observa a duração do bloco em segundos."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - inicio, **rotulos)
+
+    def instantaneo(self):
+        with self._lock:
+            series = []
+            for chave, valor in self._series.items():
+                serie = {"rotulos": dict(chave)}
+                if self.tipo == HISTOGRAMA:
+                    serie.update(faixas=list(valor["faixas"]), soma=valor["soma"], contagem=valor["contagem"])
+                else:
+                    serie["valor"] = valor
+                series.append(serie)
+        dados = {"nome": self.nome, "tipo": self.tipo, "ajuda": self.ajuda, "series": series}
+        if self.faixas:
+            dados["limites"] = list(self.faixas)
+        return dados
+
+
+class Registro:
+    def __init__(self, processo):
+        self.processo = processo
+        self._metricas = {}
+        self._lock = threading.Lock()
+
+    def contador(self, nome, ajuda=""):
+        return self._obter(nome, ajuda, CONTADOR)
+
+    def medidor(self, nome, ajuda=""):
+        return self._obter(nome, ajuda, MEDIDOR)
+
+    def histograma(self, nome, ajuda="", faixas=FAIXAS_SEGUNDOS):
+        return self._obter(nome, ajuda, HISTOGRAMA, faixas)
+
+    def instantaneo(self):
+        with self._lock:
+            metricas = list(self._metricas.values())
+        return {
+            "processo": self.processo,
+            "gerado_em": time.time(),
+            "metricas": [m.instantaneo() for m in metricas],
+        }
+
+    def salvar(self, base_dir):
+        """Grava metricas/<processo>.json (troca atômica: o painel nunca lê pela metade)."""
+        pasta = os.path.join(base_dir, PASTA_INSTANTANEOS)
+        caminho = os.path.join(pasta, f"{self.processo}.json")
+        try:
+            os.makedirs(pasta, exist_ok=True)
+            temp = caminho + ".tmp"
+            with open(temp, "w", encoding="utf-8") as f:
+                json.dump(self.instantaneo(), f)
+            os.replace(temp, caminho)
+        except Exception as e:
+            print(f"⚠️ Falha ao gravar métricas em {caminho}: {e}")
+
+    def _obter(self, nome, ajuda, tipo, faixas=None):
+        nome = PREFIXO + nome
+        with self._lock:
+            metrica = self._metricas.get(nome)
+            if metrica is None:
+                metrica = self._metricas[nome] = Metrica(nome, ajuda, tipo, faixas)
+            return metrica
+
+
+# -----------------------------
+# Instantâneos / formato Prometheus
+# -----------------------------
+def ler_instantaneos(base_dir):
+    """{processo: instantâneo} de todos os metricas/*.json."""
+    pasta = os.path.join(base_dir, PASTA_INSTANTANEOS)
+    dados = {}
+    try:
+        nomes = sorted(f for f in os.listdir(pasta) if f.endswith(".json"))
+    except OSError:
+        return dados
+    for nome in nomes:
+        try:
+            with open(os.path.join(pasta, nome), "r", encoding="utf-8") as f:
+                inst = json.load(f)
+            dados[inst.get("processo") or nome[:-5]] = inst
+        except Exception:
+            continue
+    return dados
+
+
+def _rotulos_texto(rotulos, extra=None):
+    itens = dict(rotulos)
+    if extra:
+        itens.update(extra)
+    if not itens:
+        return ""
+    partes = []
+    for k, v in sorted(itens.items()):
+        v = str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        partes.append(f'{k}="{v}"')
+    return "{" + ",".join(partes) + "}"
+
+
+def _numero(valor):
+    if valor == float("inf"):
+        return "+Inf"
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def texto_prometheus(instantaneos):
+    """
+    Formato de exposição em texto do Prometheus (versão 0.0.4).
+    Uma métrica com séries em mais de um instantâneo (ex.: updater e a troca
+    do launcher.exe, que roda o mesmo código) sai uma vez, com as séries de
+    cada processo separadas pelo rótulo processo.
+    """
+    fontes = {}  # nome -> [(processo, métrica)], na ordem dos instantâneos
+    for inst in instantaneos:
+        for m in inst.get("metricas", []):
+            lista = fontes.setdefault(m["nome"], [])
+            if not lista or (m["series"] and m["tipo"] == lista[0][1]["tipo"]):
+                lista.append((inst.get("processo"), m))
+    linhas = []
+    for nome, lista in fontes.items():
+        lista = [(p, m) for p, m in lista if m["series"]] or lista[:1]
+        linhas.append(f"# HELP {nome} {lista[0][1].get('ajuda', '')}")
+        linhas.append(f"# TYPE {nome} {lista[0][1]['tipo']}")
+        for processo, m in lista:
+            for serie in m["series"]:
+                rotulos = dict(serie["rotulos"], processo=processo) if len(lista) > 1 else serie["rotulos"]
+                if m["tipo"] != HISTOGRAMA:
+                    linhas.append(f"{m['nome']}{_rotulos_texto(rotulos)} {_numero(serie['valor'])}")
+                    continue
+                acumulado = 0
+                for limite, qtd in zip(list(m["limites"]) + [float("inf")], serie["faixas"]):
+                    acumulado += qtd
+                    le = {"le": _numero(limite if limite == float("inf") else float(limite))}
+                    linhas.append(f"{m['nome']}_bucket{_rotulos_texto(rotulos, le)} {acumulado}")
+                linhas.append(f"{m['nome']}_sum{_rotulos_texto(rotulos)} {_numero(float(serie['soma']))}")
+                linhas.append(f"{m['nome']}_count{_rotulos_texto(rotulos)} {serie['contagem']}")
+    return "\n".join(linhas) + "\n"
+
+
+def quantil_aproximado(limites, faixas, q):
+    """Limite superior da faixa que contém o quantil q (como histogram_quantile, sem interpolar)."""
+    total = sum(faixas)
+    if not total:
+        return None
+    alvo = q * total
+    acumulado = 0
+    for limite, qtd in zip(list(limites) + [float("inf")], faixas):
+        acumulado += qtd
+        if acumulado >= alvo:
+            return limite
+    return float("inf")
+
+
+# -----------------------------
+# Servidor HTTP (launcher)
+# -----------------------------
+class ServidorMetricas:
+    """GET /metrics em host:porta numa thread daemon; falha ao abrir a porta não derruba o launcher."""
+
+    def __init__(self, registro, base_dir, porta, host="127.0.0.1"):
+        self.registro = registro
+        self.base_dir = base_dir
+        self.endereco = (host, porta)
+        self._servidor = None
+
+    def iniciar(self):
+        servidor_metricas = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                corpo = servidor_metricas.texto().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+
+            def log_message(self, *args):
+                pass
+
+        self._servidor = ThreadingHTTPServer(self.endereco, Handler)
+        self._servidor.daemon_threads = True
+        threading.Thread(target=self._servidor.serve_forever, name="metricas", daemon=True).start()
+
+    def texto(self):
+        instantaneos = [self.registro.instantaneo()]
+        for processo, inst in ler_instantaneos(self.base_dir).items():
+            if processo != self.registro.processo:
+                instantaneos.append(inst)
+        return texto_prometheus(instantaneos)
+
+    def parar(self):
+        if self._servidor:
+            self._servidor.shutdown()
+            self._servidor.server_close()
+            self._servidor = None
@@ -0,0 +1,191 @@
+"""
+Cópias em memória de arquivos pequenos (versao.config, config_cache.json)
+invalidadas só quando o arquivo muda.
+No Windows uma thread espera notificações do sistema
+(FindFirstChangeNotification na pasta do arquivo); sem elas, cai para uma
+checagem barata de mtime/tamanho a cada INTERVALO_STAT_S. Em ambos os casos
+obter() não toca o disco: devolve a última versão carregada.
+"""
+
+import os
+import json
+import time
+import ctypes
+import threading
+
+WINDOWS = os.name == "nt"
+INTERVALO_STAT_S = 2.0  # modo sem notificações (ou após falha ao criá-las)
+VARREDURA_SEGURANCA_S = 60  # no modo com notificações, confere mtime/tamanho mesmo sem aviso
+
+if WINDOWS:
+    from ctypes import wintypes
+
+    _kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+
+    FILE_NOTIFY_CHANGE_FILE_NAME = 0x01
+    FILE_NOTIFY_CHANGE_SIZE = 0x08
+    FILE_NOTIFY_CHANGE_LAST_WRITE = 0x10
+    WAIT_OBJECT_0 = 0x000
+    WAIT_TIMEOUT = 0x102
+    INVALID_HANDLE_VALUE = wintypes.HANDLE(-1).value
+
+    _kernel32.FindFirstChangeNotificationW.restype = wintypes.HANDLE
+    _kernel32.FindFirstChangeNotificationW.argtypes = [wintypes.LPCWSTR, wintypes.BOOL, wintypes.DWORD]
+    _kernel32.FindNextChangeNotification.argtypes = [wintypes.HANDLE]
+    _kernel32.FindCloseChangeNotification.argtypes = [wintypes.HANDLE]
+    _kernel32.WaitForMultipleObjects.restype = wintypes.DWORD
+    _kernel32.WaitForMultipleObjects.argtypes = [
+        wintypes.DWORD, ctypes.POINTER(wintypes.HANDLE), wintypes.BOOL, wintypes.DWORD,
+    ]
+
+
+def carregar_json(caminho):
+    with open(caminho, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _assinatura(caminho):
+    try:
+        st = os.stat(caminho)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class ArquivoObservado:
+    """obter() devolve a cópia em memória (não altere o objeto devolvido)."""
+
+    def __init__(self, caminho, carregar=carregar_json, padrao=None):
+        self.caminho = caminho
+        self.carregar = carregar
+        self.padrao = padrao
+        self.dados = padrao
+        self.versao = 0  # incrementa a cada recarga com conteúdo novo
+        self._assinatura = None
+        self._pendente = True
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def obter(self):
+        if self._pendente:
+            self.verificar()
+        return self.dados
+
+    def ao_mudar(self, funcao):
+        """funcao(arquivo) é chamada (na thread do observador) quando o conteúdo muda."""
+        self._callbacks.append(funcao)
+
+    def verificar(self):
+        """Recarrega se mtime/tamanho mudaram. Retorna True se o conteúdo mudou."""
+        with self._lock:
+            assinatura = _assinatura(self.caminho)
+            if assinatura == self._assinatura and not self._pendente:
+                return False
+            if assinatura is None:
+                dados = self.padrao
+            else:
+                try:
+                    dados = self.carregar(self.caminho)
+                except Exception:
+                    # Arquivo sendo gravado (ou inválido): mantém a cópia anterior e tenta de novo
+                    self._pendente = True
+                    return False
+            self._assinatura = assinatura
+            self._pendente = False
+            if dados == self.dados and self.versao:
+                return False
+            self.dados = dados
+            self.versao += 1
+        for funcao in self._callbacks:
+            try:
+                funcao(self)
+            except Exception as e:
+                print(f"⚠️ Erro no aviso de mudança de {self.caminho}: {e}")
+        return True
+
+    def invalidar(self):
+        """Para quem acabou de gravar o arquivo no mesmo processo: recarrega já."""
+        with self._lock:
+            self._pendente = True
+        self.verificar()
+
+
+class Observador:
+    def __init__(self, intervalo_s=INTERVALO_STAT_S):
+        self.intervalo_s = intervalo_s
+        self.arquivos = []
+        self.modo = None  # "notificacao" ou "stat", definido em iniciar()
+        self._parar = threading.Event()
+        self._thread = None
+
+    def observar(self, caminho, carregar=carregar_json, padrao=None):
+        arquivo = ArquivoObservado(caminho, carregar, padrao)
+        arquivo.verificar()
+        self.arquivos.append(arquivo)
+        return arquivo
+
+    def iniciar(self):
+        handles = self._criar_notificacoes() if WINDOWS else None
+        self.modo = "notificacao" if handles else "stat"
+        alvo = self._loop_notificacao if handles else self._loop_stat
+        self._thread = threading.Thread(target=alvo, args=(handles,), name="observador", daemon=True)
+        self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+
+    # -----------------------------
+    # Internos
+    # -----------------------------
+    def _verificar(self, arquivos):
+        for arquivo in arquivos:
+            arquivo.verificar()
+
+    def _loop_stat(self, _handles):
+        while not self._parar.wait(self.intervalo_s):
+            self._verificar(self.arquivos)
+
+    def _criar_notificacoes(self):
+        """{handle: [arquivos da pasta]} ou None se alguma pasta não puder ser observada."""
+        por_pasta = {}
+        for arquivo in self.arquivos:
+            por_pasta.setdefault(os.path.dirname(os.path.abspath(arquivo.caminho)), []).append(arquivo)
+        handles = {}
+        filtro = FILE_NOTIFY_CHANGE_FILE_NAME | FILE_NOTIFY_CHANGE_SIZE | FILE_NOTIFY_CHANGE_LAST_WRITE
+        for pasta, arquivos in por_pasta.items():
+            handle = _kernel32.FindFirstChangeNotificationW(pasta, False, filtro)
+            if not handle or handle == INVALID_HANDLE_VALUE:
+                for h in handles:
+                    _kernel32.FindCloseChangeNotification(h)
+                return None
+            handles[handle] = arquivos
+        return handles or None
+
+    def _loop_notificacao(self, handles):
+        lista = list(handles)
+        vetor = (wintypes.HANDLE * len(lista))(*lista)
+        proxima_varredura = time.monotonic() + VARREDURA_SEGURANCA_S
+        try:
+            while not self._parar.is_set():
+                r = _kernel32.WaitForMultipleObjects(len(lista), vetor, False, int(self.intervalo_s * 1000))
+                if WAIT_OBJECT_0 <= r < WAIT_OBJECT_0 + len(lista):
+                    handle = lista[r - WAIT_OBJECT_0]
+                    # Rajadas de gravação geram vários avisos: espera assentar antes de reler
+                    time.sleep(0.1)
+                    _kernel32.FindNextChangeNotification(handle)
+                    self._verificar(handles[handle])
+                elif r != WAIT_TIMEOUT:
+                    break
+                pendentes = [a for a in self.arquivos if a._pendente]
+                if pendentes:
+                    self._verificar(pendentes)
+                if time.monotonic() >= proxima_varredura:
+                    self._verificar(self.arquivos)
+                    proxima_varredura = time.monotonic() + VARREDURA_SEGURANCA_S
+        finally:
+            for h in lista:
+                _kernel32.FindCloseChangeNotification(h)
+        if not self._parar.is_set():
+            # WaitForMultipleObjects falhou: segue no modo stat
+            self.modo = "stat"
+            self._loop_stat(None)
@@ -11,7 +11,6 @@ import subprocess
 import threading
 import time
 import urllib.request
-import random
 import webbrowser
 from datetime import datetime, timedelta
 from tkinter import (
@@ -19,16 +18,31 @@ from tkinter import (
     END, LEFT, RIGHT, BOTH, Y, X, TOP, BOTTOM, ttk, messagebox, filedialog
 )
 
+from cliente_config import ClienteConfig
+from historico import ler_execucoes, resumo_por_job
+from metricas import ler_instantaneos, quantil_aproximado, PASTA_INSTANTANEOS
+from observador import Observador
+from controle import ClienteControle, ErroControle, LauncherOcupado
+from captura_saida import ultima_saida
+
 # ------------- Config (ajuste se necessário) -------------
 CONFIG_URL = "https://github.com/wagnerdeandradesoares/monitoramento-bkp/releases/download/v1.0.2/config.json"
 BASE_DIR = r"C:\Program Files (x86)\MonitoramentoBKP"
 LOG_BASE_DIR = os.path.join(BASE_DIR, "logs")
 LAUNCHER_LOG = os.path.join(LOG_BASE_DIR, "launcher.log")
+RUNS_FILE = os.path.join(LOG_BASE_DIR, "execucoes.jsonl")      # diário de execuções do launcher
+JOBS_LOG_DIR = os.path.join(LOG_BASE_DIR, "jobs")              # saída capturada de cada job
+CONTROLE_TOKEN = os.path.join(BASE_DIR, "controle.token")      # gerado pelo launcher a cada início
+SAIDA_KB = 16  # quanto da última saída de um job mostrar
 VERSION_FILE = os.path.join(BASE_DIR, "versao.config")        # JSON { "versao": "...", "tipo": "SERVIDOR", "filial": "..." }
 CONFIG_CACHE = os.path.join(BASE_DIR, "config_cache.json")    # cache do config remoto
-CHECK_CONFIG_INTERVAL = 60  # segundos para auto refresh de config quando solicitado pelo painel
+METRICAS_DIR = os.path.join(BASE_DIR, PASTA_INSTANTANEOS)
+UPDATER_METRICAS = os.path.join(METRICAS_DIR, "updater.json")  # progresso dos downloads do updater
+UPDATER_PARADO_S = 300  # snapshot "em andamento" mais velho que isso = updater interrompido
 LOG_TAIL_LINES = 200
 AUTO_REFRESH_LOG_SECONDS = 5
+RUNS_LIMIT = 500
+RUNS_TAIL_LINES = 8  # linhas da saída exibidas para execuções com falha
 # --------------------------------------------------------
 
 # Colors / theme (light / modern)
@@ -43,6 +57,7 @@ ERROR = "#c92a2a"
 # Ensure directories exist
 os.makedirs(LOG_BASE_DIR, exist_ok=True)
 os.makedirs(BASE_DIR, exist_ok=True)
+os.makedirs(METRICAS_DIR, exist_ok=True)  # o observador precisa da pasta para receber avisos
 
 # ---------------- Utility functions ----------------
 def safe_load_json(path, default=None):
@@ -86,15 +101,16 @@ def tail_file(path, lines=200):
     except Exception:
         return []
 
+_clientes_config = {}
+
 def download_config(remote_url=CONFIG_URL, save_to=CONFIG_CACHE, timeout=10):
     try:
-        url = f"{remote_url}?nocache={random.randint(1000,999999)}"
-        req = urllib.request.urlopen(url, timeout=timeout)
-        if req.status == 200:
-            content = req.read().decode()
-            cfg = json.loads(content)
-            safe_write_json(save_to, cfg)
-            return cfg
+        cliente = _clientes_config.get((remote_url, save_to))
+        if cliente is None:
+            cliente = ClienteConfig(remote_url, save_to, timeout=timeout)
+            _clientes_config[(remote_url, save_to)] = cliente
+        cfg, _mudou = cliente.obter()
+        return cfg
     except Exception as e:
         print("Erro download config:", e)
     return None
@@ -153,6 +169,19 @@ def service_action(action):
     except Exception as e:
         return 1, str(e)
 
+controle = ClienteControle(CONTROLE_TOKEN)
+
+def chamar_launcher(comando, **args):
+    """
+    Comando no canal de controle do launcher. Retorna None se o launcher não
+    estiver acessível (serviço parado); ErroControle e LauncherOcupado sobem
+    para o chamador. Bloqueia até o timeout: chamar fora da thread do Tk.
+    """
+    try:
+        return controle.chamar(comando, **args)
+    except (OSError, ValueError):
+        return None
+
 # ------------------ GUI -------------------
 class LauncherPanel:
     def __init__(self, root):
@@ -161,9 +190,13 @@ class LauncherPanel:
         self.root.geometry("980x700")
         self.root.configure(bg=BG)
 
-        # load cached config/version
-        self.config = safe_load_json(CONFIG_CACHE, default={"versao":"0.0.0","executar":[]})
-        self.versao_local = safe_load_json(VERSION_FILE, default={"versao":"0.0.0","tipo":"CX1"})
+        # config/versão em memória, recarregados só quando o arquivo muda no disco
+        self.observador = Observador()
+        self.config_cache = self.observador.observar(CONFIG_CACHE, padrao={})
+        self.versao_config = self.observador.observar(VERSION_FILE, padrao={"versao":"0.0.0","tipo":"CX1"})
+        self.updater_metricas = self.observador.observar(UPDATER_METRICAS, padrao={})
+        self.config = self.config_cache.obter() or {"versao":"0.0.0","executar":[]}
+        self.versao_local = self.versao_config.obter() or {"versao":"0.0.0","tipo":"CX1"}
         self.selected_script = None
         self.build_ui()
         self.start_auto_tasks()
@@ -196,11 +229,21 @@ class LauncherPanel:
         self.tab_control = Frame(nb, bg=BG)
         nb.add(self.tab_control, text="Controle Manual")
 
+        # Tab5 - Execuções (diário do launcher)
+        self.tab_runs = Frame(nb, bg=BG)
+        nb.add(self.tab_runs, text="Execuções")
+
+        # Tab6 - Métricas (metricas/*.json gravados pelo launcher, updater e valida_bkp)
+        self.tab_metrics = Frame(nb, bg=BG)
+        nb.add(self.tab_metrics, text="Métricas")
+
         # Build each tab
         self.build_tab_status()
         self.build_tab_config()
         self.build_tab_logs()
         self.build_tab_control()
+        self.build_tab_runs()
+        self.build_tab_metrics()
 
     # ---------------- Tab: Status Geral ----------------
     def build_tab_status(self):
@@ -216,7 +259,8 @@ class LauncherPanel:
             "service": StringVar(value="Desconhecido"),
             "ultimo_backup": StringVar(value="—"),
             "proxima_validacao": StringVar(value="—"),
-            "ultima_comunicacao": StringVar(value="—")
+            "ultima_comunicacao": StringVar(value="—"),
+            "atualizacao": StringVar(value="—")
         }
 
         def make_card(parent, title, var, width=26):
@@ -233,6 +277,7 @@ class LauncherPanel:
         make_card(cards, "🕒 Último backup", self.card_vars["ultimo_backup"])
         make_card(cards, "⏰ Próxima validação", self.card_vars["proxima_validacao"])
         make_card(cards, "🌐 Última comunicação remota", self.card_vars["ultima_comunicacao"])
+        make_card(cards, "📥 Atualização", self.card_vars["atualizacao"])
 
         # Buttons
         btns = Frame(t, bg=BG)
@@ -281,7 +326,7 @@ class LauncherPanel:
         self.reload_config_preview()
 
     def reload_config_preview(self):
-        cfg = safe_load_json(CONFIG_CACHE, default={})
+        cfg = self.config_cache.obter() or {}
         self.config = cfg
         self.config_preview.configure(state="normal")
         self.config_preview.delete(1.0, END)
@@ -333,6 +378,93 @@ class LauncherPanel:
             except Exception as e:
                 messagebox.showerror("Erro", f"Não foi possível limpar o log: {e}")
 
+    # ---------------- Tab: Execuções ----------------
+    def build_tab_runs(self):
+        t = self.tab_runs
+        top = Frame(t, bg=BG)
+        top.pack(fill=X, padx=12, pady=8)
+        Button(top, text="🔍 Atualizar", command=self.refresh_runs).pack(side=LEFT, padx=6)
+        Label(top, text="Duração média das últimas 5 execuções comparada às 5 anteriores", bg=BG, fg="#666").pack(side=LEFT, padx=6)
+
+        area = Frame(t, bg=BG)
+        area.pack(fill=BOTH, expand=True, padx=12, pady=8)
+        self.runs_text = Text(area, wrap="none", bg=CARD, fg=TEXT, font=("Consolas", 10), padx=8, pady=8)
+        self.runs_text.pack(side=LEFT, fill=BOTH, expand=True)
+        scr = Scrollbar(area, command=self.runs_text.yview)
+        scr.pack(side=RIGHT, fill=Y)
+        self.runs_text.config(yscrollcommand=scr.set)
+        self.refresh_runs()
+
+    def refresh_runs(self):
+        registros = ler_execucoes(RUNS_FILE, limite=RUNS_LIMIT)
+        linhas = []
+        for job, r in sorted(resumo_por_job(registros).items()):
+            ultima = r["ultima"]
+            quando = datetime.fromtimestamp(ultima.get("inicio", 0)).strftime("%d/%m/%Y %H:%M")
+            tendencia = ""
+            if r["media_recente_s"] is not None and r["media_anterior_s"]:
+                variacao = (r["media_recente_s"] / r["media_anterior_s"] - 1) * 100
+                tendencia = f"{'📈' if variacao > 10 else '📉' if variacao < -10 else '➖'} {variacao:+.0f}%"
+            cpu = ultima.get("cpu_s")
+            mem = ultima.get("memoria_pico_mb")
+            linhas.append(
+                f"{job:<36} última {quando}  {ultima.get('duracao_s', 0):>8.0f}s  "
+                f"CPU {cpu if cpu is not None else '—':>7}s  pico {mem if mem is not None else '—':>7} MB  "
+                f"código {ultima.get('codigo')}{' ⏱️ TIMEOUT' if ultima.get('expirou') else ''}  "
+                f"falhas {r['falhas']}/{r['execucoes']}  {tendencia}"
+            )
+            # Para a última execução com falha mostra o fim da saída do job
+            if ultima.get("codigo") not in (0, None) or ultima.get("expirou"):
+                for ln in (ultima.get("saida_final") or "").splitlines()[-RUNS_TAIL_LINES:]:
+                    linhas.append(f"    │ {ln}")
+        self.runs_text.configure(state="normal")
+        self.runs_text.delete(1.0, END)
+        self.runs_text.insert(END, "\n".join(linhas) if linhas else "(nenhuma execução registrada em execucoes.jsonl)\n")
+        self.runs_text.configure(state="disabled")
+
+    # ---------------- Tab: Métricas ----------------
+    def build_tab_metrics(self):
+        t = self.tab_metrics
+        top = Frame(t, bg=BG)
+        top.pack(fill=X, padx=12, pady=8)
+        Button(top, text="🔍 Atualizar", command=self.refresh_metrics).pack(side=LEFT, padx=6)
+        Label(top, text="Histogramas: contagem, média e p50/p95 aproximados pelas faixas", bg=BG, fg="#666").pack(side=LEFT, padx=6)
+
+        area = Frame(t, bg=BG)
+        area.pack(fill=BOTH, expand=True, padx=12, pady=8)
+        self.metrics_text = Text(area, wrap="none", bg=CARD, fg=TEXT, font=("Consolas", 10), padx=8, pady=8)
+        self.metrics_text.pack(side=LEFT, fill=BOTH, expand=True)
+        scr = Scrollbar(area, command=self.metrics_text.yview)
+        scr.pack(side=RIGHT, fill=Y)
+        self.metrics_text.config(yscrollcommand=scr.set)
+        self.refresh_metrics()
+
+    def refresh_metrics(self):
+        linhas = []
+        for processo, inst in sorted(ler_instantaneos(BASE_DIR).items()):
+            gerado = datetime.fromtimestamp(inst.get("gerado_em", 0)).strftime("%d/%m/%Y %H:%M:%S")
+            linhas.append(f"■ {processo} (instantâneo de {gerado})")
+            for m in inst.get("metricas", []):
+                for serie in m["series"]:
+                    rotulos = ", ".join(f"{k}={v}" for k, v in sorted(serie["rotulos"].items()))
+                    nome = f"{m['nome']}{'{' + rotulos + '}' if rotulos else ''}"
+                    if m["tipo"] == "histogram":
+                        n = serie["contagem"]
+                        media = serie["soma"] / n if n else 0
+                        p50 = quantil_aproximado(m["limites"], serie["faixas"], 0.5)
+                        p95 = quantil_aproximado(m["limites"], serie["faixas"], 0.95)
+                        valor = f"n={n}  média {media:.3f}s  p50≤{p50}s  p95≤{p95}s"
+                    elif m["nome"].endswith("_timestamp"):
+                        valor = datetime.fromtimestamp(serie["valor"]).strftime("%d/%m/%Y %H:%M:%S")
+                    else:
+                        valor = f"{serie['valor']:g}"
+                    linhas.append(f"    {nome:<70} {valor}")
+            linhas.append("")
+        self.metrics_text.configure(state="normal")
+        self.metrics_text.delete(1.0, END)
+        self.metrics_text.insert(END, "\n".join(linhas) if linhas else "(nenhum instantâneo em metricas/)\n")
+        self.metrics_text.configure(state="disabled")
+
     # ---------------- Tab: Controle Manual ----------------
     def build_tab_control(self):
         t = self.tab_control
@@ -359,12 +491,13 @@ class LauncherPanel:
         btn_frame = Frame(right, bg=BG)
         btn_frame.pack(fill=X, pady=6)
         Button(btn_frame, text="▶️ Executar agora", command=self.on_execute_selected).pack(side=LEFT, padx=6)
+        Button(btn_frame, text="📄 Última saída", command=self.on_show_output).pack(side=LEFT, padx=6)
         Button(btn_frame, text="📂 Abrir pasta do script", command=self.on_open_script_folder).pack(side=LEFT, padx=6)
 
         self.reload_exec_list()
 
     def reload_exec_list(self):
-        cfg = safe_load_json(CONFIG_CACHE, default={})
+        cfg = self.config_cache.obter() or {}
         executar = cfg.get("executar", [])
         self.listbox.delete(0, END)
         for item in executar:
@@ -382,10 +515,23 @@ class LauncherPanel:
         item = self.config.get("executar", [])[idx]
         pretty = json.dumps(item, indent=2, ensure_ascii=False)
         self.selected_script = item
-        self.details.configure(state="normal")
-        self.details.delete(1.0, END)
-        self.details.insert(END, pretty)
-        self.details.configure(state="disabled")
+        self.show_details(pretty)
+
+        def quando(ts):
+            return datetime.fromtimestamp(ts).strftime("%d/%m/%Y %H:%M") if ts else "—"
+
+        def mostrar_agenda(jobs):
+            if self.selected_script is not item or not isinstance(jobs, list):
+                return
+            for job in jobs:
+                if job["nome"] == item.get("nome"):
+                    situacao = "rodando" if job["rodando"] else "na fila" if job["na_fila"] else "aguardando"
+                    self.show_details(pretty + f"\n\nLauncher: {job['agenda']} — {situacao}\n"
+                                      f"Próximo disparo: {quando(job['proxima'])}\n"
+                                      f"Última execução: {quando(job['ultima_execucao'])}")
+                    break
+
+        self.em_segundo_plano(lambda: chamar_launcher("jobs"), mostrar_agenda)
 
     def on_execute_selected(self):
         item = self.selected_script
@@ -409,7 +555,58 @@ class LauncherPanel:
             except subprocess.TimeoutExpired:
                 self.append_status(f"⏳ Tempo limite. Processo continua em execução (PID {proc.pid}).")
 
-        threading.Thread(target=run_and_capture, daemon=True).start()
+        self.run_via_launcher(item.get("nome"), lambda: threading.Thread(target=run_and_capture, daemon=True).start())
+
+    def run_via_launcher(self, nome, executar_pelo_painel):
+        """
+        Pede ao launcher (fora da thread do Tk) para rodar o job, na mesma fila e
+        regras da agenda. O painel só executa por conta própria com o launcher
+        fora do ar ou com confirmação; launcher ocupado não é launcher parado.
+        """
+        def resposta(r):
+            if isinstance(r, LauncherOcupado):
+                self.append_status(f"⏳ Launcher ocupado ({r}) — {nome} não foi executado para não rodar em "
+                                   "duplicidade. Tente de novo em instantes.")
+            elif isinstance(r, ErroControle):
+                if messagebox.askyesno("Launcher", f"{r}.\n\nExecutar diretamente pelo painel, fora da agenda do launcher?"):
+                    executar_pelo_painel()
+            elif isinstance(r, Exception):
+                self.append_status(f"Falha ao falar com o launcher: {r}")
+            elif r is None:
+                self.append_status("Launcher inacessível — executando diretamente pelo painel.")
+                executar_pelo_painel()
+            elif r["enfileirado"]:
+                self.append_status(f"▶️ {r['job']} enviado para a fila do launcher (acompanhe na aba Execuções)")
+            else:
+                self.append_status(f"⏳ {r['job']} já está aguardando na fila do launcher")
+
+        self.em_segundo_plano(lambda: chamar_launcher("executar", job=nome), resposta)
+
+    def on_show_output(self):
+        item = self.selected_script
+        if not item:
+            messagebox.showwarning("Atenção", "Selecione um script na lista.")
+            return
+        nome = item.get("nome", "")
+        caminho = self.resolve_executable_path(item)
+
+        def buscar():
+            try:
+                r = chamar_launcher("saida", job=nome, max_kb=SAIDA_KB)
+            except (ErroControle, LauncherOcupado):
+                r = None
+            if r is not None:
+                return r["saida"]
+            # Só leitura: sem o launcher, o painel lê os mesmos arquivos direto
+            pasta = os.path.join(JOBS_LOG_DIR, os.path.splitext(os.path.basename(caminho))[0])
+            return ultima_saida(pasta, SAIDA_KB * 1024)
+
+        def mostrar(texto):
+            if isinstance(texto, Exception):
+                texto = f"(falha ao ler a saída: {texto})"
+            self.show_details(texto or f"(nenhuma saída registrada para {nome})", fim=True)
+
+        self.em_segundo_plano(buscar, mostrar)
 
     def on_open_script_folder(self):
         item = self.selected_script
@@ -452,15 +649,27 @@ class LauncherPanel:
                 self.append_status("valida_bkp iniciado (aguardando término)...")
                 proc.wait()
                 self.append_status(f"valida_bkp finalizado (returncode {proc.returncode})")
-        threading.Thread(target=job, daemon=True).start()
+        self.run_via_launcher("valida_bkp.exe", lambda: threading.Thread(target=job, daemon=True).start())
 
     def on_download_config(self):
         def job():
+            try:
+                pedido = chamar_launcher("recarregar_config")
+            except LauncherOcupado as e:
+                # O launcher está no meio de uma volta (talvez baixando o config): não disputa com ele
+                self.root.after(0, self.append_status, f"⏳ Launcher ocupado ({e}) — tente recarregar de novo em instantes")
+                return
+            except ErroControle:
+                pedido = None
+            if pedido is not None:
+                # O launcher baixa, regrava o config_cache.json e recompila; o observador atualiza as abas
+                self.append_status("Launcher vai recarregar o config remoto agora")
+                self.card_vars["ultima_comunicacao"].set(datetime.now().strftime("%d/%m/%Y %H:%M:%S"))
+                return
             cfg = download_config()
             if cfg:
                 self.append_status("Config remoto baixado e salvo em config_cache.json")
-                self.reload_config_preview()
-                self.reload_exec_list()
+                self.config_cache.invalidar()  # se mudou, o aviso do observador atualiza as abas
                 # update last communication time and card values
                 self.card_vars["ultima_comunicacao"].set(datetime.now().strftime("%d/%m/%Y %H:%M:%S"))
             else:
@@ -477,15 +686,31 @@ class LauncherPanel:
         data = {"versao": v, "tipo": t, "filial": filial}
         ok = safe_write_json(VERSION_FILE, data)
         if ok:
+            # O launcher percebe a mudança pelo próprio observador e recompila a agenda
+            self.versao_config.invalidar()
             messagebox.showinfo("Ok", "versao.config atualizada.")
-            self.versao_local = data
-            self.card_vars["versao"].set(v)
-            self.card_vars["terminal"].set(t)
-            self.card_vars["filial"].set(filial)
         else:
             messagebox.showerror("Erro", "Falha ao gravar versao.config.")
 
     # ---------------- Helpers ----------------
+    def em_segundo_plano(self, trabalho, depois):
+        """Roda trabalho() numa thread e entrega o resultado (ou a exceção) a depois() na thread do Tk."""
+        def rodar():
+            try:
+                resultado = trabalho()
+            except Exception as e:
+                resultado = e
+            self.root.after(0, depois, resultado)
+        threading.Thread(target=rodar, daemon=True).start()
+
+    def show_details(self, texto, fim=False):
+        self.details.configure(state="normal")
+        self.details.delete(1.0, END)
+        self.details.insert(END, texto)
+        if fim:
+            self.details.see(END)
+        self.details.configure(state="disabled")
+
     def append_status(self, msg):
         ts = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
         self.status_text.configure(state="normal")
@@ -494,6 +719,21 @@ class LauncherPanel:
         self.status_text.configure(state="disabled")
 
     def update_service_status(self):
+        """Consulta launcher/serviço fora da thread do Tk (pode ser chamado de qualquer thread)."""
+        self.em_segundo_plano(self._consultar_servico, self._mostrar_servico)
+
+    def _consultar_servico(self):
+        try:
+            status = chamar_launcher("status")
+            jobs = chamar_launcher("jobs") if status is not None else None
+        except LauncherOcupado:
+            return "🟡 Em execução (launcher ocupado, sem resposta)", None
+        except ErroControle:
+            status = jobs = None
+        if status is not None:
+            texto = f"🟢 Em execução ({len(status['rodando'])}/{status['max_workers']} jobs, {len(status['fila'])} na fila)"
+            return texto, jobs
+        # Launcher não responde: pergunta ao gerenciador de serviços
         code, out = service_action("status")
         state = "Desconhecido"
         if code == 0:
@@ -505,7 +745,18 @@ class LauncherPanel:
                 state = "🟡 " + out.splitlines()[0][:50]
         else:
             state = "⚠️ Erro"
+        return state, None
+
+    def _mostrar_servico(self, resultado):
+        if isinstance(resultado, Exception):
+            resultado = (f"⚠️ Erro: {resultado}", None)
+        state, jobs = resultado
         self.card_vars["service"].set(state)
+        for job in jobs or []:
+            if job["nome"].lower().startswith("valida") and job["proxima"]:
+                self.card_vars["proxima_validacao"].set(
+                    datetime.fromtimestamp(job["proxima"]).strftime("%d/%m/%Y %H:%M"))
+                break
 
     def resolve_executable_path(self, exe_info):
         nome = exe_info.get("nome")
@@ -522,18 +773,20 @@ class LauncherPanel:
     # ---------------- Auto tasks ----------------
     def start_auto_tasks(self):
         # update UI with cached values
-        self.card_vars["versao"].set(self.versao_local.get("versao", "0.0.0"))
-        self.card_vars["terminal"].set(self.versao_local.get("tipo", "CX1"))
-        self.card_vars["filial"].set(self.versao_local.get("filial", ""))
+        self.apply_version(self.versao_config)
+        self.apply_config_cache(self.config_cache)
+        self.apply_update_progress(self.updater_metricas)
         self.update_service_status()
         self.append_status("Painel iniciado")
         # start log auto-refresh
         self._stop_flag = False
         self._log_thread = threading.Thread(target=self.auto_refresh_log, daemon=True)
         self._log_thread.start()
-        # auto config refresh (background)
-        self._cfg_thread = threading.Thread(target=self.auto_refresh_config_cache, daemon=True)
-        self._cfg_thread.start()
+        # versao.config / config_cache.json: atualiza a tela quando o arquivo muda
+        self.versao_config.ao_mudar(lambda arq: self.root.after(0, self.apply_version, arq))
+        self.config_cache.ao_mudar(lambda arq: self.root.after(0, self.on_config_cache_changed, arq))
+        self.updater_metricas.ao_mudar(lambda arq: self.root.after(0, self.apply_update_progress, arq))
+        self.observador.iniciar()
 
     def auto_refresh_log(self):
         while True:
@@ -543,29 +796,59 @@ class LauncherPanel:
                 pass
             time.sleep(AUTO_REFRESH_LOG_SECONDS)
 
-    def auto_refresh_config_cache(self):
-        while True:
-            try:
-                # try to read cache (if exists)
-                cfg = safe_load_json(CONFIG_CACHE, default=None)
-                if cfg:
-                    # update some card values based on config: next validation (if valida present)
-                    executar = cfg.get("executar", [])
-                    # attempt to extract valida schedule if present
-                    for item in executar:
-                        if item.get("nome", "").lower().startswith("valida"):
-                            horario = item.get("horario")
-                            if horario:
-                                if isinstance(horario, list):
-                                    next_h = horario[0]
-                                else:
-                                    next_h = horario
-                                self.card_vars["proxima_validacao"].set(next_h if next_h else "—")
-                # update timestamp card
-                # self.card_vars["ultima_comunicacao"].set(datetime.now().strftime("%d/%m/%Y %H:%M:%S"))
-            except Exception:
-                pass
-            time.sleep(CHECK_CONFIG_INTERVAL)
+    def apply_version(self, arquivo):
+        dados = arquivo.obter() or {}
+        self.versao_local = dados
+        self.card_vars["versao"].set(dados.get("versao", "0.0.0"))
+        self.card_vars["terminal"].set(dados.get("tipo", "CX1"))
+        self.card_vars["filial"].set(dados.get("filial", ""))
+
+    def apply_update_progress(self, arquivo):
+        """Card de atualização a partir do metricas/updater.json (gravado a cada ~2 s durante os downloads)."""
+        inst = arquivo.obter() or {}
+        series = {m.get("nome"): m.get("series", []) for m in inst.get("metricas", [])}
+
+        def soma(nome):
+            return sum(s.get("valor", 0) for s in series.get(nome, []))
+
+        em_andamento = soma("monitbkp_updater_em_andamento")
+        if not em_andamento or time.time() - inst.get("gerado_em", 0) > UPDATER_PARADO_S:
+            self.card_vars["atualizacao"].set("—")
+            return
+        totais = {s["rotulos"].get("arquivo"): s.get("valor", 0)
+                  for s in series.get("monitbkp_updater_download_total_bytes", [])}
+        baixados = {s["rotulos"].get("arquivo"): s.get("valor", 0)
+                    for s in series.get("monitbkp_updater_download_bytes", [])}
+        # Percentual só sobre os arquivos de tamanho conhecido
+        total = sum(v for v in totais.values() if v)
+        baixado = sum(v for k, v in baixados.items() if totais.get(k)) if total else sum(baixados.values())
+        taxa = soma("monitbkp_updater_download_taxa_bps")
+        etas = [s.get("valor", 0) for s in series.get("monitbkp_updater_download_eta_segundos", [])]
+        texto = f"{baixado * 100 // total}%" if total else f"{baixado / (1024 * 1024):.1f} MB"
+        texto += f" a {taxa / 1024:.0f} KB/s"
+        if etas and max(etas):
+            texto += f", ETA {max(etas):.0f}s"
+        self.card_vars["atualizacao"].set(texto)
+
+    def on_config_cache_changed(self, arquivo):
+        self.reload_config_preview()
+        self.reload_exec_list()
+        self.apply_config_cache(arquivo)
+
+    def apply_config_cache(self, arquivo):
+        cfg = arquivo.obter()
+        if not cfg:
+            return
+        # próxima validação: primeiro horário do valida_bkp no config
+        for item in cfg.get("executar", []):
+            if item.get("nome", "").lower().startswith("valida"):
+                horario = item.get("horario")
+                if horario:
+                    if isinstance(horario, list):
+                        next_h = horario[0]
+                    else:
+                        next_h = horario
+                    self.card_vars["proxima_validacao"].set(next_h if next_h else "—")
 
 # ------------------ Run UI ------------------
 def main():
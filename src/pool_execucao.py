@@ -0,0 +1,107 @@
+"""
+Pool de execução de jobs do launcher.
+Os jobs vencidos entram numa fila por prioridade e são despachados para um
+conjunto limitado de threads respeitando, por entrada do config.json:
+  - max_concurrentes: instâncias simultâneas do mesmo job (padrão 1)
+  - exclusivo_com: grupos de exclusão mútua (ex.: ["sql"] em todas as SQL_ROTINA_*)
+  - prioridade: maior valor é despachado primeiro (padrão 0)
+Os valores já chegam validados em Tarefa.prioridade / Tarefa.max_concurrentes.
+"""
+
+import heapq
+import itertools
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+
+def grupos_exclusao(info):
+    grupos = info.get("exclusivo_com") or []
+    if isinstance(grupos, str):
+        grupos = [grupos]
+    return {str(g).lower() for g in grupos}
+
+
+class PoolExecucao:
+    """
+    enviar() enfileira, despachar() inicia o que for possível e coletar()
+    devolve os jobs finalizados. aguardar() bloqueia até algum job terminar
+    (ou o timeout), para o loop principal nunca ficar preso num proc.wait().
+    """
+
+    def __init__(self, max_workers, executar, executor=None):
+        self.max_workers = max(1, max_workers)
+        self._executar = executar
+        # O simulador injeta um executor de relógio virtual que não roda nada
+        self._executor = executor or ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job")
+        self._fila = []
+        self._seq = itertools.count()
+        self._rodando = {}
+        self._por_chave = Counter()
+        self._grupos = Counter()
+        self._lock = threading.Lock()
+        self._evento = threading.Event()
+
+    def enviar(self, tarefa, previsto):
+        """Enfileira o job. Retorna False se ele já estava aguardando na fila."""
+        with self._lock:
+            if any(t.chave == tarefa.chave for _, _, t, _ in self._fila):
+                return False
+            heapq.heappush(self._fila, (-tarefa.prioridade, next(self._seq), tarefa, previsto))
+            return True
+
+    def despachar(self):
+        """Inicia os jobs da fila que não conflitam com os que estão rodando."""
+        iniciados = []
+        with self._lock:
+            bloqueados = []
+            while self._fila and len(self._rodando) < self.max_workers:
+                item = heapq.heappop(self._fila)
+                tarefa = item[2]
+                if not self._pode_iniciar(tarefa):
+                    bloqueados.append(item)
+                    continue
+                self._por_chave[tarefa.chave] += 1
+                for g in grupos_exclusao(tarefa.info):
+                    self._grupos[g] += 1
+                futuro = self._executor.submit(self._executar, tarefa, item[3])
+                self._rodando[futuro] = tarefa
+                futuro.add_done_callback(lambda _f: self._evento.set())
+                iniciados.append(tarefa)
+            for item in bloqueados:
+                heapq.heappush(self._fila, item)
+        return iniciados
+
+    def coletar(self):
+        """Retorna [(tarefa, resultado, erro)] dos jobs finalizados desde a última coleta."""
+        finalizados = []
+        with self._lock:
+            for futuro in [f for f in self._rodando if f.done()]:
+                tarefa = self._rodando.pop(futuro)
+                self._por_chave[tarefa.chave] -= 1
+                for g in grupos_exclusao(tarefa.info):
+                    self._grupos[g] -= 1
+                erro = futuro.exception()
+                resultado = None if erro else futuro.result()
+                finalizados.append((tarefa, resultado, erro))
+        return finalizados
+
+    def aguardar(self, timeout):
+        self._evento.wait(max(0.0, timeout))
+        self._evento.clear()
+
+    def acordar(self):
+        self._evento.set()
+
+    def rodando(self):
+        with self._lock:
+            return list(self._rodando.values())
+
+    def pendentes(self):
+        with self._lock:
+            return [t for _, _, t, _ in sorted(self._fila)]
+
+    def _pode_iniciar(self, tarefa):
+        if self._por_chave[tarefa.chave] >= tarefa.max_concurrentes:
+            return False
+        return not any(self._grupos[g] > 0 for g in grupos_exclusao(tarefa.info))
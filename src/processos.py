@@ -0,0 +1,235 @@
+"""
+Execução monitorada de processos filhos do launcher.
+No Windows cada job roda dentro de um Job Object: isso permite encerrar a
+árvore inteira (cmd.exe + .bat + sqlcmd...) quando o timeout estoura e ler
+o tempo de CPU e o pico de memória somados de todos os processos.
+Em outros sistemas usa um grupo de processos e não mede CPU/memória.
+O job permite breakaway: iniciar_destacado() tira do job (e do serviço) um
+processo que precisa sobreviver ao launcher, como a troca do launcher.exe.
+"""
+
+import os
+import time
+import signal
+import ctypes
+import subprocess
+
+WINDOWS = os.name == "nt"
+
+if WINDOWS:
+    from ctypes import wintypes
+
+    _kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+
+    JobObjectBasicAccountingInformation = 1
+    JobObjectExtendedLimitInformation = 9
+    JOB_OBJECT_LIMIT_BREAKAWAY_OK = 0x00000800
+    SYNCHRONIZE = 0x00100000
+    WAIT_TIMEOUT = 0x00000102
+    INFINITE = 0xFFFFFFFF
+
+    class JOBOBJECT_BASIC_ACCOUNTING_INFORMATION(ctypes.Structure):
+        _fields_ = [
+            ("TotalUserTime", ctypes.c_int64),
+            ("TotalKernelTime", ctypes.c_int64),
+            ("ThisPeriodTotalUserTime", ctypes.c_int64),
+            ("ThisPeriodTotalKernelTime", ctypes.c_int64),
+            ("TotalPageFaultCount", wintypes.DWORD),
+            ("TotalProcesses", wintypes.DWORD),
+            ("ActiveProcesses", wintypes.DWORD),
+            ("TotalTerminatedProcesses", wintypes.DWORD),
+        ]
+
+    class JOBOBJECT_BASIC_LIMIT_INFORMATION(ctypes.Structure):
+        _fields_ = [
+            ("PerProcessUserTimeLimit", ctypes.c_int64),
+            ("PerJobUserTimeLimit", ctypes.c_int64),
+            ("LimitFlags", wintypes.DWORD),
+            ("MinimumWorkingSetSize", ctypes.c_size_t),
+            ("MaximumWorkingSetSize", ctypes.c_size_t),
+            ("ActiveProcessLimit", wintypes.DWORD),
+            ("Affinity", ctypes.c_size_t),
+            ("PriorityClass", wintypes.DWORD),
+            ("SchedulingClass", wintypes.DWORD),
+        ]
+
+    class IO_COUNTERS(ctypes.Structure):
+        _fields_ = [(nome, ctypes.c_uint64) for nome in (
+            "ReadOperationCount", "WriteOperationCount", "OtherOperationCount",
+            "ReadTransferCount", "WriteTransferCount", "OtherTransferCount",
+        )]
+
+    class JOBOBJECT_EXTENDED_LIMIT_INFORMATION(ctypes.Structure):
+        _fields_ = [
+            ("BasicLimitInformation", JOBOBJECT_BASIC_LIMIT_INFORMATION),
+            ("IoInfo", IO_COUNTERS),
+            ("ProcessMemoryLimit", ctypes.c_size_t),
+            ("JobMemoryLimit", ctypes.c_size_t),
+            ("PeakProcessMemoryUsed", ctypes.c_size_t),
+            ("PeakJobMemoryUsed", ctypes.c_size_t),
+        ]
+
+    _kernel32.CreateJobObjectW.restype = wintypes.HANDLE
+    _kernel32.CreateJobObjectW.argtypes = [ctypes.c_void_p, wintypes.LPCWSTR]
+    _kernel32.AssignProcessToJobObject.argtypes = [wintypes.HANDLE, wintypes.HANDLE]
+    _kernel32.TerminateJobObject.argtypes = [wintypes.HANDLE, wintypes.UINT]
+    _kernel32.QueryInformationJobObject.argtypes = [
+        wintypes.HANDLE, ctypes.c_int, ctypes.c_void_p, wintypes.DWORD, ctypes.c_void_p,
+    ]
+    _kernel32.SetInformationJobObject.argtypes = [wintypes.HANDLE, ctypes.c_int, ctypes.c_void_p, wintypes.DWORD]
+    _kernel32.OpenProcess.restype = wintypes.HANDLE
+    _kernel32.OpenProcess.argtypes = [wintypes.DWORD, wintypes.BOOL, wintypes.DWORD]
+    _kernel32.WaitForSingleObject.restype = wintypes.DWORD
+    _kernel32.WaitForSingleObject.argtypes = [wintypes.HANDLE, wintypes.DWORD]
+    _kernel32.CloseHandle.argtypes = [wintypes.HANDLE]
+
+
+class ProcessoMonitorado:
+    """
+    Popen + Job Object (Windows). aguardar() aplica o timeout e devolve o returncode.
+    Com `captura` (CapturaSaida), stdout/stderr vão por pipe para a thread de leitura.
+    """
+
+    def __init__(self, args, cwd=None, captura=None, **popen_kwargs):
+        self._job = None
+        self.captura = captura
+        if captura:
+            popen_kwargs.update(stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        if WINDOWS:
+            si = subprocess.STARTUPINFO()
+            si.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+            popen_kwargs.setdefault("startupinfo", si)
+        else:
+            popen_kwargs.setdefault("start_new_session", True)
+
+        self.inicio = time.time()
+        self.proc = subprocess.Popen(args, cwd=cwd, **popen_kwargs)
+        self.pid = self.proc.pid
+        self.fim = None
+        self.expirou = False
+        if WINDOWS:
+            self._criar_job()
+        if captura:
+            captura.iniciar(self.proc.stdout)
+
+    @property
+    def returncode(self):
+        return self.proc.returncode
+
+    def em_execucao(self):
+        """True enquanto o processo não terminou (não bloqueia; aguardar() depois fecha a execução)."""
+        return self.proc.poll() is None
+
+    def aguardar(self, timeout_s=None):
+        try:
+            self.proc.wait(timeout=timeout_s)
+        except subprocess.TimeoutExpired:
+            self.expirou = True
+            self.matar_arvore()
+            self.proc.wait()
+        self.fim = time.time()
+        if self.captura:
+            self.captura.finalizar()
+        return self.proc.returncode
+
+    def matar_arvore(self):
+        """Encerra o processo e todos os descendentes."""
+        try:
+            if self._job and _kernel32.TerminateJobObject(self._job, 1):
+                return
+            if WINDOWS:
+                subprocess.run(
+                    ["taskkill", "/T", "/F", "/PID", str(self.pid)],
+                    capture_output=True, creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0),
+                )
+            else:
+                os.killpg(self.pid, signal.SIGKILL)
+        except Exception:
+            self.proc.kill()
+
+    def recursos(self):
+        """{'duracao_s', 'cpu_s', 'memoria_pico_mb'} — CPU/memória só quando há Job Object."""
+        fim = self.fim or time.time()
+        dados = {"duracao_s": round(fim - self.inicio, 3), "cpu_s": None, "memoria_pico_mb": None}
+        if not self._job:
+            return dados
+        contabil = JOBOBJECT_BASIC_ACCOUNTING_INFORMATION()
+        if _kernel32.QueryInformationJobObject(
+            self._job, JobObjectBasicAccountingInformation,
+            ctypes.byref(contabil), ctypes.sizeof(contabil), None,
+        ):
+            # unidades de 100 ns
+            dados["cpu_s"] = round((contabil.TotalUserTime + contabil.TotalKernelTime) / 1e7, 3)
+        limites = JOBOBJECT_EXTENDED_LIMIT_INFORMATION()
+        if _kernel32.QueryInformationJobObject(
+            self._job, JobObjectExtendedLimitInformation,
+            ctypes.byref(limites), ctypes.sizeof(limites), None,
+        ):
+            dados["memoria_pico_mb"] = round(limites.PeakJobMemoryUsed / (1024 * 1024), 1)
+        return dados
+
+    def fechar(self):
+        if self._job:
+            _kernel32.CloseHandle(self._job)
+            self._job = None
+
+    def _criar_job(self):
+        try:
+            job = _kernel32.CreateJobObjectW(None, None)
+            if not job:
+                return
+            limites = JOBOBJECT_EXTENDED_LIMIT_INFORMATION()
+            limites.BasicLimitInformation.LimitFlags = JOB_OBJECT_LIMIT_BREAKAWAY_OK
+            _kernel32.SetInformationJobObject(
+                job, JobObjectExtendedLimitInformation, ctypes.byref(limites), ctypes.sizeof(limites),
+            )
+            if not _kernel32.AssignProcessToJobObject(job, int(self.proc._handle)):
+                _kernel32.CloseHandle(job)
+                return
+            self._job = job
+        except Exception:
+            self._job = None
+
+
+def iniciar_destacado(args, cwd=None):
+    """
+    Inicia `args` fora do console, do grupo e, se o job permitir, do Job Object
+    de quem chama: o NSSM encerrar o launcher (sc stop) não o leva junto.
+    Retorna o PID; não espera o fim.
+    """
+    if not WINDOWS:
+        proc = subprocess.Popen(args, cwd=cwd, start_new_session=True, stdin=subprocess.DEVNULL,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, close_fds=True)
+        return proc.pid
+    flags = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    try:
+        proc = subprocess.Popen(args, cwd=cwd, creationflags=flags | subprocess.CREATE_BREAKAWAY_FROM_JOB,
+                                close_fds=True)
+    except OSError:
+        # Job sem JOB_OBJECT_LIMIT_BREAKAWAY_OK (ex.: launcher antigo): segue destacado, mas dentro dele
+        proc = subprocess.Popen(args, cwd=cwd, creationflags=flags, close_fds=True)
+    return proc.pid
+
+
+def aguardar_pid(pid, timeout_s=None):
+    """Espera o processo `pid` (que não é filho de quem chama) terminar. True se terminou no prazo."""
+    if WINDOWS:
+        handle = _kernel32.OpenProcess(SYNCHRONIZE, False, pid)
+        if not handle:
+            return True  # já terminou (ou nunca existiu)
+        try:
+            espera = INFINITE if timeout_s is None else int(timeout_s * 1000)
+            return _kernel32.WaitForSingleObject(handle, espera) != WAIT_TIMEOUT
+        finally:
+            _kernel32.CloseHandle(handle)
+    limite = None if timeout_s is None else time.monotonic() + timeout_s
+    while True:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return True
+        except PermissionError:
+            pass  # existe, mas é de outro usuário
+        if limite is not None and time.monotonic() >= limite:
+            return False
+        time.sleep(0.1)
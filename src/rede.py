@@ -0,0 +1,189 @@
+"""
+Camada HTTP resiliente compartilhada (config remoto, planilha, downloads).
+Cada endpoint (esquema + host) tem um disjuntor:
+  - fechado: requisições normais; falhas seguidas são contadas
+  - aberto: depois de FALHAS_PARA_ABRIR falhas, as chamadas falham na hora
+    (CircuitoAberto) e o chamador vai direto para o cache/fallback
+  - meio-aberto: vencida a espera, uma única requisição de teste decide se
+    fecha (sucesso) ou reabre com espera dobrada (falha)
+A espera cresce exponencialmente com jitter e o estado fica em
+rede_estado.json, compartilhado entre launcher, updater, painel e valida_bkp:
+um restart não volta a martelar um endpoint que está fora.
+"""
+
+import os
+import json
+import time
+import random
+import tempfile
+import threading
+import urllib.parse
+import urllib.request
+import urllib.error
+
+ARQUIVO_ESTADO = "rede_estado.json"
+FALHAS_PARA_ABRIR = 3
+ESPERA_BASE_S = 30
+ESPERA_MAX_S = 30 * 60
+RETENTATIVA_BASE_S = 1.0  # espera entre tentativas dentro da mesma chamada
+TROCA_TENTATIVAS = 5  # os.replace no Windows falha enquanto outro processo lê o arquivo
+
+FECHADO = "fechado"
+ABERTO = "aberto"
+MEIO_ABERTO = "meio_aberto"
+
+
+class CircuitoAberto(Exception):
+    def __init__(self, endpoint, reabre_em):
+        self.endpoint = endpoint
+        self.reabre_em = reabre_em
+        restante = max(0, int(reabre_em - time.time()))
+        super().__init__(f"circuito aberto para {endpoint} (novo teste em {restante}s)")
+
+
+def caminho_estado(base_dir):
+    return os.path.join(base_dir, ARQUIVO_ESTADO)
+
+
+def endpoint_de(url):
+    partes = urllib.parse.urlsplit(url)
+    return f"{partes.scheme}://{partes.netloc}".lower()
+
+
+def espera_com_jitter(base_s, tentativa, maximo_s):
+    """Backoff exponencial com "full jitter" na metade superior: [teto/2, teto]."""
+    teto = min(maximo_s, base_s * (2 ** tentativa))
+    return teto / 2 + random.uniform(0, teto / 2)
+
+
+def falha_transitoria(erro):
+    """Erros que indicam endpoint indisponível (contam para o disjuntor)."""
+    if isinstance(erro, urllib.error.HTTPError):
+        return erro.code >= 500 or erro.code == 429
+    return isinstance(erro, (urllib.error.URLError, OSError))
+
+
+class RedeResiliente:
+    """
+    urlopen(req, timeout) com disjuntor por endpoint e novas tentativas.
+    Respostas HTTP 4xx (inclusive 304) provam que o servidor respondeu:
+    contam como sucesso para o disjuntor e o erro é repassado ao chamador.
+    """
+
+    def __init__(self, caminho, falhas_para_abrir=FALHAS_PARA_ABRIR,
+                 espera_base_s=ESPERA_BASE_S, espera_max_s=ESPERA_MAX_S):
+        self.caminho = caminho
+        self.falhas_para_abrir = max(1, falhas_para_abrir)
+        self.espera_base_s = espera_base_s
+        self.espera_max_s = espera_max_s
+        self._lock = threading.Lock()
+        self._testando = set()
+        self._estado = self._carregar()
+
+    # -----------------------------
+    # API
+    # -----------------------------
+    def urlopen(self, req, timeout, tentativas=1):
+        url = req.full_url if isinstance(req, urllib.request.Request) else req
+        endpoint = endpoint_de(url)
+        ultimo_erro = None
+        for tentativa in range(max(1, tentativas)):
+            if tentativa:
+                time.sleep(espera_com_jitter(RETENTATIVA_BASE_S, tentativa - 1, self.espera_base_s))
+            self.permitir(endpoint)
+            try:
+                resp = urllib.request.urlopen(req, timeout=timeout)
+            except Exception as e:
+                if not falha_transitoria(e):
+                    self.sucesso(endpoint)
+                    raise
+                ultimo_erro = e
+                if self.falha(endpoint):
+                    break
+                continue
+            self.sucesso(endpoint)
+            return resp
+        raise ultimo_erro
+
+    def permitir(self, endpoint):
+        """Levanta CircuitoAberto se o endpoint não deve ser chamado agora."""
+        with self._lock:
+            info = self._estado.get(endpoint)
+            if not info or info.get("estado") == FECHADO:
+                return
+            if time.time() < info.get("reabre_em", 0) or endpoint in self._testando:
+                raise CircuitoAberto(endpoint, info.get("reabre_em", 0))
+            # Espera vencida: deixa passar só a requisição de teste
+            info["estado"] = MEIO_ABERTO
+            self._testando.add(endpoint)
+
+    def sucesso(self, endpoint):
+        with self._lock:
+            self._testando.discard(endpoint)
+            info = self._estado.get(endpoint)
+            if not info or (info.get("estado") == FECHADO and not info.get("falhas")):
+                return
+            self._estado[endpoint] = {"estado": FECHADO, "falhas": 0, "aberturas": 0}
+            self._salvar(endpoint)
+
+    def falha(self, endpoint):
+        """Registra uma falha. Retorna True se o circuito (re)abriu."""
+        with self._lock:
+            testando = endpoint in self._testando
+            self._testando.discard(endpoint)
+            info = self._estado.setdefault(endpoint, {"estado": FECHADO, "falhas": 0, "aberturas": 0})
+            info["falhas"] = info.get("falhas", 0) + 1
+            info["ultima_falha"] = time.time()
+            abriu = testando or info["falhas"] >= self.falhas_para_abrir
+            if abriu:
+                espera = espera_com_jitter(self.espera_base_s, info.get("aberturas", 0), self.espera_max_s)
+                info["estado"] = ABERTO
+                info["aberturas"] = info.get("aberturas", 0) + 1
+                info["reabre_em"] = time.time() + espera
+            self._salvar(endpoint)
+            return abriu
+
+    def situacao(self, endpoint):
+        with self._lock:
+            return dict(self._estado.get(endpoint) or {"estado": FECHADO, "falhas": 0})
+
+    # -----------------------------
+    # Persistência
+    # -----------------------------
+    def _carregar(self):
+        try:
+            with open(self.caminho, "r", encoding="utf-8") as f:
+                dados = json.load(f)
+            return dados if isinstance(dados, dict) else {}
+        except Exception:
+            return {}
+
+    def _salvar(self, endpoint):
+        # Outros processos gravam o mesmo arquivo: relê e troca só o nosso endpoint
+        dados = self._carregar()
+        dados[endpoint] = self._estado[endpoint]
+        temp = None
+        try:
+            # Temporário exclusivo: launcher, updater, painel e valida_bkp gravam ao mesmo tempo
+            with tempfile.NamedTemporaryFile("w", encoding="utf-8", delete=False, suffix=".tmp",
+                                             prefix=os.path.basename(self.caminho) + ".",
+                                             dir=os.path.dirname(self.caminho) or ".") as f:
+                temp = f.name
+                json.dump(dados, f, indent=2)
+            for tentativa in range(TROCA_TENTATIVAS):
+                try:
+                    os.replace(temp, self.caminho)
+                    temp = None
+                    break
+                except PermissionError:
+                    if tentativa == TROCA_TENTATIVAS - 1:
+                        raise
+                    time.sleep(0.05 * (tentativa + 1))
+        except Exception as e:
+            print(f"⚠️ Falha ao gravar {self.caminho}: {e}")
+        finally:
+            if temp:
+                try:
+                    os.remove(temp)
+                except OSError:
+                    pass
@@ -0,0 +1,74 @@
+"""
+Liberação gradual de versões (config.json, chave "rollout"):
+    "rollout": {
+        "versao": "1.2.3",                  # opcional: só vale para esta versão
+        "percentual": 10,                   # lojas liberadas (0-100)
+        "rampa": {"inicio": "2026-10-20 08:00", "horas": 48, "de": 5, "ate": 100},
+        "permitir": ["101", "215"],         # filiais sempre liberadas (canário)
+        "negar": ["330"]                    # filiais nunca liberadas (prevalece)
+    }
+Com "rampa", o percentual cresce linearmente de "de" a "ate" entre o início
+e início + horas (antes do início: só as filiais de "permitir").
+Cada loja decide sozinha: fracao_estavel(identidade, versão) < percentual.
+A fração muda a cada versão (a ordem das lojas não é sempre a mesma), mas é
+fixa dentro dela, então uma loja liberada continua liberada enquanto o
+percentual sobe. Caixas e servidor da mesma filial decidem igual.
+"""
+
+from datetime import datetime
+
+from identidade import fracao_estavel
+
+FORMATO_DATA = "%Y-%m-%d %H:%M"
+
+
+def percentual_vigente(regras, agora=None):
+    """Percentual liberado no momento (0-100)."""
+    rampa = regras.get("rampa")
+    if not rampa:
+        return _limitar(regras.get("percentual", 100))
+    agora = agora or datetime.now()
+    inicio = datetime.strptime(str(rampa["inicio"]), FORMATO_DATA)
+    de = _limitar(rampa.get("de", 0))
+    ate = _limitar(rampa.get("ate", 100))
+    if agora < inicio:
+        return 0.0
+    horas = float(rampa.get("horas") or 0)
+    if horas <= 0:
+        return ate
+    progresso = min(1.0, (agora - inicio).total_seconds() / (horas * 3600))
+    return de + (ate - de) * progresso
+
+
+def decidir(regras, identidade, versao, agora=None):
+    """
+    (liberada, motivo) para esta loja e a versão do config.
+    Sem "rollout" (ou com "versao" de outra versão) a liberação é total;
+    regras inválidas seguram a versão (um erro de digitação não libera a frota inteira).
+    """
+    if not regras:
+        return True, "sem rollout"
+    if not isinstance(regras, dict):
+        return False, f"rollout inválido no config (esperado um objeto, veio {type(regras).__name__})"
+    if regras.get("versao") and str(regras["versao"]).strip() != str(versao).strip():
+        return True, f"rollout é da versão {regras['versao']}"
+    for lista in ("negar", "permitir"):
+        if not isinstance(regras.get(lista, []), list):
+            return False, f"rollout inválido no config (\"{lista}\" deve ser uma lista de filiais)"
+    identidade = str(identidade)
+    if identidade in {str(f) for f in regras.get("negar", [])}:
+        return False, f"filial {identidade} na lista de exclusão"
+    if identidade in {str(f) for f in regras.get("permitir", [])}:
+        return True, f"filial {identidade} na lista de liberação"
+    try:
+        percentual = percentual_vigente(regras, agora)
+    except (KeyError, ValueError, TypeError) as e:
+        return False, f"rollout inválido no config ({e})"
+    fracao = fracao_estavel(identidade, "rollout", versao) * 100
+    if fracao < percentual:
+        return True, f"liberada ({percentual:.0f}% das lojas; posição {fracao:.1f})"
+    return False, f"aguardando ({percentual:.0f}% das lojas liberadas; posição {fracao:.1f})"
+
+
+def _limitar(valor):
+    return max(0.0, min(100.0, float(valor)))
@@ -0,0 +1,119 @@
+"""
+Simulação acelerada da agenda do launcher (launcher --simular).
+Roda o Agendador e o PoolExecucao reais contra um relógio virtual: nada
+dorme e nenhum processo é iniciado. Cada job "dura" o tempo estimado
+(duracao_estimada_min no config, média do execucoes.jsonl ou o padrão).
+Gera a linha do tempo de disparos, esperas, sobreposições e recuperações.
+"""
+
+import time
+import heapq
+import itertools
+from concurrent.futures import Future
+from datetime import timedelta
+
+from agendador import Agendador
+from pool_execucao import PoolExecucao
+
+
+class ExecutorVirtual:
+    """Substitui o ThreadPoolExecutor: registra o job e o conclui no tempo virtual."""
+
+    def __init__(self, relogio, duracao):
+        self._relogio = relogio
+        self._duracao = duracao
+        self._seq = itertools.count()
+        self.conclusoes = []  # heap (fim, seq, futuro, tarefa)
+
+    def submit(self, _fn, tarefa, previsto):
+        futuro = Future()
+        fim = self._relogio() + self._duracao(tarefa)
+        heapq.heappush(self.conclusoes, (fim, next(self._seq), futuro, tarefa))
+        return futuro
+
+    def proxima_conclusao(self):
+        return self.conclusoes[0][0] if self.conclusoes else None
+
+    def concluir_ate(self, agora):
+        while self.conclusoes and self.conclusoes[0][0] <= agora:
+            _, _, futuro, _ = heapq.heappop(self.conclusoes)
+            futuro.set_result(0)
+
+
+def simular(executar, tipo_terminal, inicio, dias, max_workers=3, espacamento_recuperacao_min=5,
+            duracao_padrao_min=1.0, duracoes=None, ultimas=None, identidade=""):
+    """
+    Retorna (eventos, resumo). Cada evento é um dict com 'quando', 'tipo'
+    (disparo, recuperacao, duplicado, espera, inicio, sobreposicao, fim) e 'job'.
+    `duracoes` ({job: minutos}) vem do histórico real quando disponível.
+    """
+    duracoes = duracoes or {}
+    relogio = {"agora": inicio}
+    fim_simulacao = inicio + timedelta(days=dias)
+
+    def duracao(tarefa):
+        minutos = tarefa.info.get("duracao_estimada_min") or duracoes.get(tarefa.chave) or duracao_padrao_min
+        return timedelta(minutes=minutos)
+
+    executor = ExecutorVirtual(lambda: relogio["agora"], duracao)
+    pool = PoolExecucao(max_workers, None, executor=executor)
+    agendador = Agendador(espacamento_recuperacao_min)
+    agendador.compilar(executar, tipo_terminal, inicio, ultimas=ultimas, identidade=identidade)
+
+    eventos = []
+    contagem = {}
+    max_simultaneos = 0
+    esperando = set()
+    t0 = time.perf_counter()
+
+    def evento(tipo, tarefa, **extra):
+        eventos.append({"quando": relogio["agora"], "tipo": tipo, "job": tarefa.chave, **extra})
+
+    for tarefa, previsto, acao in agendador.perdidos:
+        eventos.append({"quando": inicio, "tipo": "perdido", "job": tarefa.chave, "previsto": previsto, "acao": acao})
+
+    while True:
+        candidatos = [t for t in (agendador.proximo_disparo(), executor.proxima_conclusao()) if t is not None]
+        if not candidatos:
+            break
+        agora = min(candidatos)
+        if agora > fim_simulacao:
+            break
+        relogio["agora"] = agora
+
+        executor.concluir_ate(agora)
+        for tarefa, _codigo, _erro in pool.coletar():
+            evento("fim", tarefa)
+
+        for previsto, tarefa, recuperacao in agendador.vencidas(agora):
+            evento("recuperacao" if recuperacao else "disparo", tarefa, previsto=previsto)
+            contagem[tarefa.chave] = contagem.get(tarefa.chave, 0) + 1
+            if not pool.enviar(tarefa, previsto):
+                evento("duplicado", tarefa)
+
+        rodando_antes = [t.chave for t in pool.rodando()]
+        for tarefa in pool.despachar():
+            esperando.discard(tarefa.chave)
+            evento("inicio", tarefa)
+            if rodando_antes:
+                evento("sobreposicao", tarefa, com=list(rodando_antes))
+            rodando_antes.append(tarefa.chave)
+        for tarefa in pool.pendentes():
+            if tarefa.chave not in esperando:
+                esperando.add(tarefa.chave)
+                evento("espera", tarefa, rodando=[t.chave for t in pool.rodando()])
+        max_simultaneos = max(max_simultaneos, len(pool.rodando()))
+
+    decorrido = time.perf_counter() - t0
+    resumo = {
+        "dias": dias,
+        "disparos": sum(contagem.values()),
+        "por_job": contagem,
+        "esperas": sum(1 for e in eventos if e["tipo"] == "espera"),
+        "sobreposicoes": sum(1 for e in eventos if e["tipo"] == "sobreposicao"),
+        "max_simultaneos": max_simultaneos,
+        "segundos": decorrido,
+        "eventos_por_segundo": len(eventos) / decorrido if decorrido else 0.0,
+        "erros": agendador.erros,
+    }
+    return eventos, resumo
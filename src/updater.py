@@ -1,11 +1,26 @@
 import subprocess
 import sys
 import os
+import re
 import json
-import random
 import urllib.request
 from datetime import datetime
 import time
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from log_rotativo import abrir_log
+from cliente_config import ClienteConfig
+from metricas import Registro
+from rede import RedeResiliente, caminho_estado
+from downloads import MotorDownloads, ErroVerificacao, LimiteBanda, instalar, restaurar_anterior
+from controle import ClienteControle, ErroControle, LauncherOcupado
+from manifesto import Manifesto
+from delta import aplicar as aplicar_delta
+from armazem import Armazem, MAX_VERSOES, MAX_BYTES
+from espelho import url_espelho, PORTA_PADRAO as ESPELHO_PORTA
+from processos import iniciar_destacado, aguardar_pid
 
 # -----------------------------
 # Configurações
@@ -16,39 +31,106 @@ BASE_DIR = r"C:\Program Files (x86)\MonitoramentoBKP"
 # dirotório de testes para produção: C:\Program Files (x86)\MonitoramentoBKP
 LOG_BASE_DIR = os.path.join(BASE_DIR, "logs")
 VERSION_FILE = os.path.join(BASE_DIR, "versao.config")
-MAX_LOG_LINES = 100
+CONFIG_CACHE = os.path.join(BASE_DIR, "config_cache.json")
+MANIFESTO_FILE = os.path.join(BASE_DIR, "manifesto.json")  # sha256 dos arquivos instalados
+CONTROLE_TOKEN = os.path.join(BASE_DIR, "controle.token")  # gerado pelo launcher a cada início
+SERVICO = "BaseService"
+SERVICO_TIMEOUT_S = 30  # espera máxima por STOPPED/RUNNING após sc stop/start
+SAUDE_TIMEOUT_S = 45  # o launcher novo precisa responder no canal de controle nesse prazo, senão volta o anterior
+SUFIXO_NOVO = ".novo"  # launcher.exe baixado e conferido, aguardando a troca
+TROCA_LAUNCHER = os.path.join(BASE_DIR, "troca_launcher.json")  # existe enquanto o processo destacado troca o launcher.exe
+TROCA_ESPERA_S = 300  # o processo da troca espera o updater (filho do serviço) terminar por até esse tempo
+TROCA_FALHAS = os.path.join(BASE_DIR, "troca_launcher_falhas.json")  # versão cuja troca falhou; o launcher espera para tentar de novo
+MAX_LOG_BYTES = 512 * 1024
+LOG_SEGMENTOS = 3
+DOWNLOADS_PARALELOS = 3  # arquivos baixados ao mesmo tempo (config.json: "downloads_paralelos")
+DOWNLOAD_TIMEOUT = 60
+LIMITE_DOWNLOAD_KBPS = 0  # soma de todos os downloads; 0 = sem limite (config.json: "limite_download_kbps")
+LIMITE_EXPEDIENTE_KBPS = None  # limite menor no expediente da loja (config.json: "limite_expediente_kbps")
+EXPEDIENTE_PADRAO = "08:00-22:00"  # config.json: "expediente"
+PROGRESSO_LOG_S = 10  # intervalo entre linhas de progresso no log, por arquivo
+CACHE_DIR = os.path.join(BASE_DIR, "cache")  # versões anteriores por sha256 (rollback sem rede)
+CACHE_VERSOES = MAX_VERSOES  # config.json: "cache_versoes"
+CACHE_MAX_MB = MAX_BYTES // (1024 * 1024)  # config.json: "cache_max_mb"
+PROGRESSO_METRICAS_S = 2  # intervalo mínimo entre gravações de metricas/updater.json durante os downloads
+
+# Espelho da loja (espelho.py): caixas pelo versao.config, o SERVIDOR pelo próprio launcher
+espelho = {"base": None}
+
+# launcher.exe novo já conferido: trocado por um processo destacado depois que este updater termina
+troca_pendente = {}
+
+# Limites de banda vigentes, preenchidos pelo main() a partir do config
+banda = {"kbps": LIMITE_DOWNLOAD_KBPS, "expediente_kbps": LIMITE_EXPEDIENTE_KBPS, "expediente": EXPEDIENTE_PADRAO}
+
+
+def dentro_expediente(faixa, agora=None):
+    """faixa "HH:MM-HH:MM" (pode virar a meia-noite, ex.: "22:00-06:00")."""
+    try:
+        inicio, fim = [datetime.strptime(p.strip(), "%H:%M").time() for p in faixa.split("-")]
+    except Exception:
+        return False
+    hora = (agora or datetime.now()).time()
+    if inicio <= fim:
+        return inicio <= hora < fim
+    return hora >= inicio or hora < fim
+
+
+def taxa_download():
+    """Bytes/s permitidos agora (0 = sem limite), consultado a cada bloco pelo LimiteBanda."""
+    kbps = banda["kbps"] or 0
+    if banda["expediente_kbps"] and dentro_expediente(banda["expediente"]):
+        kbps = min(kbps, banda["expediente_kbps"]) if kbps else banda["expediente_kbps"]
+    return kbps * 1024
+
+
+# Conexões persistentes por host, reaproveitadas entre os arquivos do release;
+# o limite de banda é global: vale para a soma dos downloads em paralelo
+motor = MotorDownloads(
+    timeout=DOWNLOAD_TIMEOUT,
+    rede=RedeResiliente(caminho_estado(BASE_DIR)),
+    limite=LimiteBanda(taxa_download),
+)
+manifesto = Manifesto(MANIFESTO_FILE)
+armazem = Armazem(CACHE_DIR)
+evitados = Counter()  # arquivos/bytes que não precisaram ser baixados nesta execução
+trava_evitados = threading.Lock()
+
+# Métricas da última execução do updater (metricas/updater.json, exposto pelo launcher)
+metricas = Registro("updater")
+M_EXECUCAO = metricas.histograma("updater_execucao_segundos", "Duração total do updater")
+M_CONFIG = metricas.histograma("updater_config_segundos", "Duração do download do config pelo updater")
+M_DOWNLOAD = metricas.histograma("updater_download_segundos", "Duração do download de cada arquivo")
+M_BYTES = metricas.contador("updater_bytes_baixados_total", "Bytes baixados por arquivo")
+M_SERVICO = metricas.histograma("updater_servico_segundos", "Duração de parada/início do BaseService")
+M_FORA_DO_AR = metricas.histograma("updater_servico_fora_do_ar_segundos", "Tempo do BaseService parado na troca do launcher.exe")
+M_TROCAS = metricas.contador("updater_trocas_launcher_total", "Trocas do launcher.exe por resultado")
+M_ITENS = metricas.contador("updater_itens_total", "Itens do config processados por resultado")
+M_EVITADOS = metricas.contador("updater_bytes_evitados_total", "Bytes não baixados porque o sha256 local já confere")
+M_CACHE = metricas.contador("updater_cache_total", "Trocas de versão resolvidas pelo cache local, por resultado")
+M_ESPELHO = metricas.contador("updater_espelho_total", "Downloads tentados no espelho da loja, por resultado")
+M_DELTA = metricas.contador("updater_bytes_delta_economizados_total", "Bytes não baixados por ter aplicado um delta")
+M_FIM = metricas.medidor("updater_ultima_execucao_timestamp", "Horário (epoch) do fim da última execução")
+M_ANDAMENTO = metricas.medidor("updater_em_andamento", "1 enquanto o updater está baixando arquivos")
+M_PROG_BYTES = metricas.medidor("updater_download_bytes", "Bytes já gravados do download em andamento")
+M_PROG_TOTAL = metricas.medidor("updater_download_total_bytes", "Tamanho esperado do download (0 se desconhecido)")
+M_PROG_TAXA = metricas.medidor("updater_download_taxa_bps", "Taxa média do download em bytes/s")
+M_PROG_ETA = metricas.medidor("updater_download_eta_segundos", "Estimativa de segundos até o fim do download")
+
+ultimo_log_progresso = {}  # arquivo -> perf_counter da última linha de progresso
+ultimo_salvamento = [0.0]
+trava_progresso = threading.Lock()
 
 
 # Funções de log
-def log(msg):
-    now = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
-    line = f"[{now}] {msg}\n"
-    garantir_diretorio_logs()
-
-    LOG_FILE = os.path.join(LOG_BASE_DIR, "updater.log")  # Pode mudar o nome conforme necessário
-
-    lines = []
-    if os.path.exists(LOG_FILE):
-        with open(LOG_FILE, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-
-    lines.append(line)
-    if len(lines) > MAX_LOG_LINES:
-        lines = lines[-MAX_LOG_LINES:]
-
-    with open(LOG_FILE, "w", encoding="utf-8") as f:
-        f.writelines(lines)
-
-    print(line.strip())
-
-def garantir_diretorio_logs():
-    if not os.path.exists(LOG_BASE_DIR):
-        try:
-            os.makedirs(LOG_BASE_DIR, exist_ok=True)
-            print(f"✅ Pasta de logs criada: {LOG_BASE_DIR}")
-        except Exception as e:
-            print(f"❌ Erro ao criar a pasta de logs: {e}")
-            raise
+def log(msg, nivel="INFO"):
+    escritor = abrir_log(
+        os.path.join(LOG_BASE_DIR, "updater.log"),
+        max_bytes=MAX_LOG_BYTES,
+        segmentos=LOG_SEGMENTOS,
+        flush="registro",
+    )
+    escritor.escrever(msg, nivel)
 
 # Função para executar comandos como administrador
 def run_as_admin(command):
@@ -63,44 +145,218 @@ def run_as_admin(command):
 # -----------------------------
 # Funções de controle de serviço
 # -----------------------------
+def estado_servico():
+    """Estado do BaseService pelo sc query (RUNNING, STOPPED, ...); None se não foi possível ler."""
+    try:
+        r = subprocess.run(["sc", "query", SERVICO], capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    # O rótulo ("STATE"/"ESTADO") muda com o idioma do Windows; o nome do estado não
+    m = re.search(r"\b\d\s+(STOPPED|START_PENDING|STOP_PENDING|RUNNING|CONTINUE_PENDING|PAUSE_PENDING|PAUSED)\b",
+                  r.stdout or "")
+    return m.group(1) if m else None
+
+def aguardar_estado(alvo, timeout_s=SERVICO_TIMEOUT_S):
+    limite = time.monotonic() + timeout_s
+    while True:
+        if estado_servico() == alvo:
+            return True
+        if time.monotonic() >= limite:
+            return False
+        time.sleep(0.2)
+
 def parar_servico():
-    log("🛑 Parando o serviço BaseService...")
+    log(f"🛑 Parando o serviço {SERVICO}...")
+    inicio = time.perf_counter()
     try:
-        # Executa o comando como administrador para parar o serviço
-        subprocess.run(["sc", "stop", "BaseService"], check=True)
-        time.sleep(5)  # Aguarda alguns segundos para garantir que o serviço foi realmente parado
-        log("✔️ Serviço BaseService parado com sucesso.")
-    except subprocess.CalledProcessError as e:
-        log(f"⚠️ Erro ao parar o serviço BaseService: {e}")
+        # Sem check: "serviço não iniciado" também serve; o que vale é o estado consultado
+        r = subprocess.run(["sc", "stop", SERVICO], capture_output=True, text=True)
+        if aguardar_estado("STOPPED"):
+            log(f"✔️ Serviço {SERVICO} parado em {time.perf_counter() - inicio:.1f}s.")
+            return True
+        log(f"⚠️ Serviço {SERVICO} não parou em {SERVICO_TIMEOUT_S}s: {(r.stdout or '').strip()[-200:]}", "AVISO")
         return False
-    return True
+    finally:
+        M_SERVICO.observar(time.perf_counter() - inicio, acao="parar")
 
 def iniciar_servico():
-    log("🚀 Iniciando o serviço BaseService...")
+    log(f"🚀 Iniciando o serviço {SERVICO}...")
+    inicio = time.perf_counter()
     try:
-        # Executa o comando como administrador para iniciar o serviço
-        subprocess.run(["sc", "start", "BaseService"], check=True)
-        log("✔️ Serviço BaseService iniciado com sucesso.")
-    except subprocess.CalledProcessError as e:
-        log(f"⚠️ Erro ao iniciar o serviço BaseService: {e}")
+        r = subprocess.run(["sc", "start", SERVICO], capture_output=True, text=True)
+        if aguardar_estado("RUNNING"):
+            log(f"✔️ Serviço {SERVICO} iniciado em {time.perf_counter() - inicio:.1f}s.")
+            return True
+        log(f"⚠️ Serviço {SERVICO} não iniciou em {SERVICO_TIMEOUT_S}s: {(r.stdout or '').strip()[-200:]}", "AVISO")
         return False
-    return True
+    finally:
+        M_SERVICO.observar(time.perf_counter() - inicio, acao="iniciar")
+
+def launcher_saudavel(timeout_s=SAUDE_TIMEOUT_S):
+    """
+    O launcher novo está de pé quando o serviço segue RUNNING e o canal de
+    controle responde com o token que ele mesmo gerou ao iniciar.
+    Retorna (ok, motivo).
+    """
+    cliente = ClienteControle(CONTROLE_TOKEN)
+    limite = time.monotonic() + timeout_s
+    while time.monotonic() < limite:
+        estado = estado_servico()
+        if estado == "STOPPED":
+            return False, "o serviço parou logo após iniciar"
+        if estado == "RUNNING":
+            try:
+                cliente.chamar("status")
+                return True, None
+            except (OSError, ValueError, ErroControle, LauncherOcupado):
+                pass  # ainda subindo (ou token do launcher anterior)
+        time.sleep(0.5)
+    return False, f"o launcher não respondeu no canal de controle em {timeout_s}s"
+
+def trocar_launcher(novo, destino):
+    """
+    Com o launcher.exe novo já baixado e conferido em `novo`: para o serviço,
+    troca o arquivo (o anterior fica em .anterior), inicia e verifica a saúde.
+    Se o novo não ficar saudável, volta o anterior e reinicia o serviço.
+    Roda no processo destacado de executar_troca(), nunca dentro do serviço.
+    """
+    inicio = time.perf_counter()
+    if not parar_servico():
+        log("❌ Troca do launcher.exe adiada: serviço não parou; o atual segue em uso", "ERRO")
+        iniciar_servico()
+        M_TROCAS.inc(resultado="adiada")
+        return False
+    try:
+        instalar(novo, destino)
+    except Exception as e:
+        log(f"❌ Falha ao trocar {destino}: {e}", "ERRO")
+        iniciar_servico()
+        M_TROCAS.inc(resultado="falha")
+        return False
+    iniciar_servico()
+    fora_do_ar = time.perf_counter() - inicio
+    M_FORA_DO_AR.observar(fora_do_ar)
+    ok, motivo = launcher_saudavel()
+    if ok:
+        log(f"✅ launcher.exe trocado: {SERVICO} ficou {fora_do_ar:.1f}s fora do ar")
+        M_TROCAS.inc(resultado="ok")
+        return True
+    log(f"❌ launcher.exe novo não ficou saudável ({motivo}) — voltando a versão anterior", "ERRO")
+    parar_servico()
+    if restaurar_anterior(destino):
+        log("↩️ launcher.exe anterior restaurado")
+    else:
+        log("⚠️ Não havia launcher.exe anterior para restaurar", "AVISO")
+    iniciar_servico()
+    M_TROCAS.inc(resultado="revertida")
+    return False
+
+def registrar_falha_troca(versao, versao_anterior):
+    """
+    Troca não concluída (launcher.exe anterior em uso): volta o versao.config
+    para a versão anterior, para o launcher voltar a ver a diferença e rodar
+    o updater de novo, e conta a tentativa em troca_launcher_falhas.json, que
+    ele usa para espaçar as novas tentativas.
+    """
+    try:
+        with open(TROCA_FALHAS, "r", encoding="utf-8") as f:
+            falhas = json.load(f)
+    except Exception:
+        falhas = {}
+    tentativas = falhas.get("tentativas", 0) + 1 if falhas.get("versao") == versao else 1
+    try:
+        with open(TROCA_FALHAS, "w", encoding="utf-8") as f:
+            json.dump({"versao": versao, "tentativas": tentativas, "ultima": time.time()}, f, indent=2)
+    except Exception as e:
+        log(f"⚠️ Falha ao gravar {TROCA_FALHAS}: {e}", "AVISO")
+    if versao_anterior and versao_anterior != versao and gravar_versao_local(versao_anterior):
+        log(f"↩️ versao.config de volta a {versao_anterior}: a troca para {versao} será tentada de novo "
+            f"({tentativas} falha(s) até agora)")
+
+def iniciar_troca(novo, destino, versao, versao_anterior):
+    """
+    O updater roda como filho do launcher, dentro do Job Object dele: se ele
+    mesmo parasse o serviço, o NSSM o encerraria no meio da troca. Grava
+    troca_launcher.json (o launcher não roda outro updater enquanto ele existe)
+    e inicia uma cópia destacada do updater com --trocar, fora do job, que
+    espera este processo terminar antes de parar o serviço.
+    """
+    dados = {"novo": novo, "destino": destino, "versao": versao, "versao_anterior": versao_anterior,
+             "updater_pid": os.getpid(), "inicio": time.time()}
+    try:
+        with open(TROCA_LAUNCHER, "w", encoding="utf-8") as f:
+            json.dump(dados, f, indent=2)
+        if getattr(sys, "frozen", False):
+            args = [sys.executable, "--trocar"]
+        else:
+            args = [sys.executable, os.path.abspath(__file__), "--trocar"]
+        pid = iniciar_destacado(args, cwd=BASE_DIR)
+        log(f"🔀 Troca do launcher.exe entregue ao processo destacado (PID {pid}); ela começa quando este updater terminar")
+        return True
+    except Exception as e:
+        log(f"❌ Não foi possível iniciar a troca do launcher.exe: {e} — o atual segue em uso", "ERRO")
+        M_TROCAS.inc(resultado="falha")
+        for caminho in (TROCA_LAUNCHER, novo):
+            try:
+                os.remove(caminho)
+            except OSError:
+                pass
+        registrar_falha_troca(versao, versao_anterior)
+        return False
+
+
+def executar_troca():
+    """Ponto de entrada do updater --trocar (processo destacado de iniciar_troca)."""
+    try:
+        with open(TROCA_LAUNCHER, "r", encoding="utf-8") as f:
+            dados = json.load(f)
+    except Exception as e:
+        log(f"❌ Troca do launcher.exe sem {TROCA_LAUNCHER} legível: {e}", "ERRO")
+        return
+    ok = False
+    try:
+        if not aguardar_pid(int(dados["updater_pid"]), TROCA_ESPERA_S):
+            log(f"⚠️ O updater (PID {dados['updater_pid']}) ainda roda após {TROCA_ESPERA_S}s — trocando assim mesmo",
+                "AVISO")
+        log(f"🔀 Trocando launcher.exe pela versão {dados.get('versao')}")
+        ok = trocar_launcher(dados["novo"], dados["destino"])
+        if ok:
+            manifesto.hash_atual(dados["destino"])  # registra o sha256 do launcher.exe instalado
+            manifesto.salvar()
+            try:
+                os.remove(TROCA_FALHAS)
+            except OSError:
+                pass
+        elif os.path.exists(dados["novo"]):
+            os.remove(dados["novo"])
+    except Exception as e:
+        log(f"❌ Erro na troca do launcher.exe: {e}", "ERRO")
+    finally:
+        if not ok:
+            registrar_falha_troca(dados.get("versao"), dados.get("versao_anterior"))
+        try:
+            os.remove(TROCA_LAUNCHER)
+        except OSError:
+            pass
 
 # -----------------------------
 # Funções utilitárias
 # -----------------------------
 def baixar_config_forcado():
-    """Baixa config forçando evitar cache (adiciona query string aleatória)."""
+    """Baixa o config com requisição condicional (ETag/Last-Modified) sobre o config_cache.json."""
     try:
-        url = f"{CONFIG_URL}?nocache={random.randint(1000,999999)}"
-        log(f"🌐 Baixando config (forçado): {url}")
-        with urllib.request.urlopen(url, timeout=15) as resp:
-            content = resp.read().decode()
-            cfg = json.loads(content)
-            log(f"✅ Config carregado. Versão remota no config: {cfg.get('versao')}")
-            return cfg
+        log(f"🌐 Baixando config: {CONFIG_URL}")
+        url_espelho_config = espelho["base"] + "/config.json" if espelho["base"] else None
+        cliente = ClienteConfig(CONFIG_URL, CONFIG_CACHE, timeout=15, espelho=url_espelho_config)
+        with M_CONFIG.cronometrar():
+            cfg, mudou = cliente.obter()
+        origem = "remoto" if mudou else "inalterado, cache local"
+        if cliente.origem != CONFIG_URL:
+            origem += ", via espelho da loja"
+        log(f"✅ Config carregado ({origem}). Versão remota no config: {cfg.get('versao')}")
+        return cfg
     except Exception as e:
-        log(f"❌ Falha ao baixar config: {e}")
+        log(f"❌ Falha ao baixar config: {e}", "ERRO")
         return None
 
 def baixar_arquivo(url, destino):
@@ -110,7 +366,7 @@ def baixar_arquivo(url, destino):
         log(f"📦 Arquivo atualizado com sucesso: {destino}")
         return True
     except Exception as e:
-        log(f"❌ Erro ao baixar {url}: {e}")
+        log(f"❌ Erro ao baixar {url}: {e}", "ERRO")
         return False
 
 # -----------------------------
@@ -131,17 +387,170 @@ def atualizar_software(caminho_destino, arquivo_url, nome_arquivo):
         if substituir_arquivo(caminho_destino, arquivo_url):
             log(f"✅ Atualização do {nome_arquivo} concluída sem parar o serviço.")
 
-def substituir_arquivo(caminho_destino, arquivo_url):
+def _mb(n):
+    return f"{n / (1024 * 1024):.1f}"
+
+
+def reportar_progresso(p):
+    """Callback do MotorDownloads: medidores por arquivo, log a cada PROGRESSO_LOG_S e snapshot para o painel."""
+    nome = p["arquivo"]
+    M_PROG_BYTES.definir(p["bytes"], arquivo=nome)
+    M_PROG_TOTAL.definir(p["total"] or 0, arquivo=nome)
+    # Arquivo concluído sai da soma das taxas que o painel mostra
+    M_PROG_TAXA.definir(0 if p["concluido"] else round(p["taxa_bps"]), arquivo=nome)
+    if p["eta_s"] is not None:
+        M_PROG_ETA.definir(round(p["eta_s"], 1), arquivo=nome)
+    agora = time.perf_counter()
+    with trava_progresso:
+        registrar = not p["concluido"] and agora - ultimo_log_progresso.get(nome, 0) >= PROGRESSO_LOG_S
+        if registrar:
+            ultimo_log_progresso[nome] = agora
+        salvar = p["concluido"] or agora - ultimo_salvamento[0] >= PROGRESSO_METRICAS_S
+        if salvar:
+            ultimo_salvamento[0] = agora
+    if registrar and p["bytes"]:
+        taxa = f"{p['taxa_bps'] / 1024:.0f} KB/s"
+        if p["total"]:
+            eta = f", ETA {p['eta_s']:.0f}s" if p["eta_s"] is not None else ""
+            log(f"📥 {nome}: {p['bytes'] * 100 // p['total']}% ({_mb(p['bytes'])}/{_mb(p['total'])} MB) a {taxa}{eta}")
+        else:
+            log(f"📥 {nome}: {_mb(p['bytes'])} MB a {taxa}")
+    if salvar:
+        metricas.salvar(BASE_DIR)
+
+
+def baixar_com_espelho(url, destino, sha256=None, compactado=None, **opcoes):
+    """
+    motor.baixar() na ordem: espelho da loja (só com sha256 conhecido), variante
+    compactada do config ({"url", "formato": "xz"|"gzip"}) e a URL normal.
+    """
+    nome = os.path.basename(destino)
+    if espelho["base"] and sha256:
+        try:
+            r = motor.baixar(url_espelho(espelho["base"], sha256), destino, sha256=sha256, tentativas=1, **opcoes)
+            M_ESPELHO.inc(resultado="espelho")
+            return r
+        except Exception as e:
+            M_ESPELHO.inc(resultado="falha")
+            log(f"⚠️ Espelho não entregou {nome} ({e}) — baixando da origem", "AVISO")
+    if compactado and compactado.get("url"):
+        formato = compactado.get("formato", "xz")
+        try:
+            r = motor.baixar(compactado["url"], destino, sha256=sha256, formato=formato, **opcoes)
+            log(f"🗜️ {nome} baixado compactado ({formato}): {r['bytes']} bytes pela rede", "DEBUG")
+            return r
+        except Exception as e:
+            log(f"⚠️ Variante compactada de {nome} falhou ({e}) — baixando sem compactação", "AVISO")
+    return motor.baixar(url, destino, sha256=sha256, **opcoes)
+
+
+def substituir_arquivo(caminho_destino, arquivo_url, sha256=None, tamanho=None, compactado=None, saida=None):
+    """
+    Baixa para um .parcial ao lado do destino (retomável), confere tamanho/sha256
+    e troca atomicamente; a versão substituída fica em <destino>.anterior.
+    Com `saida`, a versão conferida fica lá e o destino não é tocado.
+    Em qualquer falha o arquivo em uso não é tocado.
+    """
     log("🔄 Iniciando atualização...")
 
+    nome = os.path.basename(caminho_destino)
     try:
-        urllib.request.urlretrieve(arquivo_url, caminho_destino)
-        log(f"📦 Arquivo atualizado com sucesso: {caminho_destino}")
+        with M_DOWNLOAD.cronometrar(arquivo=nome):
+            r = baixar_com_espelho(arquivo_url, saida or caminho_destino, sha256=sha256, tamanho=tamanho,
+                                   compactado=compactado, manter_anterior=not saida, progresso=reportar_progresso)
+        M_BYTES.inc(r["bytes"], arquivo=nome)
+        if not saida:
+            manifesto.registrar(caminho_destino, r["sha256"])
+        retomado = f", {r['retomados']} bytes retomados de download anterior" if r["retomados"] else ""
+        log(f"📦 Arquivo {'baixado e conferido' if saida else 'atualizado com sucesso'}: {saida or caminho_destino} "
+            f"({r['bytes']} bytes em {r['segundos']:.1f}s{retomado}, sha256 {r['sha256'][:12]}…)")
         return True
+    except ErroVerificacao as e:
+        log(f"❌ Download descartado, arquivo atual mantido: {e}", "ERRO")
+        return False
     except Exception as e:
-        log(f"❌ Erro ao baixar {arquivo_url}: {e}")
+        log(f"❌ Erro ao baixar {arquivo_url}: {e}", "ERRO")
         return False
     
+def guardar_no_cache(caminho, nome, sha256=None):
+    """Guarda a versão instalada antes de substituí-la (ou a recém-instalada). Falha aqui não impede a atualização."""
+    try:
+        sha256 = sha256 or manifesto.hash_atual(caminho)
+        if sha256:
+            armazem.guardar(caminho, sha256, nome)
+    except Exception as e:
+        log(f"⚠️ Não foi possível guardar {nome} no cache local: {e}", "AVISO")
+
+
+def restaurar_do_cache(caminho_destino, nome, esperado, saida=None):
+    """
+    Troca para a versão `esperado` se ela está no cache local — sem nenhum acesso à rede.
+    Com `saida`, só deixa a versão conferida lá (a troca fica com quem chamou).
+    """
+    if not esperado or not armazem.contem(esperado):
+        M_CACHE.inc(resultado="ausente")
+        return False
+    try:
+        ok = armazem.restaurar(esperado, saida or caminho_destino, nome)
+    except Exception as e:
+        log(f"⚠️ Falha ao restaurar {nome} do cache local: {e}", "AVISO")
+        ok = False
+    M_CACHE.inc(resultado="restaurado" if ok else "invalido")
+    if ok and not saida:
+        manifesto.registrar(caminho_destino, esperado)
+    if ok:
+        log(f"♻️ {nome}: versão {esperado[:12]}… obtida do cache local (sem download)")
+    return ok
+
+
+def atualizar_por_delta(caminho_destino, item, esperado, saida=None):
+    """
+    Se o config traz um delta a partir do sha256 instalado, baixa só o patch,
+    reconstrói a versão nova ao lado do destino e troca atomicamente
+    (ou a deixa em `saida`, sem trocar).
+    Retorna False (sem tocar no arquivo instalado) se não há delta aplicável
+    ou qualquer etapa falha; quem chama cai para o download completo.
+    """
+    deltas = item.get("deltas") or []
+    # Os deltas do config levam ao sha256 do release; com "fixar" noutra versão não servem
+    if not deltas or not esperado or esperado != str(item.get("sha256") or "").strip().lower():
+        return False
+    atual = manifesto.hash_atual(caminho_destino)
+    d = next((d for d in deltas if str(d.get("de", "")).strip().lower() == atual and d.get("url")), None)
+    if d is None:
+        log(f"ℹ️ Nenhum delta do config parte da versão instalada de {os.path.basename(caminho_destino)}", "DEBUG")
+        return False
+    nome = os.path.basename(caminho_destino)
+    patch = caminho_destino + ".delta"
+    novo = caminho_destino + ".delta.novo"
+    try:
+        with M_DOWNLOAD.cronometrar(arquivo=nome):
+            r = baixar_com_espelho(d["url"], patch, sha256=d.get("sha256"), tamanho=d.get("tamanho"),
+                                   manter_anterior=False, progresso=reportar_progresso)
+            digest = aplicar_delta(caminho_destino, patch, novo, sha256=esperado)
+        instalar(novo, saida or caminho_destino, manter_anterior=not saida)
+        if not saida:
+            manifesto.registrar(caminho_destino, digest)
+        M_BYTES.inc(r["bytes"], arquivo=nome)
+        tamanho = os.path.getsize(saida or caminho_destino)
+        tamanho_patch = os.path.getsize(patch)
+        economia = max(0, tamanho - tamanho_patch)
+        M_DELTA.inc(economia, arquivo=nome)
+        with trava_evitados:
+            evitados["delta"] += economia
+        log(f"🧩 {nome} reconstruído por delta: {tamanho_patch} bytes baixados em vez de {tamanho} "
+            f"(sha256 {digest[:12]}…)")
+        return True
+    except Exception as e:
+        log(f"⚠️ Delta de {nome} falhou ({e}) — baixando o arquivo completo", "AVISO")
+        return False
+    finally:
+        for temp in (patch, novo):
+            try:
+                os.remove(temp)
+            except OSError:
+                pass
+
 # -----------------------------
 # Controle de versão local
 # -----------------------------
@@ -155,7 +564,7 @@ def ler_versao_local_dict():
                 log(f"🔍 Versão local lida: {versao}")
                 return dados  # retorna tudo, não só a versão
         except Exception as e:
-            log(f"⚠️ Erro ao ler {VERSION_FILE}: {e} — recriando padrão")
+            log(f"⚠️ Erro ao ler {VERSION_FILE}: {e} — recriando padrão", "AVISO")
     # cria arquivo padrão se não existir
     dados_padrao = {"versao": "0.0.0", "tipo": "CX1"}
     try:
@@ -163,7 +572,7 @@ def ler_versao_local_dict():
             json.dump(dados_padrao, f, indent=2, ensure_ascii=False)
         log(f"♻️ Criado {VERSION_FILE} padrão: {dados_padrao}")
     except Exception as e:
-        log(f"⚠️ Falha ao criar {VERSION_FILE}: {e}")
+        log(f"⚠️ Falha ao criar {VERSION_FILE}: {e}", "AVISO")
     return dados_padrao
 
 
@@ -189,64 +598,133 @@ def gravar_versao_local(versao_nova):
         log(f"💾 Versão atualizada: {versao_antiga} → {versao_nova}")
         return True
     except Exception as e:
-        log(f"❌ Erro ao atualizar versão no {VERSION_FILE}: {e}")
+        log(f"❌ Erro ao atualizar versão no {VERSION_FILE}: {e}", "ERRO")
         return False
 
     
 def atualizar_item(item):
-    """Atualiza um item do config: {nome, url, destino(optional)}"""
+    """
+    Atualiza um item do config: {nome, url, destino(optional), sha256(optional), tamanho(optional),
+    deltas(optional): [{de, url, sha256, tamanho}], compactado(optional): {url, formato},
+    fixar(optional): sha256}. sha256/tamanho são sempre do arquivo descompactado.
+    Ordem: cache local por sha256, delta, download completo.
+    Retorna True se baixou, None se o arquivo local já confere com o sha256 e False em falha.
+    """
     nome = item.get("nome")
     url = item.get("url")
     destino_dir = item.get("destino", BASE_DIR)
     if not nome or not url:
-        log("⚠️ Item inválido (sem nome ou URL). Pulando.")
+        log("⚠️ Item inválido (sem nome ou URL). Pulando.", "AVISO")
         return False
     if os.path.isabs(destino_dir):
         destino = destino_dir if os.path.splitext(destino_dir)[1] else os.path.join(destino_dir, nome)
     else:
         destino = os.path.join(BASE_DIR, destino_dir, nome)
+    # Com sha256 no config, só baixa se o arquivo instalado for diferente.
+    # "fixar" (sha256) prende o item numa versão, ex.: rollback para uma que está no cache local
+    esperado = str(item.get("fixar") or item.get("sha256") or "").strip().lower()
+    if item.get("fixar"):
+        log(f"📌 '{nome}' fixado na versão {esperado[:12]}…")
+    if esperado and manifesto.hash_atual(destino) == esperado:
+        guardar_no_cache(destino, nome, esperado)
+        tamanho = int(item.get("tamanho") or os.path.getsize(destino))
+        with trava_evitados:
+            evitados["arquivos"] += 1
+            evitados["bytes"] += tamanho
+        M_EVITADOS.inc(tamanho, arquivo=nome)
+        log(f"⏭️ '{nome}' já instalado com o sha256 do config — download evitado ({tamanho} bytes)")
+        return None
     log(f"📦 Atualizando item '{nome}' para {destino}")
-      # Se for o launcher e existe serviço, parar antes (nome exato)
-    if nome.lower() == "launcher.exe":
-        if not parar_servico():
-            log("⚠️ Não foi possível parar BaseService. Continuando tentativa de atualização.")
-    ok = substituir_arquivo(destino, url)
+    launcher = nome.lower() == "launcher.exe"
+    if os.path.exists(destino):
+        guardar_no_cache(destino, nome)
+    # launcher.exe: a versão nova é obtida e conferida com o serviço no ar; ele só para para a troca
+    saida = destino + SUFIXO_NOVO if launcher and os.path.exists(destino) else None
+    tamanho = item.get("tamanho") if not item.get("fixar") else None
+    ok = (restaurar_do_cache(destino, nome, esperado, saida)
+          or atualizar_por_delta(destino, item, esperado, saida)
+          or substituir_arquivo(destino, url, sha256=esperado or None, tamanho=tamanho,
+                                compactado=item.get("compactado") if not item.get("fixar") else None, saida=saida))
+    if ok and saida:
+        # A troca em si fica para depois do fim do updater (iniciar_troca, chamado pelo main)
+        troca_pendente.update(novo=saida, destino=destino)
+        guardar_no_cache(saida, nome, esperado or None)
+        return True
+    if ok and launcher:
+        iniciar_servico()  # primeira instalação do launcher.exe
     if not ok:
-        log(f"❌ Falha ao atualizar {nome}")
+        if saida and os.path.exists(saida):
+            os.remove(saida)
+        log(f"❌ Falha ao atualizar {nome}", "ERRO")
         return False
-    # se atualizou launcher, reinicia serviço
-    if nome.lower() == "launcher.exe":
-        iniciar_servico()
+    guardar_no_cache(destino, nome)
     return True
 
+def processar_item(item):
+    log(f"— processando item do config: {item.get('nome')}")
+    ok = atualizar_item(item)
+    M_ITENS.inc(resultado="inalterado" if ok is None else "ok" if ok else "falha")
+    return ok
+
 ############################ Fluxo principal do updater ############################
 
 def main():
     log("🚀 Iniciando processo de atualização")
 
+    local = ler_versao_local_dict()
+    espelho["base"] = str(local.get("espelho") or "").strip().rstrip("/") or None
+    if espelho["base"]:
+        log(f"🪞 Usando o espelho da loja: {espelho['base']}")
     cfg = baixar_config_forcado()
     if not cfg:
-        log("❌ Não foi possível baixar o config. Abortando.")
+        log("❌ Não foi possível baixar o config. Abortando.", "ERRO")
         return
 
     versao_remota = str(cfg.get("versao", "0.0.0")).strip()
     log(f"🔎 Versão remota (config): {versao_remota}")
 
-    local = ler_versao_local_dict()
     versao_local = str(local.get("versao", "0.0.0")).strip()
     tipo_local = str(local.get("tipo", "CX1")).strip().upper()
+    opcoes_espelho = cfg.get("espelho") or {}
+    if tipo_local == "SERVIDOR" and opcoes_espelho.get("ativo") and not espelho["base"]:
+        # O espelho roda no launcher deste terminal: baixa por ele e a loja inteira usa a mesma cópia
+        espelho["base"] = f"http://127.0.0.1:{int(opcoes_espelho.get('porta', ESPELHO_PORTA))}"
         
 
  # Atualiza arquivos listados
     arquivos = cfg.get("arquivos", [])
-    any_updated = False
-    for item in arquivos:
-        nome = item.get("nome")
-        log(f"— processando item do config: {nome}")
-        ok = atualizar_item(item)
-        any_updated = any_updated or ok
-        # sleeping curto para não sobrecarregar rede/IO em ambientes lentos
-        time.sleep(0.2)
+    paralelos = max(1, int(cfg.get("downloads_paralelos", DOWNLOADS_PARALELOS)))
+    # Itens independentes em paralelo; launcher.exe (para/inicia o serviço) em série, depois de todos,
+    # para o launcher não voltar e disparar um job cujo executável ainda está sendo gravado.
+    servico = [i for i in arquivos if str(i.get("nome", "")).lower() == "launcher.exe"]
+    demais = [i for i in arquivos if i not in servico]
+    banda["kbps"] = cfg.get("limite_download_kbps", LIMITE_DOWNLOAD_KBPS)
+    banda["expediente_kbps"] = cfg.get("limite_expediente_kbps", LIMITE_EXPEDIENTE_KBPS)
+    banda["expediente"] = cfg.get("expediente", EXPEDIENTE_PADRAO)
+    armazem.max_versoes = max(1, int(cfg.get("cache_versoes", CACHE_VERSOES)))
+    armazem.max_bytes = int(cfg.get("cache_max_mb", CACHE_MAX_MB)) * 1024 * 1024
+    log(f"📥 {len(arquivos)} item(ns) no config — até {paralelos} download(s) simultâneo(s)")
+    if taxa_download():
+        log(f"🐢 Downloads limitados a {taxa_download() // 1024} KB/s no total")
+    M_ANDAMENTO.definir(1)
+    try:
+        with ThreadPoolExecutor(max_workers=paralelos, thread_name_prefix="download") as executor:
+            resultados = list(executor.map(processar_item, demais))
+        resultados += [processar_item(item) for item in servico]
+    finally:
+        M_ANDAMENTO.definir(0)
+        motor.fechar()
+        manifesto.salvar()
+        podados = armazem.podar()
+        armazem.salvar()
+        log(f"🗄️ Cache local: {armazem.tamanho_total() // 1024} KB ({podados} versão(ões) descartada(s))", "DEBUG")
+    any_updated = any(resultados)
+    if evitados["arquivos"]:
+        log(f"💾 {evitados['arquivos']} arquivo(s) já atualizado(s): {evitados['bytes']} bytes não baixados "
+            f"({manifesto.hashes_calculados} hash(es) recalculado(s))")
+    if evitados["delta"]:
+        log(f"🧩 Deltas aplicados: {evitados['delta']} bytes a menos que os downloads completos")
+    log(f"🔗 Conexões HTTP: {motor.conexoes_abertas} aberta(s), {motor.conexoes_reutilizadas} reutilização(ões)", "DEBUG")
 
     # Se houve atualização de arquivos, ou versão remota diferente, grava versao.config
     if any_updated or versao_local != versao_remota:
@@ -254,14 +732,30 @@ def main():
         if success:
             log(f"✅ Versão local atualizada para {versao_remota}")
         else:
-            log("⚠️ Não foi possível gravar versão local.")
+            log("⚠️ Não foi possível gravar versão local.", "AVISO")
     else:
         log("ℹ️ Nada mudou (arquivos não alterados e versão igual).")
 
+    # Por último, com o versao.config já gravado: o launcher novo sobe vendo a versão nova
+    # e não dispara outro updater no meio da verificação de saúde
+    if troca_pendente:
+        iniciar_troca(troca_pendente["novo"], troca_pendente["destino"], versao_remota, versao_local)
 
     log("🏁 Updater finalizado")
 
 
 # -----------------------------
 if __name__ == "__main__":
-    main()
+    inicio = time.perf_counter()
+    trocar = "--trocar" in sys.argv[1:]
+    if trocar:
+        metricas.processo = "troca_launcher"  # não sobrescreve metricas/updater.json da execução que pediu a troca
+    try:
+        if trocar:
+            executar_troca()
+        else:
+            main()
+    finally:
+        M_EXECUCAO.observar(time.perf_counter() - inicio)
+        M_FIM.definir(time.time())
+        metricas.salvar(BASE_DIR)
@@ -6,6 +6,11 @@ import urllib.request
 import winreg
 import time
 
+from log_rotativo import abrir_log
+from historico import ler_execucoes, resumo_por_job
+from rede import RedeResiliente, CircuitoAberto, caminho_estado
+from metricas import Registro
+
 # -----------------------------
 # Configurações
 # -----------------------------
@@ -14,52 +19,42 @@ BASE_DIR = r"C:\Program Files (x86)\MonitoramentoBKP"
 BACKUP_DIR = r"C:\backup_sql"  # O backup está no C:\
 LOG_BASE_DIR = os.path.join(BASE_DIR, "logs")
 VERSAO_FILE_PATH = os.path.join(BASE_DIR, "versao.config")
+RUNS_FILE = os.path.join(LOG_BASE_DIR, "execucoes.jsonl")  # diário de execuções do launcher
 
 
 # URL do Google Apps Script
 SHEET_URL = "https://script.google.com/macros/s/AKfycbwnhW-pfrI0p6KS2G5G1cOPz63k6yjcgdYCKcZ1NQja-N1DwvneyHlLXUx-ADoBh4PYFg/exec" 
 
 
-# -----------------------------
-# Funções de log
-# -----------------------------
-
-def garantir_diretorio_logs():
-    """Garante que a pasta 'logs' exista"""
-    if not os.path.exists(LOG_BASE_DIR):  # Verifica se a pasta não existe
-        try:
-            os.makedirs(LOG_BASE_DIR, exist_ok=True)  # Cria a pasta
-            log(f"✅ Pasta de logs criada: {LOG_BASE_DIR}")
-        except Exception as e:
-            log(f"❌ Erro ao criar a pasta de logs: {e}")
-            raise  # Re-levanta a exceção caso falhe
-
-# Função de log
-def log(msg):
-    now = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
-    line = f"[{now}] {msg}\n"
-    
-    # Garantir que a pasta de logs exista antes de gravar
-    garantir_diretorio_logs()
+SHEET_TIMEOUT = 5
+SHEET_TENTATIVAS = 2  # com backoff + jitter entre elas; com o circuito aberto nem tenta
 
-    # Define o arquivo de log
-    LOG_FILE = os.path.join(LOG_BASE_DIR, "valida_bkp.log")  # Pode mudar o nome conforme necessário
+MAX_LOG_BYTES = 512 * 1024
+LOG_SEGMENTOS = 3
 
-    # Mantém no máximo as últimas MAX_LOG_LINES
-    MAX_LOG_LINES = 100  # ou outro valor que você desejar
-    lines = []
-    if os.path.exists(LOG_FILE):
-        with open(LOG_FILE, "r", encoding="utf-8") as f:
-            lines = f.readlines()
+# Métricas da última validação (metricas/valida_bkp.json, exposto pelo launcher)
+metricas = Registro("valida_bkp")
+M_EXECUCAO = metricas.histograma("valida_execucao_segundos", "Duração total do check_backup")
+M_VARREDURA = metricas.histograma("valida_varredura_segundos", "Duração da varredura das pastas de backup")
+M_ENVIO = metricas.histograma("valida_envio_planilha_segundos", "Duração do envio para a planilha por resultado")
+M_SUBPASTAS = metricas.medidor("valida_subpastas", "Subpastas de backup encontradas (total e vazias)")
+M_STATUS = metricas.medidor("valida_backup_ok", "1 se a última validação reportou backup OK, 0 se ERRO")
+M_FIM = metricas.medidor("valida_ultima_execucao_timestamp", "Horário (epoch) do fim da última validação")
 
-    lines.append(line)
-    if len(lines) > MAX_LOG_LINES:
-        lines = lines[-MAX_LOG_LINES:]
 
-    with open(LOG_FILE, "w", encoding="utf-8") as f:
-        f.writelines(lines)
+# -----------------------------
+# Funções de log
+# -----------------------------
 
-    print(line.strip())  # Para manter a saída no console
+def log(msg, nivel="INFO"):
+    """Grava no valida_bkp.log (append + rotação, ver log_rotativo.py)"""
+    escritor = abrir_log(
+        os.path.join(LOG_BASE_DIR, "valida_bkp.log"),
+        max_bytes=MAX_LOG_BYTES,
+        segmentos=LOG_SEGMENTOS,
+        flush="registro",
+    )
+    escritor.escrever(msg, nivel)
 
 # -----------------------------
 # Funções
@@ -76,6 +71,9 @@ def send_to_sheet(filial_id, terminal, status, detalhe):
         "detalhe": detalhe,
         "data": datetime.now().strftime("%d/%m/%Y %H:%M:%S")
     }
+    M_STATUS.definir(1 if status == "OK" else 0)
+    inicio = time.perf_counter()
+    resultado = "erro"
     try:
         data_bytes = json.dumps(payload).encode("utf-8")
         req = urllib.request.Request(
@@ -83,13 +81,20 @@ def send_to_sheet(filial_id, terminal, status, detalhe):
             data=data_bytes,
             headers={"Content-Type": "application/json"}
         )
-        with urllib.request.urlopen(req, timeout=5) as response:
+        rede = RedeResiliente(caminho_estado(BASE_DIR))
+        with rede.urlopen(req, timeout=SHEET_TIMEOUT, tentativas=SHEET_TENTATIVAS) as response:
             if response.status == 200:
+                resultado = "ok"
                 log(f"✅ Status '{status}' enviado para planilha (linha atualizada ou inserida)")
             else:
-                log(f"⚠️ Erro ao enviar: {response.status}")
+                log(f"⚠️ Erro ao enviar: {response.status}", "AVISO")
+    except CircuitoAberto as e:
+        resultado = "circuito_aberto"
+        log(f"🔌 Planilha não enviada: {e}", "AVISO")
     except Exception as e:
-        log(f"❌ Falha na conexão com planilha: {e}")
+        log(f"❌ Falha na conexão com planilha: {e}", "ERRO")
+    finally:
+        M_ENVIO.observar(time.perf_counter() - inicio, resultado=resultado)
 
 def get_loja_code():
     """Recupera o código da filial do registro do Windows"""
@@ -103,7 +108,7 @@ def get_loja_code():
     except FileNotFoundError:
         return "Código não encontrado"
     except Exception as e:
-        log(f"❌ Erro ao acessar o registro da filial: {e}")
+        log(f"❌ Erro ao acessar o registro da filial: {e}", "ERRO")
         return "Erro ao obter código"
     
 def update_version_file(loja_code):
@@ -137,7 +142,7 @@ def get_terminal_code():
     except FileNotFoundError:
         return "Terminal não encontrado"
     except Exception as e:
-        log(f"❌ Erro ao acessar o registro do terminal: {e}")
+        log(f"❌ Erro ao acessar o registro do terminal: {e}", "ERRO")
         return "Erro ao obter terminal"
 
 def ler_versao():
@@ -152,6 +157,21 @@ def ler_versao():
         log(f"Erro ao ler a versão: {e}")
         return "0.0.0"
 
+def resumo_rotinas():
+    """Resumo das rotinas SQL a partir do diário de execuções do launcher."""
+    linhas = []
+    for job, r in sorted(resumo_por_job(ler_execucoes(RUNS_FILE, limite=500)).items()):
+        if not job.upper().startswith("SQL_ROTINA"):
+            continue
+        ultima = r["ultima"]
+        texto = f"{job}: {ultima.get('duracao_s', 0) / 60:.1f} min (código {ultima.get('codigo')})"
+        if ultima.get("expirou"):
+            texto += " TIMEOUT"
+        if r["media_recente_s"] is not None and r["media_anterior_s"]:
+            texto += f", tendência {(r['media_recente_s'] / r['media_anterior_s'] - 1) * 100:+.0f}%"
+        linhas.append(texto)
+    return "\n".join(linhas)
+
 # -----------------------------
 # Checagem de backup
 # -----------------------------
@@ -167,19 +187,23 @@ def check_backup():
 
     # Recupera a versão
     versao = ler_versao()
+    rotinas = resumo_rotinas()
+    rotinas = f"\nRotinas:\n{rotinas}" if rotinas else ""
 
     # Verifica se o diretório de backup (C:\) existe
     if not os.path.exists(BACKUP_DIR):
         detalhe = "Pasta de backup inexistente"
-        log_msg = f"Backup não encontrado\nData: {data_now}\n{detalhe}\nFilial: {filial_code} - {hostname}\nVersão: {versao}"
+        log_msg = f"Backup não encontrado\nData: {data_now}\n{detalhe}\nFilial: {filial_code} - {hostname}\nVersão: {versao}{rotinas}"
         send_to_sheet(hostname, terminal_code, "ERRO", log_msg)
         return
 
     # Lista subpastas dentro do diretório
+    inicio_varredura = time.perf_counter()
     subfolders = [f.path for f in os.scandir(BACKUP_DIR) if f.is_dir()]
     if not subfolders:
+        M_VARREDURA.observar(time.perf_counter() - inicio_varredura)
         detalhe = "Nenhuma subpasta encontrada"
-        log_msg = f"Backup não encontrado\nData: {data_now}\n{detalhe}\nFilial: {filial_code} - {hostname}\nVersão: {versao}"
+        log_msg = f"Backup não encontrado\nData: {data_now}\n{detalhe}\nFilial: {filial_code} - {hostname}\nVersão: {versao}{rotinas}"
         send_to_sheet(hostname, terminal_code, "ERRO", log_msg)
         return
 
@@ -189,15 +213,24 @@ def check_backup():
         files = [f for f in os.listdir(sub) if os.path.isfile(os.path.join(sub, f))]
         if not files:
             empty_subs.append(os.path.basename(sub))
+    M_VARREDURA.observar(time.perf_counter() - inicio_varredura)
+    M_SUBPASTAS.definir(len(subfolders), tipo="total")
+    M_SUBPASTAS.definir(len(empty_subs), tipo="vazias")
 
     if empty_subs:
         detalhe = f"Subpastas vazias: {', '.join(empty_subs)}"
-        log_msg = f"Backup não encontrado\nData: {data_now}\n{detalhe}\nFilial: {filial_code} - {hostname}\nVersão: {versao}"
+        log_msg = f"Backup não encontrado\nData: {data_now}\n{detalhe}\nFilial: {filial_code} - {hostname}\nVersão: {versao}{rotinas}"
         send_to_sheet(hostname, terminal_code, "ERRO", log_msg)
     else:
         detalhe = "Backup encontrado corretamente"
-        log_msg = f"Backup OK\nData: {data_now}\n{detalhe}\nFilial: {filial_code} - {hostname}\nVersão: {versao}"
+        log_msg = f"Backup OK\nData: {data_now}\n{detalhe}\nFilial: {filial_code} - {hostname}\nVersão: {versao}{rotinas}"
         send_to_sheet(hostname, terminal_code, "OK", log_msg)
 
 if __name__ == "__main__":
-    check_backup()
+    inicio = time.perf_counter()
+    try:
+        check_backup()
+    finally:
+        M_EXECUCAO.observar(time.perf_counter() - inicio)
+        M_FIM.definir(time.time())
+        metricas.salvar(BASE_DIR)
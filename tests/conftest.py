@@ -0,0 +1,73 @@
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# Os módulos ficam soltos em src/ (cada script os importa diretamente)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+
+class Servidor:
+    """HTTP/1.1 com keep-alive; `range_416` responde 416 a qualquer Range."""
+
+    def __init__(self):
+        self.arquivos = {}  # caminho -> conteúdo
+        self.range_416 = False
+        self.pedidos = []
+        servidor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                servidor.pedidos.append((self.path, self.headers.get("Range")))
+                if self.path == "/redireciona":
+                    corpo = b"movido"
+                    self.send_response(302)
+                    self.send_header("Location", "/pequeno")
+                    self.send_header("Content-Length", str(len(corpo)))
+                    self.end_headers()
+                    self.wfile.write(corpo)
+                    return
+                dados = servidor.arquivos.get(self.path)
+                if dados is None:
+                    self.send_error(404)
+                    return
+                faixa = self.headers.get("Range")
+                if faixa and servidor.range_416:
+                    self.send_response(416)
+                    self.send_header("Content-Range", f"bytes */{len(dados)}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                inicio = int(faixa.split("=")[1].rstrip("-")) if faixa else 0
+                self.send_response(206 if faixa else 200)
+                if faixa:
+                    self.send_header("Content-Range", f"bytes {inicio}-{len(dados) - 1}/{len(dados)}")
+                self.send_header("Content-Length", str(len(dados) - inicio))
+                self.end_headers()
+                try:
+                    self.wfile.write(dados[inicio:])
+                except (ConnectionError, OSError):
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.base = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def parar(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def servidor_http():
+    s = Servidor()
+    yield s
+    s.parar()
@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from agendador import Agendador
+
+AGORA = datetime(2026, 10, 18, 9, 30)
+
+
+def _compilar(executar, agora=AGORA, tipo="SERVIDOR", ultimas=None):
+    agendador = Agendador()
+    agendador.compilar(executar, tipo, agora, ultimas=ultimas)
+    return agendador
+
+
+@pytest.mark.parametrize("campo, valor", [
+    ("intervalo", "30"),
+    ("dia", "1"),
+    ("dia", ["1"]),
+    ("intervalo_dias", "2"),
+    ("mes", [13]),
+    ("horario", 1000),
+    ("prioridade", "5"),
+    ("max_concurrentes", "2"),
+    ("max_concurrentes", -1),
+    ("timeout_min", "30"),
+    ("timeout_min", -5),
+])
+def test_entrada_malformada_e_ignorada_sem_derrubar_as_outras(campo, valor):
+    ruim = {"nome": "ruim.bat", "horario": ["10:00"], campo: valor}
+    boa = {"nome": "boa.bat", "horario": ["10:00"]}
+
+    agendador = _compilar([ruim, boa])
+
+    assert list(agendador.tarefas) == ["boa.bat"]
+    assert [nome for nome, _ in agendador.erros] == ["ruim.bat"]
+
+
+def test_entrada_que_nao_e_objeto_e_ignorada():
+    agendador = _compilar(["texto solto", {"nome": "boa.bat", "horario": "10:00"}])
+    assert list(agendador.tarefas) == ["boa.bat"]
+    assert len(agendador.erros) == 1
+
+
+def test_horario_com_dia_e_mes():
+    agendador = _compilar([{"nome": "checkdb.bat", "dia": [1], "mes": [11], "horario": ["01:00"]}])
+    assert agendador.proximo_disparo() == datetime(2026, 11, 1, 1, 0)
+
+
+def test_intervalo_respeita_dia_e_mes():
+    # Dia 18 não está em 'dia': o primeiro disparo fica para o dia 20 à meia-noite
+    agendador = _compilar([{"nome": "coleta.bat", "intervalo": 30, "dia": [20, 21]}])
+    tarefa = agendador.tarefas["coleta.bat"]
+    assert agendador.proximo_disparo() == datetime(2026, 10, 20, 0, 0)
+
+    disparo = datetime(2026, 10, 21, 23, 50)
+    tarefa.ultima_execucao = disparo
+    assert tarefa.proxima_apos(disparo) == datetime(2026, 11, 20, 0, 0)
+    assert "a cada 30 minutos" in tarefa.descricao()
+
+
+def test_intervalo_sem_filtro_continua_igual():
+    agendador = _compilar([{"nome": "coleta.bat", "intervalo": 30}])
+    tarefa = agendador.tarefas["coleta.bat"]
+    assert agendador.proximo_disparo() == AGORA
+    tarefa.ultima_execucao = AGORA
+    assert tarefa.proxima_apos(AGORA) == AGORA + timedelta(minutes=30)
+
+
+def test_recuperacoes_sobrevivem_a_recompilacao():
+    agora = datetime(2026, 10, 18, 23, 35)
+    ontem = datetime(2026, 10, 17, 23, 30).timestamp()
+    executar = [
+        {"nome": "backup.bat", "horario": ["22:00"], "recuperar": "uma"},
+        {"nome": "enviar.bat", "horario": ["23:00"], "recuperar": "uma"},
+    ]
+    agendador = _compilar(executar, agora, ultimas={"backup.bat": ontem, "enviar.bat": ontem})
+    assert agendador.proximo_disparo() == agora
+
+    # Config recarregado (job novo) antes das recuperações saírem
+    recompilou = agendador.compilar(executar + [{"nome": "novo.bat", "horario": ["08:00"]}],
+                                    "SERVIDOR", agora + timedelta(minutes=1))
+    assert recompilou
+
+    vencidas = agendador.vencidas(datetime(2026, 10, 18, 23, 36))
+    assert [(t.chave, rec) for _, t, rec in vencidas] == [("backup.bat", True)]
+    vencidas = agendador.vencidas(datetime(2026, 10, 18, 23, 41))
+    assert [(p, t.chave, rec) for p, t, rec in vencidas] == [(datetime(2026, 10, 18, 23, 0), "enviar.bat", True)]
+
+
+def test_disparo_vencido_nao_se_perde_na_recompilacao():
+    executar = [{"nome": "valida.exe", "horario": ["10:00"]}]
+    agendador = _compilar(executar, datetime(2026, 10, 18, 9, 59))
+
+    agora = datetime(2026, 10, 18, 10, 0, 30)
+    agendador.compilar(executar + [{"nome": "outro.bat", "horario": ["12:00"]}], "SERVIDOR", agora)
+
+    vencidas = agendador.vencidas(agora)
+    assert [(p, t.chave) for p, t, _ in vencidas] == [(datetime(2026, 10, 18, 10, 0), "valida.exe")]
+    assert agendador.tarefas["valida.exe"].proxima == datetime(2026, 10, 19, 10, 0)
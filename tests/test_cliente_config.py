@@ -0,0 +1,25 @@
+import json
+
+from cliente_config import ClienteConfig
+
+
+def test_processar_grava_cache_e_meta_sem_temporarios(tmp_path):
+    cache = tmp_path / "config_cache.json"
+    cliente = ClienteConfig("http://exemplo.invalid/config.json", str(cache))
+
+    cfg, mudou = cliente._processar(b'{"versao": "1.2.3"}', '"etag-1"', None)
+
+    assert mudou and cfg == {"versao": "1.2.3"}
+    assert json.loads(cache.read_text(encoding="utf-8")) == {"versao": "1.2.3"}
+    assert json.loads((tmp_path / "config_cache.meta.json").read_text(encoding="utf-8"))["etag"] == '"etag-1"'
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_mesmo_conteudo_nao_regrava(tmp_path):
+    cache = tmp_path / "config_cache.json"
+    cliente = ClienteConfig("http://exemplo.invalid/config.json", str(cache))
+    cliente._processar(b'{"versao": "1.2.3"}', '"etag-1"', None)
+
+    cfg, mudou = cliente._processar(b'{"versao": "1.2.3"}', '"etag-1"', None)
+    assert not mudou and cfg == {"versao": "1.2.3"}
+    assert cliente.contadores["hits_hash"] == 1
@@ -0,0 +1,53 @@
+import socket
+import threading
+
+import pytest
+
+from controle import ServidorControle, ClienteControle, ErroControle, LauncherOcupado
+
+
+def _porta_livre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def canal(tmp_path):
+    token = tmp_path / "controle.token"
+    token.write_text("segredo", encoding="utf-8")
+    liberar = threading.Event()
+    comandos = {
+        "status": lambda: {"ok": 1},
+        "lento": lambda: liberar.wait(5),
+        "falha": lambda: 1 / 0,
+    }
+    porta = _porta_livre()
+    servidor = ServidorControle("segredo", comandos, porta)
+    servidor.iniciar()
+    yield ClienteControle(str(token), porta, timeout=0.3), porta
+    liberar.set()
+    servidor.parar()
+
+
+def test_resposta_e_erro_do_comando(canal):
+    cliente, _ = canal
+    assert cliente.chamar("status") == {"ok": 1}
+    with pytest.raises(ErroControle):
+        cliente.chamar("falha")
+    with pytest.raises(ErroControle):
+        cliente.chamar("inexistente")
+
+
+def test_launcher_sem_resposta_e_ocupado_e_nao_fora_do_ar(canal):
+    cliente, _ = canal
+    with pytest.raises(LauncherOcupado):
+        cliente.chamar("lento")
+    assert not issubclass(LauncherOcupado, OSError)
+
+
+def test_porta_fechada_e_fora_do_ar(tmp_path):
+    token = tmp_path / "controle.token"
+    token.write_text("segredo", encoding="utf-8")
+    with pytest.raises(OSError):
+        ClienteControle(str(token), _porta_livre(), timeout=0.3).chamar("status")
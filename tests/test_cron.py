@@ -0,0 +1,99 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from cron import ExpressaoCron, bits
+
+
+def _valores(mascara, ate=60):
+    return [v for v in range(ate + 1) if (mascara >> v) & 1]
+
+
+@pytest.mark.parametrize("texto, campo, esperado", [
+    ("*/15 * * * *", "minutos", [0, 15, 30, 45]),
+    ("5/20 * * * *", "minutos", [5, 25, 45]),
+    ("0 8-20/4 * * *", "horas", [8, 12, 16, 20]),
+    ("0 1,13 * * *", "horas", [1, 13]),
+    ("0 0 1,15-17 * *", "dias", [1, 15, 16, 17]),
+    ("0 0 * jan,JUL,dez *", "meses", [1, 7, 12]),
+    ("0 0 * fev-abr *", "meses", [2, 3, 4]),
+    ("0 0 * * mon-fri", "semana", [1, 2, 3, 4, 5]),
+    ("0 0 * * sab,dom", "semana", [0, 6]),
+    ("0 0 * * 5-7", "semana", [0, 5, 6]),  # 7 = domingo
+])
+def test_parse(texto, campo, esperado):
+    assert _valores(getattr(ExpressaoCron.parse(texto), campo)) == esperado
+
+
+@pytest.mark.parametrize("texto", [
+    "*/0 * * * *",
+    "60 * * * *",
+    "0 24 * * *",
+    "0 0 0 * *",
+    "0 0 32 * *",
+    "0 0 * 13 *",
+    "0 0 * * 8",
+    "0 20-8 * * *",
+    "0 0 * foo *",
+    "0 0 * *",
+    "0 0 * * * *",
+])
+def test_parse_rejeita(texto):
+    with pytest.raises(ValueError):
+        ExpressaoCron.parse(texto)
+
+
+def test_dia_do_mes_ou_dia_da_semana():
+    # Ambos restritos: dia 13 OU sexta-feira (regra do cron tradicional)
+    expr = ExpressaoCron.parse("0 9 13 * fri")
+    assert expr.corresponde(datetime(2026, 10, 13, 9, 0))  # terça, dia 13
+    assert expr.corresponde(datetime(2026, 10, 16, 9, 0))  # sexta, dia 16
+    assert not expr.corresponde(datetime(2026, 10, 14, 9, 0))
+    # Só um restrito: vale só ele
+    assert not ExpressaoCron.parse("0 9 13 * *").corresponde(datetime(2026, 10, 16, 9, 0))
+    assert not ExpressaoCron.parse("0 9 * * fri").corresponde(datetime(2026, 10, 13, 9, 0))
+
+
+@pytest.mark.parametrize("texto, depois_de, esperado", [
+    ("30 23 31 * *", datetime(2026, 10, 31, 23, 30), datetime(2026, 12, 31, 23, 30)),  # pula novembro (30 dias)
+    ("0 0 1 1 *", datetime(2026, 12, 31, 23, 59), datetime(2027, 1, 1, 0, 0)),
+    ("*/10 * * * *", datetime(2026, 12, 31, 23, 55), datetime(2027, 1, 1, 0, 0)),
+    ("0 0 29 2 *", datetime(2026, 3, 1), datetime(2028, 2, 29, 0, 0)),  # próximo ano bissexto
+    ("15 6 * * mon", datetime(2026, 12, 29, 7, 0), datetime(2027, 1, 4, 6, 15)),
+    ("0 12 * dez *", datetime(2026, 12, 31, 12, 0), datetime(2027, 12, 1, 12, 0)),
+])
+def test_proxima_apos_na_virada_de_mes_e_ano(texto, depois_de, esperado):
+    assert ExpressaoCron.parse(texto).proxima_apos(depois_de) == esperado
+
+
+def _forca_bruta(expr, depois_de, limite):
+    t = depois_de.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    while t <= limite:
+        if expr.corresponde(t):
+            return t
+        t += timedelta(minutes=1)
+    return None
+
+
+@pytest.mark.parametrize("semente", range(12))
+def test_proxima_apos_igual_a_forca_bruta(semente):
+    rnd = random.Random(semente)
+    minutos = rnd.choice(["*/7", "0", "5,50", "10-20/5"])
+    horas = rnd.choice(["*", "23", "0-3", "*/6"])
+    dias = rnd.choice(["*", "1", "28-31", "*/10"])
+    semana = rnd.choice(["*", "sun", "1-5"])
+    expr = ExpressaoCron.parse(f"{minutos} {horas} {dias} * {semana}")
+    inicio = datetime(2026, 12, 20) + timedelta(minutes=rnd.randrange(20 * 1440))
+    limite = inicio + timedelta(days=40)
+    esperado = _forca_bruta(expr, inicio, limite)
+    assert esperado is not None
+    assert expr.proxima_apos(inicio) == esperado
+
+
+def test_de_campos_equivale_a_expressao():
+    a = ExpressaoCron.de_campos([0, 30], [8], [1, 15], [3])
+    b = ExpressaoCron.parse("0,30 8 1,15 3 *")
+    assert (a.minutos, a.horas, a.dias, a.meses) == (b.minutos, b.horas, b.dias, b.meses)
+    assert a.semana == bits(range(7))
+    assert a.proxima_apos(datetime(2026, 3, 15, 8, 30)) == datetime(2027, 3, 1, 8, 0)
@@ -0,0 +1,54 @@
+import os
+import random
+
+import pytest
+
+from delta import ErroDelta, aplicar, gerar, sha256_bytes
+
+
+@pytest.fixture
+def versoes(tmp_path):
+    """Um "executável" antigo e o novo com trechos inseridos, alterados e removidos."""
+    rnd = random.Random(42)
+    antigo = bytes(rnd.getrandbits(8) for _ in range(200 * 1024))
+    novo = (antigo[:50_000] + b"codigo novo" * 300 + antigo[50_000:120_000]
+            + bytes(rnd.getrandbits(8) for _ in range(3000)) + antigo[130_000:])
+    a, n = tmp_path / "antigo.exe", tmp_path / "novo.exe"
+    a.write_bytes(antigo)
+    n.write_bytes(novo)
+    return a, n, novo
+
+
+def test_ida_e_volta(tmp_path, versoes):
+    antigo, novo, conteudo = versoes
+    patch = tmp_path / "novo.delta"
+    info = gerar(str(antigo), str(novo), str(patch))
+    assert info["tamanho_delta"] < len(conteudo) // 10
+    assert info["copiados"] + info["inseridos"] == len(conteudo)
+
+    saida = tmp_path / "reconstruido.exe"
+    assert aplicar(str(antigo), str(patch), str(saida)) == sha256_bytes(conteudo)
+    assert saida.read_bytes() == conteudo
+
+
+def test_base_errada_nao_deixa_resultado(tmp_path, versoes):
+    antigo, novo, _ = versoes
+    patch = tmp_path / "novo.delta"
+    gerar(str(antigo), str(novo), str(patch))
+    outra = tmp_path / "outra.exe"
+    outra.write_bytes(os.urandom(200 * 1024))
+    saida = tmp_path / "reconstruido.exe"
+    with pytest.raises(ErroDelta):
+        aplicar(str(outra), str(patch), str(saida))
+    assert not saida.exists()
+
+
+def test_delta_truncado(tmp_path, versoes):
+    antigo, novo, _ = versoes
+    patch = tmp_path / "novo.delta"
+    gerar(str(antigo), str(novo), str(patch))
+    patch.write_bytes(patch.read_bytes()[:-40])
+    saida = tmp_path / "reconstruido.exe"
+    with pytest.raises(ErroDelta):
+        aplicar(str(antigo), str(patch), str(saida))
+    assert not saida.exists()
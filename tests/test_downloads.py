@@ -0,0 +1,107 @@
+import gzip
+import hashlib
+import json
+import lzma
+
+import pytest
+
+from downloads import MotorDownloads, ErroVerificacao, SUFIXO_PARCIAL
+
+GRANDE = bytes(range(256)) * 4096  # 1 MB
+PEQUENO = b"conteudo pequeno\n" * 10
+
+
+@pytest.fixture
+def servidor(servidor_http):
+    servidor_http.arquivos.update({"/grande": GRANDE, "/pequeno": PEQUENO})
+    return servidor_http
+
+
+def _sha(dados):
+    return hashlib.sha256(dados).hexdigest()
+
+
+def test_resposta_abandonada_nao_volta_ao_pool(servidor, tmp_path):
+    motor = MotorDownloads(timeout=5)
+    with pytest.raises(ErroVerificacao):
+        motor.baixar(servidor.base + "/grande", str(tmp_path / "grande.bin"), tamanho=10, tentativas=1)
+
+    r = motor.baixar(servidor.base + "/pequeno", str(tmp_path / "pequeno.txt"), sha256=_sha(PEQUENO), tentativas=1)
+    assert (tmp_path / "pequeno.txt").read_bytes() == PEQUENO
+    assert r["sha256"] == _sha(PEQUENO)
+    assert motor.conexoes_abertas == 2
+    motor.fechar()
+
+
+def test_conexao_reaproveitada_depois_de_leitura_completa(servidor, tmp_path):
+    motor = MotorDownloads(timeout=5)
+    r = motor.baixar(servidor.base + "/redireciona", str(tmp_path / "a.txt"), sha256=_sha(PEQUENO))
+    assert r["url_final"].endswith("/pequeno")
+    motor.baixar(servidor.base + "/grande", str(tmp_path / "b.bin"), sha256=_sha(GRANDE))
+    assert motor.conexoes_abertas == 1
+    assert motor.conexoes_reutilizadas == 2
+    motor.fechar()
+
+
+def _semear_parcial(destino, url, sha256, dados):
+    with open(destino + SUFIXO_PARCIAL, "wb") as f:
+        f.write(dados)
+    with open(destino + SUFIXO_PARCIAL + ".json", "w", encoding="utf-8") as f:
+        json.dump({"url": url, "sha256": sha256}, f)
+
+
+def test_retomada_com_range(servidor, tmp_path):
+    destino = str(tmp_path / "grande.bin")
+    url = servidor.base + "/grande"
+    _semear_parcial(destino, url, _sha(GRANDE), GRANDE[:300000])
+
+    r = MotorDownloads(timeout=5).baixar(url, destino, sha256=_sha(GRANDE), tamanho=len(GRANDE), tentativas=1)
+
+    assert r["retomados"] == 300000
+    assert r["bytes"] == len(GRANDE) - 300000
+    assert (tmp_path / "grande.bin").read_bytes() == GRANDE
+    assert servidor.pedidos == [("/grande", "bytes=300000-")]
+
+
+def test_416_na_ultima_tentativa_recomeca_do_zero(servidor, tmp_path):
+    servidor.range_416 = True
+    destino = str(tmp_path / "pequeno.txt")
+    url = servidor.base + "/pequeno"
+    _semear_parcial(destino, url, _sha(PEQUENO), b"x" * (len(PEQUENO) + 50))
+
+    r = MotorDownloads(timeout=5).baixar(url, destino, sha256=_sha(PEQUENO), tentativas=1)
+
+    assert (tmp_path / "pequeno.txt").read_bytes() == PEQUENO
+    assert r["bytes"] == len(PEQUENO)
+    assert [faixa for _, faixa in servidor.pedidos] == [f"bytes={len(PEQUENO) + 50}-", None]
+    assert not (tmp_path / ("pequeno.txt" + SUFIXO_PARCIAL)).exists()
+
+
+@pytest.mark.parametrize("formato, compactar", [("gzip", gzip.compress), ("xz", lzma.compress)])
+def test_download_compactado_descompacta_e_confere(servidor, tmp_path, formato, compactar):
+    servidor.arquivos["/grande.z"] = compactar(GRANDE)
+    destino = tmp_path / "grande.bin"
+
+    r = MotorDownloads(timeout=5).baixar(servidor.base + "/grande.z", str(destino), sha256=_sha(GRANDE),
+                                         tamanho=len(GRANDE), tentativas=1, formato=formato)
+
+    assert destino.read_bytes() == GRANDE
+    assert r["sha256"] == _sha(GRANDE)
+    assert r["bytes"] == len(servidor.arquivos["/grande.z"])
+
+
+@pytest.mark.parametrize("formato, conteudo", [
+    ("xz", lzma.compress(PEQUENO)),  # descompacta, mas o sha256 é de outro arquivo
+    ("gzip", gzip.compress(PEQUENO)[:-12] + b"lixo" * 3),  # compactado corrompido
+])
+def test_download_compactado_invalido_nao_deixa_sobras(servidor, tmp_path, formato, conteudo):
+    servidor.arquivos["/pequeno.z"] = conteudo
+    destino = tmp_path / "pequeno.txt"
+    destino.write_bytes(b"versao instalada")
+
+    with pytest.raises(ErroVerificacao):
+        MotorDownloads(timeout=5).baixar(servidor.base + "/pequeno.z", str(destino), sha256=_sha(GRANDE),
+                                         tentativas=1, formato=formato)
+
+    assert destino.read_bytes() == b"versao instalada"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["pequeno.txt"]
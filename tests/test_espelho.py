@@ -0,0 +1,78 @@
+import hashlib
+import socket
+import urllib.error
+import urllib.request
+
+import pytest
+
+from espelho import ServidorEspelho, url_espelho
+
+EXE = b"MZ executavel do release" * 2000
+
+
+def _sha(dados):
+    return hashlib.sha256(dados).hexdigest()
+
+
+def _porta_livre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def espelho(servidor_http, tmp_path):
+    servidor_http.arquivos["/valida_bkp.exe"] = EXE
+    servidor_http.arquivos["/trocado.exe"] = b"outro conteudo"
+    porta = _porta_livre()
+    e = ServidorEspelho(str(tmp_path), str(tmp_path / "config_cache.json"), porta=porta, host="127.0.0.1",
+                        log=lambda *a, **k: None)
+    e.iniciar()
+    e.atualizar_config({"arquivos": [
+        {"nome": "valida_bkp.exe", "url": servidor_http.base + "/valida_bkp.exe", "sha256": _sha(EXE)},
+        # O GitHub devolve outro conteúdo para este hash
+        {"nome": "trocado.exe", "url": servidor_http.base + "/trocado.exe", "sha256": _sha(b"esperado")},
+    ]}, preaquecer=False)
+    yield e, f"http://127.0.0.1:{porta}", servidor_http
+    e.parar()
+
+
+def _get(url, **cabecalhos):
+    with urllib.request.urlopen(urllib.request.Request(url, headers=cabecalhos), timeout=5) as resp:
+        return resp.status, resp.headers, resp.read()
+
+
+def test_serve_por_sha256_baixando_da_origem_uma_vez(espelho):
+    e, base, origem = espelho
+    url = url_espelho(base, _sha(EXE))
+
+    status, cabecalhos, corpo = _get(url)
+    assert (status, corpo) == (200, EXE)
+    assert cabecalhos["ETag"] == f'"{_sha(EXE)}"'
+
+    status, cabecalhos, corpo = _get(url, Range="bytes=1000-")
+    assert (status, corpo) == (206, EXE[1000:])
+    assert cabecalhos["Content-Range"] == f"bytes 1000-{len(EXE) - 1}/{len(EXE)}"
+
+    assert [p for p, _ in origem.pedidos] == ["/valida_bkp.exe"]
+    assert e.baixados == 1
+
+
+def test_hash_fora_do_config_e_recusado(espelho):
+    _, base, origem = espelho
+    with pytest.raises(urllib.error.HTTPError) as erro:
+        _get(url_espelho(base, _sha(b"desconhecido")))
+    assert erro.value.code == 404
+    assert origem.pedidos == []
+
+
+def test_conteudo_que_nao_confere_e_recusado_sem_deixar_sobras(espelho, tmp_path):
+    e, base, _ = espelho
+    sha = _sha(b"esperado")
+    for _ in range(2):  # o segundo pedido não fica preso numa trava esquecida
+        with pytest.raises(urllib.error.HTTPError) as erro:
+            _get(url_espelho(base, sha))
+        assert erro.value.code == 502
+    assert not e.armazem.contem(sha)
+    assert e._baixando == {}
+    assert list((tmp_path / "espelho" / "tmp").iterdir()) == []
@@ -0,0 +1,39 @@
+import json
+
+from estado import EstadoAgenda
+
+
+def _linhas(caminho):
+    return [json.loads(l) for l in caminho.read_text(encoding="utf-8").splitlines()]
+
+
+def test_compactacao_mantem_uma_entrada_por_job(tmp_path):
+    caminho = tmp_path / "estado_launcher.jsonl"
+    estado = EstadoAgenda(str(caminho), compactar_a_cada=10)
+    for i in range(95):
+        estado.registrar_inicio("backup", ts=1000 + i)
+        estado.registrar_fim("backup", 0, ts=1000 + i + 0.5)
+    linhas = _linhas(caminho)
+    assert linhas[0]["evento"] == "snapshot"
+    assert len(linhas) < 10
+    # Reabrir (snapshot + eventos depois dele) dá o mesmo estado
+    assert EstadoAgenda(str(caminho)).job("backup") == {"inicio": 1094, "fim": 1094.5, "codigo": 0}
+
+
+def test_linha_truncada_e_ignorada(tmp_path):
+    caminho = tmp_path / "estado_launcher.jsonl"
+    estado = EstadoAgenda(str(caminho))
+    estado.registrar_inicio("sql", ts=2000)
+    with open(caminho, "a", encoding="utf-8") as f:
+        f.write('{"evento": "fim", "job": "sq')
+    assert EstadoAgenda(str(caminho)).ultimas_execucoes() == {"sql": 2000}
+
+
+def test_remover_ausentes_so_descarta_os_antigos(tmp_path):
+    caminho = tmp_path / "estado_launcher.jsonl"
+    estado = EstadoAgenda(str(caminho), max_idade_dias=1)
+    estado.registrar_inicio("velho", ts=1000)
+    estado.registrar_inicio("recente", ts=1000 + 86400)
+    estado.registrar_inicio("ativo", ts=1000)
+    assert estado.remover_ausentes({"ativo"}, agora=1000 + 86400 + 60) == ["velho"]
+    assert set(EstadoAgenda(str(caminho)).ultimas_execucoes()) == {"recente", "ativo"}
@@ -0,0 +1,80 @@
+import time
+
+import pytest
+
+import launcher
+
+
+class ProcFalso:
+    def __init__(self):
+        self.rodando = True
+        self.expirou = False
+        self.returncode = None
+        self.fechado = False
+
+    def em_execucao(self):
+        return self.rodando
+
+    def aguardar(self, timeout_s=None):
+        if self.rodando:
+            assert timeout_s == 0, "o loop nunca pode esperar um processo em execução"
+            self.expirou = True
+            self.rodando = False
+            self.returncode = 1
+        return self.returncode
+
+    def fechar(self):
+        self.fechado = True
+
+
+@pytest.fixture
+def manutencao(monkeypatch, tmp_path):
+    iniciados = []
+
+    def iniciar(etapa, nome_exe, timeout_min):
+        proc = ProcFalso()
+        iniciados.append((etapa, proc))
+        launcher.manutencao.update(etapa=etapa, proc=proc, limite=time.monotonic() + timeout_min * 60)
+        return True
+
+    monkeypatch.setattr(launcher, "log", lambda *a, **k: None)
+    monkeypatch.setattr(launcher, "iniciar_manutencao", iniciar)
+    monkeypatch.setattr(launcher, "TROCA_LAUNCHER", str(tmp_path / "troca_launcher.json"))
+    monkeypatch.setattr(launcher, "manutencao", {"etapa": None, "proc": None, "limite": 0})
+    return iniciados
+
+
+def test_updater_nao_bloqueia_e_encadeia_o_valida(manutencao):
+    launcher.rodar_updater("1.2.0", "1.1.0")
+    (etapa, updater), = manutencao
+    assert etapa == "updater"
+
+    launcher.acompanhar_manutencao()  # ainda rodando: volta na hora
+    launcher.rodar_updater("1.2.0", "1.1.0")  # não inicia um segundo updater
+    assert len(manutencao) == 1 and not updater.fechado
+
+    updater.rodando, updater.returncode = False, 0
+    launcher.acompanhar_manutencao()
+    assert updater.fechado
+    assert [e for e, _ in manutencao] == ["updater", "valida"]
+
+
+def test_updater_que_estoura_o_timeout_e_encerrado(manutencao):
+    launcher.rodar_updater("1.2.0", "1.1.0")
+    _, updater = manutencao[0]
+    launcher.manutencao["limite"] = time.monotonic() - 1
+
+    launcher.acompanhar_manutencao()
+    assert updater.expirou and updater.fechado
+    assert launcher.manutencao["proc"] is None
+    assert [e for e, _ in manutencao] == ["updater"]
+
+
+def test_com_troca_do_launcher_pendente_o_valida_fica_para_depois(manutencao, tmp_path):
+    launcher.rodar_updater("1.2.0", "1.1.0")
+    _, updater = manutencao[0]
+    (tmp_path / "troca_launcher.json").write_text("{}", encoding="utf-8")
+    updater.rodando, updater.returncode = False, 0
+
+    launcher.acompanhar_manutencao()
+    assert [e for e, _ in manutencao] == ["updater"]
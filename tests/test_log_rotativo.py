@@ -0,0 +1,41 @@
+import time
+
+from log_rotativo import LogRotativo
+
+
+def _linhas(caminho):
+    with open(caminho, encoding="utf-8") as f:
+        return f.read().splitlines()
+
+
+def _aguardar(condicao, limite_s=3.0):
+    fim = time.time() + limite_s
+    while not condicao() and time.time() < fim:
+        time.sleep(0.02)
+    return condicao()
+
+
+def test_cauda_mantem_ultimas_linhas_no_proprio_arquivo(tmp_path):
+    caminho = str(tmp_path / "job.txt")
+    log = LogRotativo(caminho, max_bytes=None, max_linhas=10, cauda=True, eco=False)
+    for i in range(25):
+        log.escrever(f"linha {i}")
+        _aguardar(lambda: len(_linhas(caminho)) <= 10)
+    log.fechar()
+
+    linhas = _linhas(caminho)
+    assert len(linhas) == 10
+    assert linhas[-1].endswith("linha 24")
+    assert linhas[0].endswith("linha 15")
+    assert not (tmp_path / "job.txt.1").exists()
+
+
+def test_cauda_respeita_arquivo_existente(tmp_path):
+    caminho = tmp_path / "job.txt"
+    caminho.write_text("".join(f"antiga {i}\n" for i in range(8)), encoding="utf-8")
+    log = LogRotativo(str(caminho), max_bytes=None, max_linhas=5, cauda=True, eco=False)
+    log.escrever("nova")
+    assert _aguardar(lambda: len(_linhas(caminho)) == 5)
+    log.fechar()
+    assert _linhas(caminho)[-1].endswith("nova")
+    assert _linhas(caminho)[0] == "antiga 4"
@@ -0,0 +1,25 @@
+from metricas import Registro, texto_prometheus
+
+
+def _registro(processo, trocas, duracao):
+    r = Registro(processo)
+    r.contador("updater_trocas_launcher_total", "Trocas").inc(trocas, resultado="falha")
+    r.histograma("updater_execucao_segundos", "Duração").observar(duracao)
+    r.medidor("updater_em_andamento", "Em andamento")  # registrado, mas sem série
+    return r
+
+
+def test_metrica_de_dois_processos_sai_com_rotulo_processo():
+    troca = _registro("troca_launcher", 1, 40)
+    updater = _registro("updater", 2, 300)
+    updater.contador("updater_bytes_baixados_total").inc(1024, arquivo="valida_bkp.exe")
+    texto = texto_prometheus([troca.instantaneo(), updater.instantaneo()])
+
+    assert 'monitbkp_updater_trocas_launcher_total{processo="troca_launcher",resultado="falha"} 1' in texto
+    assert 'monitbkp_updater_trocas_launcher_total{processo="updater",resultado="falha"} 2' in texto
+    assert 'monitbkp_updater_execucao_segundos_count{processo="updater"} 1' in texto
+    assert 'monitbkp_updater_execucao_segundos_count{processo="troca_launcher"} 1' in texto
+    # Só um processo tem a série: sai sem o rótulo extra, como antes
+    assert 'monitbkp_updater_bytes_baixados_total{arquivo="valida_bkp.exe"} 1024' in texto
+    assert texto.count("# TYPE monitbkp_updater_trocas_launcher_total ") == 1
+    assert texto.count("# TYPE monitbkp_updater_em_andamento ") == 1
@@ -0,0 +1,88 @@
+from concurrent.futures import Future
+from datetime import datetime
+
+from agendador import Tarefa
+from pool_execucao import PoolExecucao
+
+PREVISTO = datetime(2026, 10, 18, 2, 0)
+
+
+class ExecutorFalso:
+    """Não roda nada: o teste decide quando cada job termina."""
+
+    def __init__(self):
+        self.iniciados = []
+
+    def submit(self, funcao, tarefa, previsto):
+        futuro = Future()
+        self.iniciados.append((tarefa.chave, futuro))
+        return futuro
+
+    def terminar(self, chave):
+        for c, futuro in self.iniciados:
+            if c == chave and not futuro.done():
+                futuro.set_result(0)
+                return
+        raise AssertionError(f"{chave} não está rodando")
+
+
+def _tarefa(nome, **info):
+    return Tarefa(nome, dict(info, nome=nome, horario="02:00"))
+
+
+def _pool(max_workers=3):
+    executor = ExecutorFalso()
+    return PoolExecucao(max_workers, None, executor=executor), executor
+
+
+def test_grupo_exclusivo_nunca_roda_dois_ao_mesmo_tempo():
+    pool, executor = _pool()
+    sqls = [_tarefa(f"SQL_{i}.bat", exclusivo_com=["sql"]) for i in range(3)]
+    for t in sqls:
+        pool.enviar(t, PREVISTO)
+
+    for _ in range(3):
+        iniciados = pool.despachar()
+        assert len(iniciados) == 1
+        assert [t.chave for t in pool.rodando()] == [iniciados[0].chave]
+        assert pool.despachar() == []
+        executor.terminar(iniciados[0].chave)
+        pool.coletar()
+    assert not pool.pendentes()
+
+
+def test_max_concurrentes_e_respeitado():
+    pool, executor = _pool(max_workers=5)
+    for limite, nome in ((1, "um.bat"), (2, "dois.bat")):
+        t = _tarefa(nome, max_concurrentes=limite)
+        for _ in range(3):
+            pool.enviar(t, PREVISTO)
+            pool.despachar()
+    rodando = [t.chave for t in pool.rodando()]
+    assert rodando.count("um.bat") == 1
+    assert rodando.count("dois.bat") == 2
+
+
+def test_bloqueado_sai_quando_o_conflitante_termina():
+    pool, executor = _pool()
+    backup = _tarefa("SQL_BACKUP.bat", exclusivo_com="sql")
+    indices = _tarefa("SQL_INDICES.bat", exclusivo_com=["SQL"], prioridade=10)
+    livre = _tarefa("valida_bkp.exe")
+    pool.enviar(backup, PREVISTO)
+    assert pool.despachar() == [backup]
+
+    pool.enviar(indices, PREVISTO)
+    pool.enviar(livre, PREVISTO)
+    assert pool.despachar() == [livre]  # o SQL espera, o resto não
+    assert pool.pendentes() == [indices]
+
+    executor.terminar("SQL_BACKUP.bat")
+    assert [(t.chave, erro) for t, _, erro in pool.coletar()] == [("SQL_BACKUP.bat", None)]
+    assert pool.despachar() == [indices]
+
+
+def test_prioridade_maior_sai_primeiro():
+    pool, _ = _pool(max_workers=1)
+    pool.enviar(_tarefa("baixa.bat"), PREVISTO)
+    pool.enviar(_tarefa("alta.bat", prioridade=5), PREVISTO)
+    assert [t.chave for t in pool.despachar()] == ["alta.bat"]
@@ -0,0 +1,44 @@
+import os
+import sys
+import time
+import subprocess
+
+import pytest
+
+from processos import WINDOWS, iniciar_destacado, aguardar_pid
+
+pytestmark = pytest.mark.skipif(WINDOWS, reason="Job Object/breakaway só no Windows real")
+
+
+def _pid_orfao(segundos):
+    """PID de um processo que não é filho deste (o sh sai e o sleep é adotado pelo init)."""
+    saida = subprocess.run(["sh", "-c", f"sleep {segundos} >/dev/null 2>&1 & echo $!"],
+                           capture_output=True, text=True, check=True)
+    return int(saida.stdout.strip())
+
+
+def test_aguardar_pid_espera_o_fim():
+    pid = _pid_orfao(0.5)
+    inicio = time.monotonic()
+    assert aguardar_pid(pid, timeout_s=10)
+    assert time.monotonic() - inicio >= 0.3
+
+
+def test_aguardar_pid_respeita_o_prazo():
+    pid = _pid_orfao(5)
+    try:
+        assert not aguardar_pid(pid, timeout_s=0.3)
+    finally:
+        os.kill(pid, 9)
+
+
+def test_iniciar_destacado_em_outra_sessao(tmp_path):
+    marca = tmp_path / "sid"
+    pid = iniciar_destacado([sys.executable, "-c",
+                             f"import os; open({str(marca)!r}, 'w').write(str(os.getsid(0)))"])
+    limite = time.monotonic() + 10
+    while not marca.exists() or not marca.read_text():
+        assert time.monotonic() < limite
+        time.sleep(0.05)
+    assert int(marca.read_text()) == pid  # líder da própria sessão: fora do grupo de quem o iniciou
+    assert int(marca.read_text()) != os.getsid(0)
@@ -0,0 +1,71 @@
+import json
+import threading
+
+import rede
+from rede import RedeResiliente, CircuitoAberto, ABERTO, FECHADO, MEIO_ABERTO
+
+import pytest
+
+ENDPOINT = "https://github.com"
+
+
+def _rede(tmp_path, **opcoes):
+    return RedeResiliente(str(tmp_path / "rede_estado.json"), **opcoes)
+
+
+def test_abre_depois_de_falhas_seguidas_e_fecha_no_teste_bem_sucedido(tmp_path, monkeypatch):
+    r = _rede(tmp_path, falhas_para_abrir=2, espera_base_s=30)
+    assert not r.falha(ENDPOINT)
+    assert r.falha(ENDPOINT)
+    assert r.situacao(ENDPOINT)["estado"] == ABERTO
+    with pytest.raises(CircuitoAberto):
+        r.permitir(ENDPOINT)
+
+    # Espera vencida: só uma requisição de teste passa
+    reabre = r.situacao(ENDPOINT)["reabre_em"]
+    monkeypatch.setattr(rede.time, "time", lambda: reabre + 1)
+    r.permitir(ENDPOINT)
+    assert r.situacao(ENDPOINT)["estado"] == MEIO_ABERTO
+    with pytest.raises(CircuitoAberto):
+        r.permitir(ENDPOINT)
+
+    r.sucesso(ENDPOINT)
+    assert r.situacao(ENDPOINT)["estado"] == FECHADO
+    r.permitir(ENDPOINT)
+
+
+def test_falha_no_teste_reabre_com_espera_maior(tmp_path, monkeypatch):
+    r = _rede(tmp_path, falhas_para_abrir=1, espera_base_s=30, espera_max_s=3600)
+    r.falha(ENDPOINT)
+    primeira = r.situacao(ENDPOINT)
+    agora = primeira["reabre_em"] + 1
+    monkeypatch.setattr(rede.time, "time", lambda: agora)
+    r.permitir(ENDPOINT)
+    assert r.falha(ENDPOINT)
+    segunda = r.situacao(ENDPOINT)
+    assert segunda["estado"] == ABERTO and segunda["aberturas"] == 2
+    assert segunda["reabre_em"] - agora >= 30  # teto dobrado: espera em [30, 60]
+
+
+def test_estado_compartilhado_entre_instancias(tmp_path):
+    _rede(tmp_path, falhas_para_abrir=1).falha(ENDPOINT)
+    outra = _rede(tmp_path)
+    assert outra.situacao(ENDPOINT)["estado"] == ABERTO
+
+
+def test_gravacoes_concorrentes_nao_deixam_temporarios(tmp_path):
+    instancias = [_rede(tmp_path) for _ in range(4)]
+
+    def martelar(r, i):
+        for n in range(25):
+            r.falha(f"https://host{i}.exemplo")
+            r.sucesso(f"https://host{i}.exemplo")
+
+    threads = [threading.Thread(target=martelar, args=(r, i)) for i, r in enumerate(instancias)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    json.loads((tmp_path / "rede_estado.json").read_text(encoding="utf-8"))
+    assert not list(tmp_path.glob("*.tmp"))
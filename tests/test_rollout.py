@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from rollout import decidir, percentual_vigente
+
+INICIO = datetime(2026, 10, 20, 8, 0)
+RAMPA = {"rampa": {"inicio": "2026-10-20 08:00", "horas": 48, "de": 5, "ate": 100}}
+LOJAS = [str(n) for n in range(1, 1001)]
+
+
+@pytest.mark.parametrize("quando, esperado", [
+    (INICIO - timedelta(minutes=1), 0.0),
+    (INICIO, 5.0),
+    (INICIO + timedelta(hours=24), 52.5),
+    (INICIO + timedelta(hours=48), 100.0),
+    (INICIO + timedelta(days=30), 100.0),
+])
+def test_percentual_da_rampa(quando, esperado):
+    assert percentual_vigente(RAMPA, quando) == pytest.approx(esperado)
+
+
+def test_sem_rampa_usa_o_percentual_limitado():
+    assert percentual_vigente({"percentual": 30}) == 30
+    assert percentual_vigente({"percentual": 250}) == 100
+    assert percentual_vigente({}) == 100
+
+
+def test_loja_liberada_continua_liberada_enquanto_a_rampa_sobe():
+    anteriores = set()
+    for horas in range(0, 49, 6):
+        agora = INICIO + timedelta(hours=horas)
+        liberadas = {l for l in LOJAS if decidir(RAMPA, l, "1.2.3", agora)[0]}
+        assert anteriores <= liberadas
+        # Frota grande: a fração liberada acompanha o percentual da rampa
+        assert abs(len(liberadas) / len(LOJAS) * 100 - percentual_vigente(RAMPA, agora)) < 5
+        anteriores = liberadas
+    assert len(anteriores) == len(LOJAS)
+
+
+def test_antes_do_inicio_so_as_filiais_permitidas():
+    regras = dict(RAMPA, permitir=["101"])
+    agora = INICIO - timedelta(hours=1)
+    assert decidir(regras, "101", "1.2.3", agora)[0]
+    assert not any(decidir(regras, l, "1.2.3", agora)[0] for l in LOJAS if l != "101")
+
+
+def test_negar_prevalece_sobre_permitir():
+    regras = {"percentual": 100, "permitir": ["330"], "negar": [330]}
+    liberada, motivo = decidir(regras, "330", "1.2.3")
+    assert not liberada
+    assert "exclusão" in motivo
+
+
+def test_rollout_de_outra_versao_libera():
+    regras = {"versao": "1.2.3", "percentual": 0}
+    assert decidir(regras, "101", "1.2.4")[0]
+    assert not decidir(regras, "101", "1.2.3")[0]
+
+
+@pytest.mark.parametrize("rampa", [
+    {"horas": 48},
+    {"inicio": "20/10/2026", "horas": 48},
+    {"inicio": "2026-10-20 08:00", "horas": "dois dias"},
+])
+def test_rampa_invalida_segura_a_versao(rampa):
+    liberada, motivo = decidir({"rampa": rampa}, "101", "1.2.3", INICIO + timedelta(days=30))
+    assert not liberada
+    assert "inválido" in motivo
+
+
+def test_ordem_das_lojas_muda_a_cada_versao():
+    regras = {"percentual": 20}
+    v1 = {l for l in LOJAS if decidir(regras, l, "1.2.3")[0]}
+    v2 = {l for l in LOJAS if decidir(regras, l, "1.2.4")[0]}
+    assert v1 != v2
+
+
+@pytest.mark.parametrize("regras", [
+    "50",
+    [1],
+    50,
+    {"percentual": 100, "negar": 5},
+    {"percentual": 100, "negar": None},
+    {"percentual": 100, "permitir": "101"},
+    {"percentual": 100, "negar": "123"},
+])
+def test_rollout_malformado_segura_a_versao_sem_excecao(regras):
+    liberada, motivo = decidir(regras, "123", "1.2.3")
+    assert not liberada
+    assert "inválido" in motivo